@@ -0,0 +1,40 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+import logging
+
+from app.core.config import config
+from app.services.export import (
+    EXPORT_EXTENSIONS, EXPORT_MEDIA_TYPES, INCREMENTAL_FORMATS, ExportFormat, export_watermark, stream_export
+)
+
+router = APIRouter(
+    tags=["Export"],
+)
+
+@router.get("/labels")
+def export_labels(
+    format: ExportFormat = "jsonl",
+    batch_size: int = Query(default=config.EXPORT_BATCH_SIZE, ge=1, le=config.MAX_EXPORT_BATCH_SIZE),
+    since: int | None = Query(default=None, ge=0)
+    ):
+    """
+    Streams every labelled image with its label as JSONL, a WebDataset tar (image, caption
+    and JSON metadata per sample) or Parquet. Rows are read through a server side cursor
+    and encoded a batch at a time, so memory stays flat however large the dataset is.
+
+    Pass the X-Change-Watermark of a previous export as since to receive only the images
+    changed since it, plus deleted records for removed images and labels, in change order.
+    """
+    if since is not None and format not in INCREMENTAL_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Incremental exports are not supported for {format}")
+    logging.info(f"Exporting labels as {format}" + (f" changed since {since}" if since is not None else ""))
+    watermark: int = export_watermark()
+    return StreamingResponse(
+        stream_export(format, batch_size=batch_size, since=since, until=watermark),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": f'attachment; filename="labels.{EXPORT_EXTENSIONS[format]}"',
+            "X-Change-Watermark": str(watermark),
+        }
+    )
@@ -1,18 +1,41 @@
 # filepath: main.py
-import aiofiles
+import asyncio
 import os
-import uuid
-from fastapi import File, UploadFile, HTTPException, APIRouter, Request, status, Depends
-from pydantic import BaseModel
+from pathlib import Path
+from fastapi import File, UploadFile, HTTPException, APIRouter, Request, status, Depends, BackgroundTasks, Query
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import BaseModel, HttpUrl
 
 import logging
+from typing import Annotated, BinaryIO, Literal
 
 from app.core.config import config
+from app.core.concurrency import run_blocking
+from app.core.pagination import page_response
+from app.core.utils import normalize_tags
+from app.core.storage import (
+    StoredFile, discard_duplicate, discard_stored, iter_upload_chunks, resolve_image_path, save_stream, save_upload
+)
 from app.services.utils import (
-    get_image_service, ImageService, get_image_label_service, ImageLabelService
+    get_async_image_service, AsyncImageService, get_async_image_label_service, AsyncImageLabelService
+)
+from app.db.schema import Image, ImageLabel
+from app.models.image_model import ImageRead, ImageCreate, ImageClaimRead, NearDuplicate, DuplicateCluster
+from app.models.image_label_model import ImageLabelCreate, ImageLabelRead, ImageLabelUpdate, TagCount
+from app.models.job_model import JobRead
+from app.models.pagination_model import Page
+from app.imaging.derivatives import DERIVATIVE_MEDIA_TYPE, ensure_derivative, schedule_derivatives
+from app.imaging.transforms import TRANSFORM_MEDIA_TYPES, TransformParams, ensure_transform, iter_file
+from app.services.jobs import jobs
+from app.services.ingest import ingest_archive
+from app.services.url_import import import_urls, parse_url_lines
+from app.services.label_import import LABEL_IMPORT_FORMATS, import_labels
+from app.services.tag_index import tag_index
+from app.services.near_duplicates import (
+    backfill_image_hashes, find_duplicate_clusters, find_near_duplicates, hash_images
 )
-from app.models.image_model import ImageRead, ImageCreate
-from app.models.image_label_model import ImageLabelCreate, ImageLabelRead, ImageLabelUpdate
+from app.services.quality import analyse_images, backfill_image_quality, label_queue_options
+from app.services.user_service_helpers import get_optional_user_email
 
 router = APIRouter(
     tags=["Images"],
@@ -25,67 +48,351 @@ class LabelRequest(BaseModel):
     gender: str
 
 
+class UrlImportRequest(BaseModel):
+    urls: list[HttpUrl]
+
+
+class UploadResult(BaseModel):
+    filename: str | None
+    status: Literal["created", "duplicate", "failed"]
+    image_name: str | None = None
+    checksum: str | None = None
+    url: str | None = None
+    detail: str | None = None
+
+
+@router.get("", response_model=Page[ImageRead])
+async def list_images(
+    limit: int = Query(default=config.DEFAULT_PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    service: AsyncImageService = Depends(get_async_image_service)
+    ):
+    """
+    Lists images a page at a time. Pass the returned next_cursor to fetch the following page.
+    """
+    images, next_cursor = await service.get_images_page(limit=limit, cursor=cursor)
+    return page_response([ImageRead.row(image) for image in images], next_cursor)
+
+@router.get("/search", response_model=Page[ImageRead])
+async def search_images(
+    tag: Annotated[list[str], Query(description="Images must carry every one of these tags")] = [],
+    any_tag: Annotated[list[str], Query(description="Images must carry at least one of these tags")] = [],
+    gender: str | None = None,
+    q: Annotated[str | None, Query(max_length=256, description="Words or \"phrases\" to find in the prompt")] = None,
+    limit: int = Query(default=config.DEFAULT_PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    service: AsyncImageService = Depends(get_async_image_service)
+    ):
+    """
+    Finds labelled images by tag, e.g. ?tag=outdoor&tag=portrait&any_tag=smiling&any_tag=laughing
+    for images tagged outdoor and portrait and either smiling or laughing. Add q to search the
+    prompts, e.g. ?q="red hat" -beach, which orders results by relevance. Pass the returned
+    next_cursor to fetch the following page.
+    """
+    images, next_cursor = await service.search_images(
+        tags_all=normalize_tags(tag), tags_any=normalize_tags(any_tag), gender=gender, limit=limit, cursor=cursor,
+        text=q.strip() if q else None
+    )
+    return page_response([ImageRead.row(image) for image in images], next_cursor)
+
+@router.get("/tags/autocomplete", response_model=list[TagCount])
+async def autocomplete_tags(
+    prefix: str = Query(min_length=1, max_length=64),
+    limit: int = Query(default=config.TAG_AUTOCOMPLETE_LIMIT, ge=1, le=config.MAX_TAG_AUTOCOMPLETE_LIMIT)
+    ):
+    """
+    Suggests existing tags starting with prefix, most used first, so annotators reuse a tag
+    instead of typing a new variant of it. Served from memory without touching the database.
+    """
+    return tag_index.complete(prefix, limit)
+
+@router.get("/labels", response_model=Page[ImageLabelRead])
+async def list_image_labels(
+    limit: int = Query(default=config.DEFAULT_PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    service: AsyncImageLabelService = Depends(get_async_image_label_service)
+    ):
+    """
+    Lists image labels a page at a time. Pass the returned next_cursor to fetch the following page.
+    """
+    image_labels, next_cursor = await service.get_image_labels_page(limit=limit, cursor=cursor)
+    return page_response([ImageLabelRead.row(image_label) for image_label in image_labels], next_cursor)
+
+
+def _upload_response(request: Request, file: UploadFile, stored: StoredFile, image_name: str, duplicate: bool) -> dict:
+    return {
+        "filename": image_name,
+        "content_type": file.content_type,
+        "stored_at": resolve_image_path(image_name) or stored.path,
+        "size": stored.size,
+        "checksum": stored.checksum,
+        "duplicate": duplicate,
+        "url": request.url_for("data", path=image_name).__str__(),
+    }
+
+
 @router.post("/upload")
 async def upload_image(
     request: Request,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    service: ImageService = Depends(get_image_service)
+    service: AsyncImageService = Depends(get_async_image_service)
     ):
     """
-    Saves a file to the upload directory with a secure, unique filename.
+    Streams a file to the upload directory with a secure, unique filename.
     """
-    if file.content_type not in {"image/jpeg", "image/png"}:
-        raise HTTPException(status_code=415, detail="Unsupported file type.")
+    stored: StoredFile = await save_upload(file)
 
-    # Generate a secure, unique filename to prevent path traversal and overwrites
-    file_extension = os.path.splitext(file.filename)[1]
-    secure_filename = f"{uuid.uuid4()}{file_extension}"
-    file_path = os.path.join(config.DATA_DIR, secure_filename)
-    file_url: str = request.url_for("data", path=secure_filename)
+    existing: Image | None = await service.get_image_by_checksum(stored.checksum)
+    if existing:
+        logging.info(f"Upload duplicates image {existing.image_name}")
+        discard_duplicate(stored, existing.image_name)
+        return _upload_response(request, file, stored, image_name=existing.image_name, duplicate=True)
 
     try:
-        async with aiofiles.open(file_path, "wb") as out_file:
-            content = await file.read()  # Read file content
-            await out_file.write(content)  # Write to disk
+        image = ImageCreate(
+            image_name=stored.filename,
+            checksum=stored.checksum,
+        )
+        created: Image = await service.create_image(image)
     except Exception as e:
+        logging.error(f"Error creating image: {e}")
+        discard_stored(stored)
         raise HTTPException(status_code=500, detail=f"Error saving file: {e}")
+
+    if created.image_name != stored.filename:
+        # A concurrent upload of the same content registered it first under another name
+        logging.info(f"Upload duplicates image {created.image_name}")
+        discard_duplicate(stored, created.image_name)
+        return _upload_response(request, file, stored, image_name=created.image_name, duplicate=True)
+
+    background_tasks.add_task(schedule_derivatives, [created.image_name])
+    background_tasks.add_task(hash_images, [created.image_name])
+    background_tasks.add_task(analyse_images, [created.image_name])
+    return _upload_response(request, file, stored, image_name=created.image_name, duplicate=False)
+
+@router.post("/upload/batch", response_model=list[UploadResult])
+async def upload_images(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    files: list[UploadFile] = File(...),
+    service: AsyncImageService = Depends(get_async_image_service)
+    ):
+    """
+    Streams many files to disk concurrently and registers them with a single bulk insert.
+    Files that fail validation are reported individually without failing the whole batch.
+    """
+    semaphore = asyncio.Semaphore(int(config.UPLOAD_CONCURRENCY))
+
+    async def store(file: UploadFile) -> StoredFile | HTTPException:
+        async with semaphore:
+            try:
+                return await save_upload(file)
+            except HTTPException as e:
+                return e
+
+    outcomes: list[StoredFile | HTTPException] = await asyncio.gather(*(store(file) for file in files))
+    stored_files: list[StoredFile] = [outcome for outcome in outcomes if isinstance(outcome, StoredFile)]
+
+    try:
+        registered: list[tuple[Image, bool]] = await service.create_images([
+            ImageCreate(image_name=stored.filename, checksum=stored.checksum) for stored in stored_files
+        ])
+    except Exception as e:
+        logging.error(f"Error creating images: {e}")
+        for stored in stored_files:
+            discard_stored(stored)
+        raise HTTPException(status_code=500, detail=f"Error saving files: {e}")
+    created_names: list[str] = [image.image_name for image, created in registered if created]
+    background_tasks.add_task(schedule_derivatives, created_names)
+    background_tasks.add_task(hash_images, created_names)
+    background_tasks.add_task(analyse_images, created_names)
+
+    registrations = iter(zip(stored_files, registered))
+    results: list[UploadResult] = []
+    for file, outcome in zip(files, outcomes):
+        if isinstance(outcome, StoredFile):
+            stored, (image, created) = next(registrations)
+            if not created:
+                discard_duplicate(stored, image.image_name)
+            results.append(UploadResult(
+                filename=file.filename,
+                status="created" if created else "duplicate",
+                image_name=image.image_name,
+                checksum=image.checksum,
+                url=str(request.url_for("data", path=image.image_name)),
+            ))
+        else:
+            results.append(UploadResult(filename=file.filename, status="failed", detail=str(outcome.detail)))
+    return results
+
+@router.post("/upload/archive", status_code=status.HTTP_202_ACCEPTED, response_model=JobRead)
+async def upload_archive(file: UploadFile = File(...)):
+    """
+    Streams a ZIP or tar archive to disk and unpacks its images in a background job.
+    """
+    archive_extension: str = "".join(Path(file.filename or "").suffixes[-2:])
+    try:
+        stored: StoredFile = await save_stream(
+            iter_upload_chunks(file),
+            archive_extension,
+            max_size=config.MAX_ARCHIVE_SIZE,
+            directory=config.UPLOAD_TMP_DIR,
+            content_addressed=False
+        )
     finally:
-        # Ensure the temporary file is closed
         await file.close()
+    return jobs.submit("archive", ingest_archive, stored.path)
 
+@router.post("/labels/import", status_code=status.HTTP_202_ACCEPTED, response_model=JobRead)
+async def import_image_labels(file: UploadFile = File(...)):
+    """
+    Bulk upserts labels from a CSV (image_name, prompt, tags, gender) or JSONL file in a
+    background job. Lines naming unknown images are reported in the job's errors.
+    """
+    extension: str = os.path.splitext(file.filename or "")[1].lower()
+    if extension not in LABEL_IMPORT_FORMATS:
+        raise HTTPException(status_code=415, detail="Label files must be .csv or .jsonl")
     try:
-        image = ImageCreate(
-            image_name=secure_filename,
+        stored: StoredFile = await save_stream(
+            iter_upload_chunks(file),
+            extension,
+            max_size=config.MAX_ARCHIVE_SIZE,
+            directory=config.UPLOAD_TMP_DIR,
+            content_addressed=False
         )
-        service.create_image(image)
-    except Exception as e:
-        logging.error(f"Error creating image: {e}")
-        os.remove(file_path)
-        raise HTTPException(status_code=500, detail=f"Error saving file: {e}")
+    finally:
+        await file.close()
+    return jobs.submit("label_import", import_labels, stored.path)
 
-    return {
-        "filename": secure_filename,
-        "content_type": file.content_type,
-        "stored_at": file_path,
-        "url": file_url.__str__(),
+@router.post("/import/urls", status_code=status.HTTP_202_ACCEPTED, response_model=JobRead)
+async def import_images_from_urls(import_request: UrlImportRequest):
+    """
+    Downloads images from remote urls in a background job.
+    """
+    return jobs.submit("url_import", import_urls, [str(url) for url in import_request.urls])
+
+@router.post("/import/urls/file", status_code=status.HTTP_202_ACCEPTED, response_model=JobRead)
+async def import_images_from_url_file(file: UploadFile = File(...)):
+    """
+    Downloads the images listed in a text (one url per line) or JSONL file in a background job.
+    """
+    try:
+        content: str = (await file.read()).decode("utf-8")
+        urls: list[str] = list(parse_url_lines(content.splitlines()))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not parse url file: {e}")
+    finally:
+        await file.close()
+    if not urls:
+        raise HTTPException(status_code=400, detail="No urls found in file")
+    return jobs.submit("url_import", import_urls, urls)
+
+@router.post("/claim", response_model=list[ImageClaimRead])
+async def claim_images(
+    count: int = Query(default=1, ge=1, le=config.MAX_CLAIM_COUNT),
+    min_quality: float | None = Query(default=None, ge=0, le=1),
+    order: Literal["id", "quality"] | None = None,
+    annotator: str | None = Depends(get_optional_user_email),
+    service: AsyncImageService = Depends(get_async_image_service)
+    ):
+    """
+    Leases the next unlabelled images to the caller, starting with any it still holds.
+    Concurrent callers always receive distinct images; unlabelled leases return to the
+    queue once they expire. Images scoring below min_quality are skipped and order=quality
+    hands out the best images first; both default to LABEL_MIN_QUALITY and
+    LABEL_QUEUE_ORDER.
+    """
+    images: list[Image] = await service.claim_unlabelled_images(
+        count=count, claimed_by=annotator, **label_queue_options(min_quality, order)
+    )
+    return [ImageClaimRead.from_orm(image) for image in images]
+
+@router.get("/duplicates", response_model=list[DuplicateCluster])
+async def list_duplicate_clusters(
+    max_distance: int = Query(default=config.NEAR_DUPLICATE_DISTANCE, ge=0, le=config.MAX_NEAR_DUPLICATE_DISTANCE),
+    min_size: int = Query(default=2, ge=2)
+    ):
+    """
+    Groups near duplicate images, largest group first: images whose perceptual hashes differ
+    in at most max_distance bits, directly or through other images in the group.
+    """
+    return await run_blocking(find_duplicate_clusters, max_distance, min_size)
+
+@router.post("/hashes/backfill", status_code=status.HTTP_202_ACCEPTED, response_model=JobRead)
+async def backfill_hashes():
+    """Computes the perceptual hash of every stored image that does not have one yet in a background job."""
+    return jobs.submit("phash_backfill", backfill_image_hashes)
+
+@router.post("/quality/backfill", status_code=status.HTTP_202_ACCEPTED, response_model=JobRead)
+async def backfill_quality():
+    """Measures the quality metrics of every stored image that does not have them yet in a background job."""
+    return jobs.submit("quality_backfill", backfill_image_quality)
+
+@router.get("/jobs/{job_id}", response_model=JobRead)
+async def get_job(job_id: str):
+    """Report the progress of a background ingest job"""
+    return jobs.get(job_id)
+
+@router.get("/{image_name}/near-duplicates", response_model=list[NearDuplicate])
+async def get_near_duplicates(
+    image_name: str,
+    max_distance: int = Query(default=config.NEAR_DUPLICATE_DISTANCE, ge=0, le=config.MAX_NEAR_DUPLICATE_DISTANCE)
+    ):
+    """Images that look like this one (resized, recompressed or lightly cropped copies), closest first."""
+    return await run_blocking(find_near_duplicates, image_name, max_distance)
+
+@router.get("/{image_name}/derivatives/{preset}", response_class=FileResponse)
+async def get_image_derivative(image_name: str, preset: str):
+    """
+    Serves a resized derivative of an image, rendering and caching it if it is missing.
+    """
+    path: str = await ensure_derivative(image_name, preset)
+    return FileResponse(
+        path,
+        media_type=DERIVATIVE_MEDIA_TYPE,
+        headers={"Cache-Control": f"public, max-age={config.DERIVATIVE_CACHE_MAX_AGE}, immutable"}
+    )
+
+@router.get("/{image_name}/transform", response_class=FileResponse)
+async def transform_image(
+    request: Request,
+    image_name: str,
+    params: Annotated[TransformParams, Query()]
+    ):
+    """
+    Serves an image resized to fit, or center cropped to cover, the requested dimensions.
+    Results are cached and carry a strong ETag so repeat requests can be answered with 304.
+    """
+    # A deleted image must not keep answering 304 to clients holding its ETag
+    if not resolve_image_path(image_name):
+        raise HTTPException(status_code=404, detail="Image not found")
+    etag: str = f'"{params.cache_key(image_name)}"'
+    headers: dict[str, str] = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={config.DERIVATIVE_CACHE_MAX_AGE}, immutable",
     }
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    transform: BinaryIO = await ensure_transform(image_name, params)
+    headers["Content-Length"] = str(os.fstat(transform.fileno()).st_size)
+    return StreamingResponse(iter_file(transform), media_type=TRANSFORM_MEDIA_TYPES[params.format], headers=headers)
 
 @router.post("/label", status_code=status.HTTP_200_OK)
 async def label_image(
     request: Request,
     label_request: LabelRequest,
-    service: ImageLabelService = Depends(get_image_label_service)
+    service: AsyncImageLabelService = Depends(get_async_image_label_service)
     ):
     """Load the label page"""
     logging.info("Labeling image")
-    print(label_request.tags)
-    label: ImageLabelRead = service.create_image_label(
+    image_label: ImageLabel = await service.create_image_label(
         image_label=ImageLabelCreate(
             image_name=label_request.image_name,
             prompt=label_request.prompt,
-            tags=','.join(label_request.tags),
+            tags=label_request.tags,
             gender=label_request.gender
         )
     )
-    return label
-    
+    return ImageLabelRead.from_orm(image_label, image_name=label_request.image_name)
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Request, HTTPException, status, Depends, Form, Cookie
+from fastapi import APIRouter, Request, HTTPException, status, Depends, Form, Cookie, Query
 from fastapi.responses import RedirectResponse
 
 import logging
 from typing import Annotated, Literal
 
-from app.services.utils import get_user_service, UserService
+from app.services.utils import get_async_user_service, AsyncUserService
 from app.models.user_model import UserCreate, UserRead
+from app.models.pagination_model import Page
+from app.services.user_service_helpers import get_current_active_user
 from app.core.config import config
+from app.core.pagination import page_response
 
 
 router = APIRouter(
@@ -19,24 +22,35 @@ async def register(
     username: Annotated[str, Form()],
     email: Annotated[str, Form()],
     password: Annotated[str, Form()],
-    service: UserService = Depends(get_user_service)
+    service: AsyncUserService = Depends(get_async_user_service)
     ):
     user: UserCreate = UserCreate(
         name=username,
         email=email,
         password=password,
     )
-    user: UserRead = service.create_user(user=user)
+    user: UserRead = await service.create_user(user=user)
     return RedirectResponse(url="/login", status_code=status.HTTP_302_FOUND)
     # return user
 
+@router.get("", response_model=Page[UserRead])
+async def list_users(
+    current_user: Annotated[UserRead, Depends(get_current_active_user)],
+    limit: int = Query(default=config.DEFAULT_PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    service: AsyncUserService = Depends(get_async_user_service)
+    ):
+    """Lists users a page at a time. Pass the returned next_cursor to fetch the following page."""
+    users, next_cursor = await service.get_users_page(limit=limit, cursor=cursor)
+    return page_response([UserRead.row(user) for user in users], next_cursor)
+
 @router.post("/login")
 async def login(
     email: Annotated[str, Form()],
     password: Annotated[str, Form()],
-    service: UserService = Depends(get_user_service)
+    service: AsyncUserService = Depends(get_async_user_service)
     ):
-    service.authenticate_user(email=email, password=password) 
+    await service.authenticate_user(email=email, password=password)
     token: str = service.create_access_token(data={"sub": email}) 
     response = RedirectResponse(url="/user_dashboard", status_code=status.HTTP_302_FOUND)
     response.set_cookie(
@@ -0,0 +1,74 @@
+from anyio import to_thread
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.util.concurrency import await_, in_greenlet
+from starlette.concurrency import run_in_threadpool
+
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from app.core.config import config
+
+T = TypeVar("T")
+
+_password_executor: ThreadPoolExecutor | None = None
+
+
+def configure_thread_pool() -> None:
+    """Sizes the thread pool that blocking calls and sync dependencies are dispatched to."""
+    limiter = to_thread.current_default_thread_limiter()
+    limiter.total_tokens = int(config.THREAD_POOL_SIZE)
+    logging.info(f"Blocking call thread pool sized to {limiter.total_tokens}")
+
+
+async def run_blocking(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Runs a blocking function, such as a database script with its retry backoff,
+    on the worker thread pool so it never stalls the event loop.
+    """
+    return await run_in_threadpool(func, *args, **kwargs)
+
+
+async def run_script(session: AsyncSession, script: Callable[..., T], **kwargs) -> T:
+    """
+    Runs a database script from app/db/scripts on an AsyncSession. run_sync hands the script
+    the session's synchronous facade and drives its queries over asyncpg on the event loop,
+    so request handlers and background jobs share one implementation of every script.
+    """
+    return await session.run_sync(lambda sync_session: script(session=sync_session, **kwargs))
+
+
+def retry_sleep(seconds: float) -> None:
+    """
+    Waits between script retries. Under run_script the script runs on the event loop, so
+    the backoff yields to the loop there instead of blocking every other request.
+    """
+    if in_greenlet():
+        await_(asyncio.sleep(seconds))
+    else:
+        time.sleep(seconds)
+
+
+def _get_password_executor() -> ThreadPoolExecutor:
+    global _password_executor
+    if _password_executor is None:
+        _password_executor = ThreadPoolExecutor(
+            max_workers=int(config.PASSWORD_HASH_WORKERS), thread_name_prefix="password"
+        )
+    return _password_executor
+
+
+async def run_password_hash(func: Callable[..., T], *args: Any) -> T:
+    """Runs a password hash or verification on the dedicated password hashing pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_password_executor(), functools.partial(func, *args))
+
+
+def shutdown_password_pool() -> None:
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False)
+        _password_executor = None
@@ -0,0 +1,47 @@
+from fastapi import HTTPException
+from fastapi.responses import ORJSONResponse
+
+import base64
+import binascii
+import json
+from typing import Any, Callable
+
+
+def encode_cursor(*key) -> str:
+    """Encodes the sort key of the last row on a page as an opaque cursor token."""
+    raw: bytes = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> list | None:
+    """Decodes a cursor token back into the sort key it was built from."""
+    if not cursor:
+        return None
+    try:
+        raw: bytes = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(key, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key
+
+
+def page_from_rows(rows: list, limit: int, key: Callable[[Any], tuple]) -> tuple[list, str | None]:
+    """
+    Trims rows fetched with limit + 1 to a page and builds the cursor for the next one.
+    The extra row only signals that another page exists.
+    """
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(*key(rows[-1]))
+    return rows, None
+
+
+def page_response(items: list[dict], next_cursor: str | None) -> ORJSONResponse:
+    """
+    Encodes a page of pre-serialized rows straight to JSON. Returning a response skips
+    FastAPI's validation of the return value against the response model, which would
+    otherwise rebuild every row as a model before encoding it.
+    """
+    return ORJSONResponse({"items": items, "next_cursor": next_cursor})
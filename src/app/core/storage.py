@@ -0,0 +1,282 @@
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException, UploadFile, status
+from fastapi.staticfiles import StaticFiles
+from pydantic import BaseModel
+
+import asyncio
+import hashlib
+import logging
+import os
+import string
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, BinaryIO, Iterator
+
+from app.core.config import config
+
+ALLOWED_CONTENT_TYPES: set[str] = {"image/jpeg", "image/png"}
+
+# Leading bytes that identify each of the allowed content types
+MAGIC_NUMBERS: dict[bytes, str] = {
+    b"\xff\xd8\xff": "image/jpeg",
+    b"\x89PNG\r\n\x1a\n": "image/png",
+}
+
+CONTENT_TYPE_EXTENSIONS: dict[str, str] = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+}
+
+
+class StoredFile(BaseModel):
+    filename: str
+    path: str
+    size: int
+    checksum: str
+    # False when identical content was already on disk and the existing file was reused.
+    # Only files a request created may be removed when it fails or turns out to be a duplicate
+    created: bool = True
+
+
+def sniff_content_type(head: bytes) -> str | None:
+    """Returns the allowed content type matching the file's leading bytes, if any."""
+    for magic, content_type in MAGIC_NUMBERS.items():
+        if head.startswith(magic):
+            return content_type
+    return None
+
+
+def shard_dir(image_name: str) -> str:
+    """
+    Returns the relative shard directory for an image, e.g. "3f/a2". Content addressed and
+    uuid names are already uniformly distributed hex, anything else is hashed first.
+    """
+    levels: int = int(config.DATA_DIR_SHARD_LEVELS)
+    width: int = int(config.DATA_DIR_SHARD_WIDTH)
+    key: str = os.path.splitext(image_name)[0].replace("-", "").lower()[:levels * width]
+    if len(key) < levels * width or not all(char in string.hexdigits for char in key):
+        key = hashlib.md5(image_name.encode()).hexdigest()
+    return os.path.join(*(key[level * width:(level + 1) * width] for level in range(levels)))
+
+
+def image_path(image_name: str) -> str:
+    """Returns the sharded location of an image inside the data directory."""
+    return os.path.join(config.DATA_DIR, shard_dir(image_name), image_name)
+
+
+def legacy_image_path(image_name: str) -> str:
+    """Returns the location of an image in the old flat data directory layout."""
+    return os.path.join(config.DATA_DIR, image_name)
+
+
+def resolve_image_path(image_name: str) -> str | None:
+    """
+    Finds an image in either layout. The sharded path is checked again after the flat one
+    so a file moved by a concurrent layout migration is never missed.
+    """
+    for path in (image_path(image_name), legacy_image_path(image_name), image_path(image_name)):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def iter_image_names() -> Iterator[str]:
+    """Yields the names of all stored images across both layouts."""
+    tmp_dir: str = os.path.abspath(config.UPLOAD_TMP_DIR)
+    for root, dirs, files in os.walk(config.DATA_DIR):
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(root, d)) != tmp_dir]
+        yield from (name for name in files if not name.startswith("."))
+
+
+class ShardedStaticFiles(StaticFiles):
+    """Serves /data/<image_name> from the sharded layout, falling back to the flat layout."""
+
+    def lookup_path(self, path: str) -> tuple[str, os.stat_result | None]:
+        if os.sep in path or (os.altsep and os.altsep in path):
+            return super().lookup_path(path)
+        sharded: str = os.path.join(shard_dir(path), path)
+        for candidate in (sharded, path, sharded):
+            full_path, stat_result = super().lookup_path(candidate)
+            if stat_result is not None:
+                return full_path, stat_result
+        return "", None
+
+
+def migrate_to_sharded_layout(workers: int = 8) -> int:
+    """
+    Moves files from the flat data directory into their shards. Each move is a single
+    atomic rename, so the app keeps serving every image while the migration runs.
+    """
+    def move(image_name: str) -> None:
+        destination: str = image_path(image_name)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(legacy_image_path(image_name), destination)
+
+    with os.scandir(config.DATA_DIR) as entries:
+        flat_names: list[str] = [
+            entry.name for entry in entries if entry.is_file() and not entry.name.startswith(".")
+        ]
+    logging.info(f"Moving {len(flat_names)} images into the sharded layout")
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in executor.map(move, flat_names):
+            pass
+    logging.info(f"Moved {len(flat_names)} images into the sharded layout")
+    return len(flat_names)
+
+
+def _temp_path() -> str:
+    os.makedirs(config.UPLOAD_TMP_DIR, exist_ok=True)
+    return os.path.join(config.UPLOAD_TMP_DIR, f"{uuid.uuid4()}.part")
+
+
+def _size_exceeded(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+        detail=f"File exceeds the maximum upload size of {max_size} bytes."
+    )
+
+
+def _publish(temp_path: str, filename: str, directory: str | None = None) -> tuple[str, bool]:
+    """
+    Moves a finished temp file into place, into its shard unless a directory is given, and
+    returns its path and whether it was created. Content addressed files that already exist
+    hold identical bytes, so the new copy is simply discarded and the existing file reused.
+    """
+    existing: str | None = None if directory else resolve_image_path(filename)
+    if existing:
+        os.remove(temp_path)
+        return existing, False
+    file_path: str = os.path.join(directory, filename) if directory else image_path(filename)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    os.replace(temp_path, file_path)
+    return file_path, True
+
+
+def discard_stored(stored: StoredFile) -> None:
+    """
+    Removes a stored file whose image could not be registered. A reused file may already
+    back another image or a concurrent upload, so only files this request created are removed.
+    """
+    if stored.created and os.path.exists(stored.path):
+        os.remove(stored.path)
+
+
+def discard_duplicate(stored: StoredFile, image_name: str) -> None:
+    """Removes a stored file that turned out to duplicate an existing image under another name."""
+    if stored.filename != image_name:
+        discard_stored(stored)
+
+
+async def iter_upload_chunks(file: UploadFile, chunk_size: int | None = None) -> AsyncIterator[bytes]:
+    """Yield the contents of an uploaded file in fixed-size chunks."""
+    chunk_size = int(chunk_size or config.UPLOAD_CHUNK_SIZE)
+    while chunk := await file.read(chunk_size):
+        yield chunk
+
+
+async def save_stream(
+        chunks: AsyncIterator[bytes],
+        extension: str,
+        max_size: int | None = None,
+        directory: str | None = None,
+        content_addressed: bool = True
+    ) -> StoredFile:
+    """
+    Streams chunks into a temporary file, hashing and size-checking them as they arrive,
+    then atomically renames the finished file into the data directory. Content addressed
+    files are named after their SHA-256 digest so identical uploads share one file.
+    """
+    max_size = int(max_size or config.MAX_UPLOAD_SIZE)
+    temp_path: str = _temp_path()
+
+    digest = hashlib.sha256()
+    size: int = 0
+    try:
+        async with aiofiles.open(temp_path, "wb") as out_file:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise _size_exceeded(max_size)
+                digest.update(chunk)
+                await out_file.write(chunk)
+        checksum: str = digest.hexdigest()
+        secure_filename: str = f"{checksum if content_addressed else uuid.uuid4()}{extension}"
+        file_path, created = await asyncio.to_thread(_publish, temp_path, secure_filename, directory)
+    except Exception:
+        if await aiofiles.os.path.exists(temp_path):
+            await aiofiles.os.remove(temp_path)
+        raise
+
+    logging.info(f"Stored {secure_filename} ({size} bytes)")
+    return StoredFile(
+        filename=secure_filename,
+        path=file_path,
+        size=size,
+        checksum=checksum,
+        created=created
+    )
+
+
+def save_fileobj(
+        fileobj: BinaryIO,
+        extension: str,
+        max_size: int | None = None
+    ) -> StoredFile:
+    """Blocking counterpart of save_stream for file objects read from worker threads."""
+    max_size = int(max_size or config.MAX_UPLOAD_SIZE)
+    chunk_size = int(config.UPLOAD_CHUNK_SIZE)
+    temp_path: str = _temp_path()
+
+    digest = hashlib.sha256()
+    size: int = 0
+    try:
+        with open(temp_path, "wb") as out_file:
+            while chunk := fileobj.read(chunk_size):
+                size += len(chunk)
+                if size > max_size:
+                    raise _size_exceeded(max_size)
+                digest.update(chunk)
+                out_file.write(chunk)
+        checksum: str = digest.hexdigest()
+        secure_filename: str = f"{checksum}{extension}"
+        file_path, created = _publish(temp_path, secure_filename)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return StoredFile(
+        filename=secure_filename,
+        path=file_path,
+        size=size,
+        checksum=checksum,
+        created=created
+    )
+
+
+async def save_upload(file: UploadFile, max_size: int | None = None) -> StoredFile:
+    """
+    Streams an uploaded image to disk, enforcing the content type and maximum size. The
+    type is sniffed from the leading bytes rather than taken from the client, and picks the
+    extension, so nothing but JPEG and PNG is ever served from /data and identical content
+    always gets the same name.
+    """
+    try:
+        head: bytes = await file.read(int(config.UPLOAD_CHUNK_SIZE))
+        content_type: str | None = sniff_content_type(head)
+        if content_type is None:
+            raise HTTPException(status_code=415, detail="Unsupported file type.")
+
+        async def chunks() -> AsyncIterator[bytes]:
+            yield head
+            async for chunk in iter_upload_chunks(file):
+                yield chunk
+
+        return await save_stream(chunks(), CONTENT_TYPE_EXTENSIONS[content_type], max_size=max_size)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error saving file: {e}")
+    finally:
+        await file.close()
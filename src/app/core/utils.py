@@ -11,5 +11,10 @@ def generate_id(
     return id
 
 
+def normalize_tags(tags: list[str]) -> list[str]:
+    """Strips tags and drops empty and repeated ones, keeping their order."""
+    return list(dict.fromkeys(tag.strip() for tag in tags if tag.strip()))
+
+
 def hash_ip(ip: str) -> str:
     return hashlib.sha256(ip.encode()).hexdigest()
\ No newline at end of file
@@ -1,11 +1,41 @@
 from sqlalchemy import String, create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
 
 from app.core.config import config
+from app.db.pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, get_pool_metrics
+from app.db.query_counter import install_query_counter
 
-engine = create_engine(config.db_url)
+POOL_OPTIONS: dict = {
+    "pool_size": int(config.DB_POOL_SIZE),
+    "max_overflow": int(config.DB_MAX_OVERFLOW),
+    "pool_timeout": float(config.DB_POOL_TIMEOUT),
+    "pool_recycle": int(config.DB_POOL_RECYCLE),
+    "pool_pre_ping": bool(config.DB_POOL_PRE_PING),
+}
+
+engine = create_engine(
+    config.db_url,
+    poolclass=InstrumentedQueuePool,
+    pool_logging_name="database",
+    connect_args={"options": f"-c statement_timeout={int(config.DB_STATEMENT_TIMEOUT_MS)}"},
+    **POOL_OPTIONS
+)
 SessionLocal = sessionmaker(bind=engine)
 
+async_engine = create_async_engine(
+    config.async_db_url,
+    poolclass=InstrumentedAsyncQueuePool,
+    pool_logging_name="async_database",
+    connect_args={"server_settings": {"statement_timeout": str(int(config.DB_STATEMENT_TIMEOUT_MS))}},
+    **POOL_OPTIONS
+)
+# Objects stay usable after commit; reloading expired attributes would need an await
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+install_query_counter(engine)
+install_query_counter(async_engine.sync_engine)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -13,5 +43,16 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_pool_stats() -> dict:
+    """Live connection pool statistics for sizing workers against the database."""
+    return {
+        "sync": get_pool_metrics("database").snapshot(engine.pool),
+        "async": get_pool_metrics("async_database").snapshot(async_engine.sync_engine.pool),
+    }
+
 class Base(DeclarativeBase):
-    pass
\ No newline at end of file
+    pass
@@ -0,0 +1,71 @@
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+import time
+from threading import Lock
+
+
+class PoolMetrics:
+    """Cumulative checkout statistics for one connection pool."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.checkouts: int = 0
+        self.timeouts: int = 0
+        self.total_wait: float = 0.0
+        self.max_wait: float = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+
+    def snapshot(self, pool: Pool) -> dict:
+        with self._lock:
+            attempts: int = self.checkouts + self.timeouts
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.total_wait, 6),
+                "wait_seconds_avg": round(self.total_wait / attempts, 6) if attempts else 0.0,
+                "wait_seconds_max": round(self.max_wait, 6),
+            }
+
+
+# Keyed by the pool's logging name so the metrics survive engine.dispose() recreating the pool
+POOL_METRICS: dict[str, PoolMetrics] = {}
+
+
+def get_pool_metrics(name: str) -> PoolMetrics:
+    return POOL_METRICS.setdefault(name, PoolMetrics())
+
+
+class InstrumentedPoolMixin:
+    """Times how long each checkout waits for a free connection."""
+
+    def _do_get(self):
+        metrics: PoolMetrics = get_pool_metrics(self.logging_name or "default")
+        start: float = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
@@ -0,0 +1,91 @@
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+
+class QueryCounter:
+    """Statements executed while the counter was active, in order."""
+
+    def __init__(self):
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+
+# A context variable rather than a global so concurrent requests are counted separately.
+# Worker threads started with run_blocking inherit a copy of the context, so their
+# queries land in the same counter.
+_current_counter: ContextVar[QueryCounter | None] = ContextVar("query_counter", default=None)
+
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    counter: QueryCounter | None = _current_counter.get()
+    if counter is not None:
+        counter.statements.append(statement)
+
+
+def install_query_counter(engine: Engine) -> None:
+    """Counts every statement the engine sends to the database while a counter is active."""
+    if not event.contains(engine, "before_cursor_execute", _record_statement):
+        event.listen(engine, "before_cursor_execute", _record_statement)
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryCounter]:
+    counter = QueryCounter()
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryCounter]:
+    """
+    Fails if the block issues more than limit statements, listing them so the extra
+    queries are easy to spot, e.g.
+
+        with assert_max_queries(1):
+            client.get("/api/v1/images?limit=100")
+    """
+    with count_queries() as counter:
+        yield counter
+    if counter.count > limit:
+        listing: str = "\n".join(f"  {index}. {statement}" for index, statement in enumerate(counter.statements, 1))
+        raise AssertionError(f"Expected at most {limit} queries, {counter.count} were executed:\n{listing}")
+
+
+class QueryCountMiddleware:
+    """
+    Reports the number of statements each request executed in an X-Query-Count header and
+    logs requests over the warning threshold, so N+1 regressions show up while developing.
+    """
+
+    def __init__(self, app: ASGIApp, warn_threshold: int):
+        self.app = app
+        self.warn_threshold = warn_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with count_queries() as counter:
+            async def send_with_count(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    message.setdefault("headers", [])
+                    message["headers"] = [*message["headers"], (b"x-query-count", str(counter.count).encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_with_count)
+
+        if counter.count > self.warn_threshold:
+            logging.warning(f"{scope['method']} {scope['path']} executed {counter.count} queries")
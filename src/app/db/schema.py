@@ -1,7 +1,9 @@
 from __future__ import annotations
 
-from sqlalchemy import String, DateTime, ForeignKey, Float, Text, Integer, Boolean
+from sqlalchemy import String, DateTime, ForeignKey, Float, Text, Integer, Boolean, Index, Enum, BigInteger, Sequence, Computed, text, func
 from datetime import datetime, timezone
+import enum
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm import Mapped, mapped_column
 
@@ -26,23 +28,109 @@ class User(Base):
     def hash_password(password: str) -> str:
         return password_hash.hash(password)
 
+# Shared by images and tombstones: every change to an image, its label or its deletion takes
+# the next value, so exports can fetch only what changed after a watermark
+CHANGE_SEQ = Sequence("change_seq", metadata=Base.metadata)
+
+# The writing transaction's id, stored next to change_seq. Sequence values are drawn before
+# commit, so a later commit can land below a watermark taken on them; every transaction older
+# than the oldest one still running has finished, so exports page on this instead
+CURRENT_XACT_ID = text("pg_current_xact_id()::text::bigint")
+
+# Text search configuration the prompt index is built with; queries must use the same one
+TEXT_SEARCH_CONFIG: str = "english"
+
+class ImageStatus(str, enum.Enum):
+    UNLABELLED = "unlabelled"
+    IN_PROGRESS = "in_progress"
+    LABELLED = "labelled"
+
 class Image(Base):
     __tablename__ = "images"
 
     id: Mapped[str] = mapped_column(primary_key=True)
-    image_name: Mapped[str] = mapped_column(String)
+    image_name: Mapped[str] = mapped_column(String, unique=True, index=True)
     version: Mapped[str] = mapped_column(String, default="v1")
-    status: Mapped[str] = mapped_column(String, default="unlabelled")
+    # Stored as a native Postgres enum: 4 bytes per row instead of a free-form string
+    status: Mapped[ImageStatus] = mapped_column(
+        Enum(ImageStatus, name="image_status", values_callable=lambda statuses: [s.value for s in statuses]),
+        default=ImageStatus.UNLABELLED,
+        server_default=ImageStatus.UNLABELLED.value
+    )
+    # SHA-256 of the file contents, used to resolve duplicate uploads to the existing image
+    checksum: Mapped[str | None] = mapped_column(String(64), unique=True, index=True, nullable=True)
+    # Labelling lease: images being labelled are "in_progress" until the lease expires
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    claimed_by: Mapped[str | None] = mapped_column(String, nullable=True)
+    change_seq: Mapped[int] = mapped_column(
+        BigInteger,
+        server_default=CHANGE_SEQ.next_value(),
+        onupdate=CHANGE_SEQ.next_value(),
+        index=True
+    )
+    change_xid: Mapped[int] = mapped_column(
+        BigInteger,
+        server_default=CURRENT_XACT_ID,
+        onupdate=CURRENT_XACT_ID,
+        index=True
+    )
+    # 64 bit DCT perceptual hash (as a signed BIGINT); near duplicates differ in a few bits
+    phash: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    # Triage metrics, measured after upload; quality_score is NULL until they are
+    width: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    height: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    blur_score: Mapped[float | None] = mapped_column(Float, nullable=True)
+    brightness: Mapped[float | None] = mapped_column(Float, nullable=True)
+    contrast: Mapped[float | None] = mapped_column(Float, nullable=True)
+    entropy: Mapped[float | None] = mapped_column(Float, nullable=True)
+    quality_score: Mapped[float | None] = mapped_column(Float, nullable=True)
 
     label: Mapped[ImageLabel] = relationship("ImageLabel", back_populates="image", uselist=False)
 
+    __table_args__ = (
+        # Serves the labelling queue (WHERE status = 'unlabelled' ORDER BY id LIMIT n) while
+        # only indexing the rows still waiting for a label
+        Index("ix_images_unlabelled_id", "id", postgresql_where=text("status = 'unlabelled'")),
+        # Serves held lease lookups and the expired lease sweep
+        Index("ix_images_in_progress_lease", "lease_expires_at", postgresql_where=text("status = 'in_progress'")),
+        # Lets the hash backfill page through the images it has not hashed yet
+        Index("ix_images_phash_missing", "id", postgresql_where=text("phash IS NULL")),
+        Index("ix_images_quality_missing", "id", postgresql_where=text("quality_score IS NULL")),
+        # Serves the best-first gallery and labelling queue orders (unanalysed images last)
+        Index("ix_images_quality_order", text("coalesce(quality_score, -1) DESC"), "id"),
+    )
+    # Fetch the generated change_seq with RETURNING instead of leaving it expired after a flush
+    __mapper_args__ = {"eager_defaults": True}
+
 class ImageLabel(Base):
     __tablename__ = "image_labels"
 
     id: Mapped[str] = mapped_column(primary_key=True)
     prompt: Mapped[str] = mapped_column(String)
-    tags: Mapped[str] = mapped_column(String)
+    tags: Mapped[list[str]] = mapped_column(ARRAY(String), server_default="{}")
+    # Maintained by Postgres from the prompt and never loaded with the label
+    prompt_tsv: Mapped[str] = mapped_column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(prompt, ''))", persisted=True),
+        deferred=True
+    )
     gender: Mapped[str] = mapped_column(String)
-    image_id: Mapped[str] = mapped_column(ForeignKey("images.id"))
+    image_id: Mapped[str] = mapped_column(ForeignKey("images.id"), unique=True, index=True)
+
+    image: Mapped[Image] = relationship("Image", back_populates="label", uselist=False)
+
+    __table_args__ = (
+        # Inverted index over the tag arrays: serves @> (all of) and && (any of) tag filters
+        Index("ix_image_labels_tags", "tags", postgresql_using="gin"),
+        Index("ix_image_labels_prompt_tsv", "prompt_tsv", postgresql_using="gin"),
+    )
 
-    image: Mapped[Image] = relationship("Image", back_populates="label", uselist=False)
\ No newline at end of file
+class Tombstone(Base):
+    """Records a deleted image or label so incremental exports can tell consumers to drop it."""
+    __tablename__ = "tombstones"
+
+    change_seq: Mapped[int] = mapped_column(BigInteger, primary_key=True, server_default=CHANGE_SEQ.next_value())
+    change_xid: Mapped[int] = mapped_column(BigInteger, server_default=CURRENT_XACT_ID, index=True)
+    image_id: Mapped[str] = mapped_column(String)
+    image_name: Mapped[str] = mapped_column(String)
+    deleted_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -1,4 +1,5 @@
 from tenacity import retry, stop_after_attempt, wait_exponential
+from sqlalchemy import text
 from sqlalchemy.exc import OperationalError, StatementError, DatabaseError
 from psycopg2.errors import DatatypeMismatch
 
@@ -9,6 +10,7 @@ from app.db.db import Base, engine
 from app.db.schema import (
     User
 )
+from app.db.scripts.migrations import stamp_migrations
 
 RETRYABLE_EXCEPTIONS = (OperationalError, StatementError)
 
@@ -24,6 +26,7 @@ def create_all_tables():
     try:
         logging.info("Creating tables")
         Base.metadata.create_all(bind=engine)
+        stamp_migrations()
         logging.info("Tables created")
     except DatabaseError as e:
         if isinstance(e.orig, DatatypeMismatch):
@@ -45,6 +48,8 @@ def delete_all_tables():
     try:
         logging.info("Deleting tables")
         Base.metadata.drop_all(bind=engine)
+        with engine.begin() as connection:
+            connection.execute(text("DROP TABLE IF EXISTS schema_migrations"))
         logging.info("Tables deleted")
     except RETRYABLE_EXCEPTIONS as e:
         logging.error(f"There was a database error: {e}, retrying")
\ No newline at end of file
@@ -0,0 +1,45 @@
+from sqlalchemy import Insert, Text, cast, func, insert, select
+from sqlalchemy.orm import Session
+from tenacity import retry, stop_after_attempt, wait_exponential
+from sqlalchemy.exc import OperationalError, StatementError
+
+import logging
+
+from app.db.schema import CHANGE_SEQ, Image, Tombstone
+from app.core.config import config
+
+# Define which exceptions are transient and should trigger a retry
+RETRYABLE_EXCEPTIONS = (OperationalError, StatementError)
+
+
+def tombstone_images(*criteria) -> Insert:
+    """Builds an INSERT recording a tombstone for every image matching the criteria."""
+    return insert(Tombstone).from_select(
+        ["image_id", "image_name"],
+        select(Image.id, Image.image_name).where(*criteria)
+    )
+
+
+def next_change_seq():
+    """SQL expression taking the next change sequence value, for changes made through a related row."""
+    return CHANGE_SEQ.next_value()
+
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+)
+def get_change_watermark(session: Session) -> int:
+    """
+    Returns the id of the oldest transaction still running. Every change with a lower
+    change_xid has committed or rolled back, so a later export starting here cannot miss one.
+    """
+    try:
+        return int(session.scalar(select(cast(func.pg_snapshot_xmin(func.pg_current_snapshot()), Text))))
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
@@ -1,18 +1,27 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import Row, String, cast, delete, false, func, null, select, true, union_all, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session, joinedload
 from tenacity import retry, stop_after_attempt, wait_exponential
 from sqlalchemy.exc import OperationalError, StatementError
 from fastapi import HTTPException
 
 import logging
+from typing import Iterator
 
-from app.db.schema import ImageLabel, Image
+from app.db.schema import ImageLabel, Image, ImageStatus, Tombstone
 from app.models.image_label_model import ImageLabelCreate, ImageLabelUpdate
 from app.core.config import config
-from app.core.utils import generate_id
+from app.core.concurrency import retry_sleep
+from app.core.utils import generate_id, normalize_tags
+from app.core.pagination import decode_cursor, page_from_rows
+from app.db.scripts.change_scripts import next_change_seq, tombstone_images
 
 # Define which exceptions are transient and should trigger a retry
 RETRYABLE_EXCEPTIONS = (OperationalError, StatementError)
 
+# Labels are serialized with their image's name; joining it avoids one lazy load per label
+LABEL_WITH_IMAGE = select(ImageLabel).options(joinedload(ImageLabel.image))
+
 @retry(
     stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
     wait=wait_exponential(
@@ -20,26 +29,45 @@ RETRYABLE_EXCEPTIONS = (OperationalError, StatementError)
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
-def create_image_label(image_label: ImageLabelCreate, session: Session) -> ImageLabel:
+def create_image_label(image_label: ImageLabelCreate, session: Session) -> tuple[ImageLabel, list[str]]:
+    """
+    Labels an image and returns its label with the tags the label had before. An image has
+    one label, so labelling it again updates that label in place rather than replacing it.
+    """
     try:
         logging.info(f"Creating image label with name: {image_label.image_name}")
-        image: Image = session.query(Image).filter(Image.image_name == image_label.image_name).first()
+        image: Image | None = session.scalar(
+            select(Image).options(joinedload(Image.label)).where(Image.image_name == image_label.image_name)
+        )
         if not image:
             raise HTTPException(status_code=404, detail="Image not found")
-        id: str = generate_id(prefix="IMAGE_LABEL")
-        new_image_label: ImageLabel = ImageLabel(
-            id=id,
-            prompt=image_label.prompt,
-            tags=image_label.tags,
-            gender=image_label.gender,
-            image_id=image.id
-        )
-        image.status = "labelled"
-        image.label = new_image_label
+        previous_tags: list[str] = []
+        if image.label:
+            new_image_label: ImageLabel = image.label
+            previous_tags = list(new_image_label.tags)
+            new_image_label.prompt = image_label.prompt
+            new_image_label.tags = normalize_tags(image_label.tags)
+            new_image_label.gender = image_label.gender
+        else:
+            id: str = generate_id(prefix="IMAGE_LABEL")
+            new_image_label = ImageLabel(
+                id=id,
+                prompt=image_label.prompt,
+                tags=normalize_tags(image_label.tags),
+                gender=image_label.gender,
+                image_id=image.id
+            )
+            image.label = new_image_label
+        image.status = ImageStatus.LABELLED
+        image.claimed_by = None
+        image.lease_expires_at = None
+        # Labels are exported through their image, so the image carries the change
+        image.change_seq = next_change_seq()
         session.commit()
         session.refresh(new_image_label)
-        return new_image_label
+        return new_image_label, previous_tags
     except RETRYABLE_EXCEPTIONS as e:
         logging.error(f"There was a database error: {e}, retrying")
         session.rollback()
@@ -51,17 +79,20 @@ def create_image_label(image_label: ImageLabelCreate, session: Session) -> Image
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
 def update_image_label(image_label_id: str, image_label: ImageLabelUpdate, session: Session) -> ImageLabel:
     try:
         logging.info(f"Updating image label with id: {image_label_id}")
-        image_label_to_update: ImageLabel = session.query(ImageLabel).filter(ImageLabel.id == image_label_id).first()
+        image_label_to_update: ImageLabel | None = session.scalar(LABEL_WITH_IMAGE.where(ImageLabel.id == image_label_id))
         if not image_label_to_update:
             raise HTTPException(status_code=404, detail="Image label not found")
+        # Labels are exported through their image, so the image carries the change
+        image_label_to_update.image.change_seq = next_change_seq()
         if image_label.prompt:
             image_label_to_update.prompt = image_label.prompt
         if image_label.tags:
-            image_label_to_update.tags = ','.join(image_label.tags)
+            image_label_to_update.tags = normalize_tags(image_label.tags)
         if image_label.gender:
             image_label_to_update.gender = image_label.gender
         session.commit()
@@ -78,13 +109,26 @@ def update_image_label(image_label_id: str, image_label: ImageLabelUpdate, sessi
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
-def delete_image_label(image_label_id: str, session: Session) -> None:
+def delete_image_label(image_label_id: str, session: Session) -> list[str] | None:
     try:
         logging.info(f"Deleting image label with id: {image_label_id}")
-        session.query(ImageLabel).filter(ImageLabel.id == image_label_id).delete()
+        # The image leaves the labelled dataset and goes back to the labelling queue
+        labelled_image = select(ImageLabel.image_id).where(ImageLabel.id == image_label_id).scalar_subquery()
+        session.execute(tombstone_images(Image.id == labelled_image))
+        session.execute(
+            update(Image)
+            .where(Image.id == labelled_image)
+            .values(status=ImageStatus.UNLABELLED)
+            .execution_options(synchronize_session=False)
+        )
+        tags: list[str] | None = session.scalar(
+            delete(ImageLabel).where(ImageLabel.id == image_label_id).returning(ImageLabel.tags)
+        )
         session.commit()
         logging.info(f"Deleted image label with id: {image_label_id}")
+        return tags
     except RETRYABLE_EXCEPTIONS as e:
         logging.error(f"There was a database error: {e}, retrying")
         session.rollback()
@@ -96,10 +140,11 @@ def delete_image_label(image_label_id: str, session: Session) -> None:
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
 def get_image_label(image_label_id: str, session: Session) -> ImageLabel | None:
     try:
-        image_label: ImageLabel = session.query(ImageLabel).filter(ImageLabel.id == image_label_id).first()
+        image_label: ImageLabel | None = session.scalar(LABEL_WITH_IMAGE.where(ImageLabel.id == image_label_id))
         if not image_label:
             raise HTTPException(status_code=404, detail="Image label not found")
         return image_label
@@ -114,14 +159,120 @@ def get_image_label(image_label_id: str, session: Session) -> ImageLabel | None:
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
 def get_all_image_labels(limit: int, offset: int, session: Session) -> list[ImageLabel]:
     try:
-        if limit and offset:
-            image_labels: list[ImageLabel] = session.query(ImageLabel).limit(limit).offset(offset).all()
-        else:
-            image_labels: list[ImageLabel] = session.query(ImageLabel).all()
+        query = session.query(ImageLabel).options(joinedload(ImageLabel.image))
+        if limit is not None:
+            query = query.limit(limit)
+        if offset is not None:
+            query = query.offset(offset)
+        image_labels: list[ImageLabel] = query.all()
         return image_labels
     except RETRYABLE_EXCEPTIONS as e:
         logging.error(f"There was a database error: {e}, retrying")
-        session.rollback()
\ No newline at end of file
+        session.rollback()
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
+)
+def get_image_labels_page(limit: int, cursor: str | None, session: Session) -> tuple[list[ImageLabel], str | None]:
+    """Returns one page of image labels in id order, seeking past the cursor instead of using OFFSET."""
+    try:
+        statement = LABEL_WITH_IMAGE.order_by(ImageLabel.id).limit(limit + 1)
+        after: list | None = decode_cursor(cursor)
+        if after:
+            statement = statement.where(ImageLabel.id > after[0])
+        image_labels: list[ImageLabel] = session.scalars(statement).all()
+        return page_from_rows(image_labels, limit, key=lambda image_label: (image_label.id,))
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
+
+# Not retried: a retry after some batches were already yielded would repeat them
+def iter_labelled_image_batches(
+        batch_size: int,
+        session: Session,
+        since: int | None = None,
+        until: int | None = None
+    ) -> Iterator[list[Row]]:
+    """
+    Streams labelled images joined with their labels, batch_size rows at a time. yield_per
+    runs the query on a server side cursor, so memory stays flat no matter how many rows
+    the table holds.
+
+    since and until are change watermarks, ids of transactions. Without since every labelled
+    image changed before until is returned in id order. With since, only images changed in
+    [since, until) are returned, merged with tombstones for deleted images and labels, in
+    change order so consumers can apply them as they arrive.
+    """
+    labelled = (
+        select(
+            Image.id,
+            Image.image_name,
+            Image.checksum,
+            ImageLabel.prompt,
+            ImageLabel.tags,
+            ImageLabel.gender,
+            Image.change_seq,
+            false().label("deleted"),
+        )
+        .join(ImageLabel, ImageLabel.image_id == Image.id)
+        .where(Image.status == ImageStatus.LABELLED)
+    )
+    if until is not None:
+        labelled = labelled.where(Image.change_xid < until)
+    if since is None:
+        statement = labelled.order_by(Image.id)
+    else:
+        changed = labelled.where(Image.change_xid >= since)
+        removed = select(
+            Tombstone.image_id.label("id"),
+            Tombstone.image_name,
+            cast(null(), String).label("checksum"),
+            cast(null(), String).label("prompt"),
+            cast(null(), ARRAY(String)).label("tags"),
+            cast(null(), String).label("gender"),
+            Tombstone.change_seq,
+            true().label("deleted"),
+        ).where(Tombstone.change_xid >= since)
+        if until is not None:
+            removed = removed.where(Tombstone.change_xid < until)
+        changes = union_all(changed, removed).subquery()
+        statement = select(changes).order_by(changes.c.change_seq)
+    result = session.execute(statement.execution_options(yield_per=batch_size))
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+
+def tag_counts_statement():
+    """Every distinct tag with the number of labels carrying it."""
+    tags = select(func.unnest(ImageLabel.tags).label("tag")).subquery()
+    return select(tags.c.tag, func.count()).group_by(tags.c.tag)
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
+)
+def get_tag_counts(session: Session) -> list[tuple[str, int]]:
+    try:
+        rows = session.execute(tag_counts_statement()).all()
+        return [(tag, count) for tag, count in rows]
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
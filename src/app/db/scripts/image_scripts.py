@@ -1,18 +1,54 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import Float, Row, Select, and_, bindparam, cast, func, literal_column, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session, contains_eager, joinedload
 from tenacity import retry, stop_after_attempt, wait_exponential
-from sqlalchemy.exc import OperationalError, StatementError
+from sqlalchemy.exc import IntegrityError, OperationalError, StatementError
 from fastapi import HTTPException
 
 import logging
+from typing import Callable
+from datetime import datetime, timedelta, timezone
 
-from app.db.schema import Image
+from app.db.schema import TEXT_SEARCH_CONFIG, Image, ImageLabel, ImageStatus
 from app.models.image_model import ImageCreate, ImageUpdate
 from app.core.config import config
+from app.core.concurrency import retry_sleep
 from app.core.utils import generate_id
+from app.core.pagination import decode_cursor, page_from_rows
+from app.db.scripts.change_scripts import tombstone_images
 
 # Define which exceptions are transient and should trigger a retry
 RETRYABLE_EXCEPTIONS = (OperationalError, StatementError)
 
+# Image reads are serialized together with their label; joining it avoids one lazy load per image
+IMAGE_WITH_LABEL = select(Image).options(joinedload(Image.label))
+
+# Best first order over quality scores with unanalysed images last; spelled exactly like
+# the ix_images_quality_order expression (a bound -1 would not match the index)
+QUALITY_SORT_KEY = func.coalesce(Image.quality_score, literal_column("-1"))
+
+# Columns written by the quality analysis, in the order the metrics are stored
+QUALITY_COLUMNS: tuple[str, ...] = (
+    "width", "height", "blur_score", "brightness", "contrast", "entropy", "quality_score"
+)
+
+
+def meets_min_quality(min_quality: float):
+    """
+    Images scoring at least min_quality, and those not analysed yet: the filter drops images
+    known to be poor, not fresh uploads waiting for the analysis job.
+    """
+    return or_(Image.quality_score.is_(None), Image.quality_score >= min_quality)
+
+
+def label_queue(statement: Select, min_quality: float | None, order_by_quality: bool) -> Select:
+    """Applies the labelling queue's quality filter and order to a query over unlabelled images."""
+    if min_quality is not None:
+        statement = statement.where(meets_min_quality(min_quality))
+    if order_by_quality:
+        return statement.order_by(QUALITY_SORT_KEY.desc(), Image.id)
+    return statement.order_by(Image.id)
+
 
 @retry(
     stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
@@ -21,6 +57,7 @@ RETRYABLE_EXCEPTIONS = (OperationalError, StatementError)
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
 def create_image(image: ImageCreate, session: Session) -> Image:
     try:
@@ -28,12 +65,88 @@ def create_image(image: ImageCreate, session: Session) -> Image:
         id: str = generate_id(prefix="IMAGE")
         new_image: Image = Image(
             id=id,
-            image_name=image.image_name
+            image_name=image.image_name,
+            checksum=image.checksum
         )
         session.add(new_image)
         session.commit()
         session.refresh(new_image)
         return new_image
+    except IntegrityError:
+        # Another request stored the same content first; resolve to that image. Without a
+        # checksum the lookup would match any legacy image, so the conflict is the caller's
+        session.rollback()
+        if image.checksum is None:
+            raise
+        existing: Image | None = get_image_by_checksum(checksum=image.checksum, session=session)
+        if not existing:
+            raise
+        return existing
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
+
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
+)
+def create_images(images: list[ImageCreate], session: Session) -> list[tuple[Image, bool]]:
+    """
+    Inserts all the new images with a single bulk insert and commit. Images whose checksum
+    is already stored, or repeated within the batch, resolve to the existing row. Returns
+    an (image, created) pair for every input, in order.
+    """
+    if not images:
+        return []
+    try:
+        logging.info(f"Creating {len(images)} images")
+        checksums: list[str] = [image.checksum for image in images if image.checksum]
+        existing: dict[str, Image] = {
+            image.checksum: image for image in get_images_by_checksums(checksums=checksums, session=session)
+        }
+        rows: list[dict] = []
+        seen: set[str] = set(existing)
+        for image in images:
+            if image.checksum and image.checksum in seen:
+                continue
+            if image.checksum:
+                seen.add(image.checksum)
+            rows.append({
+                "id": generate_id(prefix="IMAGE"),
+                "image_name": image.image_name,
+                "version": image.version,
+                "status": image.status,
+                "checksum": image.checksum,
+            })
+        new_images: list[Image] = []
+        if rows:
+            statement = insert(Image).on_conflict_do_nothing(index_elements=[Image.checksum]).returning(Image)
+            new_images = session.scalars(statement, rows).all()
+        session.commit()
+
+        by_name: dict[str, Image] = {image.image_name: image for image in new_images}
+        existing.update({image.checksum: image for image in new_images if image.checksum})
+        # Rows that lost a race with a concurrent insert of the same content
+        missing: list[str] = [
+            image.checksum for image in images if image.checksum and image.checksum not in existing
+        ]
+        existing.update({
+            image.checksum: image for image in get_images_by_checksums(checksums=missing, session=session)
+        })
+
+        results: list[tuple[Image, bool]] = []
+        for image in images:
+            if image.image_name in by_name:
+                results.append((by_name.pop(image.image_name), True))
+            else:
+                results.append((existing[image.checksum], False))
+        return results
     except RETRYABLE_EXCEPTIONS as e:
         logging.error(f"There was a database error: {e}, retrying")
         session.rollback()
@@ -46,10 +159,11 @@ def create_image(image: ImageCreate, session: Session) -> Image:
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
 def get_image(image_id: str, session: Session) -> Image | None:
     try:
-        image: Image = session.query(Image).filter(Image.id == image_id).first()
+        image: Image | None = session.scalar(IMAGE_WITH_LABEL.where(Image.id == image_id))
         if not image:
             raise HTTPException(status_code=404, detail="Image not found")
         return image
@@ -64,10 +178,11 @@ def get_image(image_id: str, session: Session) -> Image | None:
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
 def get_image_by_name(image_name: str, session: Session) -> Image | None:
     try:
-        image: Image = session.query(Image).filter(Image.image_name == image_name).first()
+        image: Image | None = session.scalar(IMAGE_WITH_LABEL.where(Image.image_name == image_name))
         if not image:
             raise HTTPException(status_code=404, detail="Image not found")
         return image
@@ -82,10 +197,53 @@ def get_image_by_name(image_name: str, session: Session) -> Image | None:
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
+)
+def get_image_by_checksum(checksum: str, session: Session) -> Image | None:
+    """Returns the image with the given content checksum, or None when it is new."""
+    try:
+        return session.scalar(IMAGE_WITH_LABEL.where(Image.checksum == checksum))
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
+)
+def get_images_by_checksums(checksums: list[str], session: Session) -> list[Image]:
+    if not checksums:
+        return []
+    try:
+        return session.scalars(IMAGE_WITH_LABEL.where(Image.checksum.in_(checksums))).all()
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
-def get_unlabelled_image(session: Session) -> Image | None:
+def get_unlabelled_image(
+        session: Session,
+        min_quality: float | None = None,
+        order_by_quality: bool = False
+    ) -> Image | None:
     try:
-        image: Image  = session.query(Image).filter(Image.status == "unlabelled").first()
+        image: Image | None = session.scalar(
+            label_queue(IMAGE_WITH_LABEL.where(Image.status == ImageStatus.UNLABELLED), min_quality, order_by_quality)
+            .limit(1)
+        )
         return image
     except RETRYABLE_EXCEPTIONS as e:
         logging.error(f"There was a database error: {e}, retrying")
@@ -98,10 +256,12 @@ def get_unlabelled_image(session: Session) -> Image | None:
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
 def delete_image(image_id: str, session: Session) -> None:
     try:
         logging.info(f"Deleting image with id: {image_id}")
+        session.execute(tombstone_images(Image.id == image_id))
         session.query(Image).filter(Image.id == image_id).delete()
         session.commit()
         logging.info(f"Deleted image with id: {image_id}")
@@ -117,6 +277,7 @@ def delete_image(image_id: str, session: Session) -> None:
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
 def update_image(image_id: str, image: ImageUpdate, session: Session) -> Image:
     try:
@@ -140,14 +301,383 @@ def update_image(image_id: str, image: ImageUpdate, session: Session) -> Image:
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
 def get_all_images(limit: int, offset: int, session: Session) -> list[Image]:
     try:
-        if limit and offset:
-            images: list[Image] = session.query(Image).limit(limit).offset(offset).all()
-        else:
-            images: list[Image] = session.query(Image).all()
+        query = session.query(Image).options(joinedload(Image.label))
+        if limit is not None:
+            query = query.limit(limit)
+        if offset is not None:
+            query = query.offset(offset)
+        images: list[Image] = query.all()
         return images
     except RETRYABLE_EXCEPTIONS as e:
         logging.error(f"There was a database error: {e}, retrying")
-        session.rollback()
\ No newline at end of file
+        session.rollback()
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
+)
+def get_image_names_page(
+        limit: int,
+        cursor: str | None,
+        session: Session,
+        min_quality: float | None = None,
+        order_by_quality: bool = False
+    ) -> tuple[list[str], str | None]:
+    """
+    Returns one page of image names, selecting only the columns the gallery needs. Pages
+    are in id order, or best quality first (unanalysed images last) with order_by_quality.
+    With min_quality, images scoring below it are left out; unanalysed ones stay listed,
+    as they do in the labelling queue.
+    """
+    try:
+        after: list | None = decode_cursor(cursor)
+        statement = select(Image.id, Image.image_name).limit(limit + 1)
+        if min_quality is not None:
+            statement = statement.where(meets_min_quality(min_quality))
+        if order_by_quality:
+            statement = statement.add_columns(QUALITY_SORT_KEY.label("quality")).order_by(QUALITY_SORT_KEY.desc(), Image.id)
+            if after:
+                if len(after) != 2:
+                    raise HTTPException(status_code=400, detail="Invalid cursor")
+                statement = statement.where(
+                    or_(QUALITY_SORT_KEY < after[0], and_(QUALITY_SORT_KEY == after[0], Image.id > after[1]))
+                )
+            key = lambda row: (row.quality, row.id)
+        else:
+            statement = statement.order_by(Image.id)
+            if after:
+                statement = statement.where(Image.id > after[0])
+            key = lambda row: (row.id,)
+        rows = session.execute(statement).all()
+        rows, next_cursor = page_from_rows(rows, limit, key=key)
+        return [row.image_name for row in rows], next_cursor
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
+)
+def get_images_page(limit: int, cursor: str | None, session: Session) -> tuple[list[Image], str | None]:
+    """Returns one page of images in id order, seeking past the cursor instead of using OFFSET."""
+    try:
+        statement = IMAGE_WITH_LABEL.order_by(Image.id).limit(limit + 1)
+        after: list | None = decode_cursor(cursor)
+        if after:
+            statement = statement.where(Image.id > after[0])
+        images: list[Image] = session.scalars(statement).all()
+        return page_from_rows(images, limit, key=lambda image: (image.id,))
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
+)
+def claim_unlabelled_images(
+        count: int,
+        claimed_by: str | None,
+        session: Session,
+        min_quality: float | None = None,
+        order_by_quality: bool = False
+    ) -> list[Image]:
+    """
+    Atomically leases up to count unlabelled images. FOR UPDATE SKIP LOCKED lets concurrent
+    annotators claim disjoint rows without waiting on each other's locks.
+
+    An annotator who still holds unexpired leases gets those images back first, topped up
+    with newly leased images to count. Fewer than count come back only when the queue has
+    no more unlocked images passing the quality filter.
+    """
+    try:
+        now: datetime = datetime.now(timezone.utc)
+        held: list[Image] = []
+        if claimed_by:
+            held = session.scalars(
+                select(Image)
+                .where(Image.status == ImageStatus.IN_PROGRESS, Image.claimed_by == claimed_by, Image.lease_expires_at > now)
+                .order_by(Image.id)
+                .limit(count)
+            ).all()
+            if len(held) == count:
+                return held
+        # MATERIALIZED makes the locked pick run exactly once. As an IN (subquery) the planner
+        # may re-evaluate it, so the LIMIT and SKIP LOCKED could claim more or fewer rows.
+        picked = (
+            label_queue(select(Image.id).where(Image.status == ImageStatus.UNLABELLED), min_quality, order_by_quality)
+            .limit(count - len(held))
+            .with_for_update(skip_locked=True)
+            .cte("picked")
+            .prefix_with("MATERIALIZED")
+        )
+        statement = (
+            update(Image)
+            .where(Image.id == picked.c.id)
+            .values(
+                status=ImageStatus.IN_PROGRESS,
+                claimed_by=claimed_by,
+                lease_expires_at=now + timedelta(seconds=int(config.LABEL_LEASE_SECONDS))
+            )
+            .returning(Image)
+            .execution_options(synchronize_session=False)
+        )
+        images: list[Image] = session.scalars(statement).all()
+        session.commit()
+        # RETURNING comes back in no particular order; hand the images out in queue order
+        images = sorted(images, key=lambda image: image.id)
+        if order_by_quality:
+            images.sort(key=lambda image: -1 if image.quality_score is None else image.quality_score, reverse=True)
+        return held + images
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
+)
+def release_expired_leases(session: Session) -> int:
+    """Returns images whose labelling lease has expired to the unlabelled queue."""
+    try:
+        result = session.execute(
+            update(Image)
+            .where(Image.status == ImageStatus.IN_PROGRESS, Image.lease_expires_at < datetime.now(timezone.utc))
+            .values(status=ImageStatus.UNLABELLED, claimed_by=None, lease_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        return result.rowcount
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
+
+def build_search_statement(
+        tags_all: list[str],
+        tags_any: list[str],
+        gender: str | None,
+        text: str | None,
+        limit: int,
+        cursor: str | None
+    ) -> tuple[Select, Callable[[Row], tuple]]:
+    """
+    Builds the image search query and the sort key its cursor is made from. Tag filters
+    use array containment (@>) and overlap (&&) and text uses the prompt tsvector, all
+    answered from GIN indexes. Text searches are ranked and paged on (rank, id), other
+    searches are paged on id.
+    """
+    statement = (
+        select(Image)
+        .join(Image.label)
+        .options(contains_eager(Image.label))
+        .limit(limit + 1)
+    )
+    if tags_all:
+        statement = statement.where(ImageLabel.tags.contains(tags_all))
+    if tags_any:
+        statement = statement.where(ImageLabel.tags.overlap(tags_any))
+    if gender:
+        statement = statement.where(ImageLabel.gender == gender)
+    after: list | None = decode_cursor(cursor)
+
+    if not text:
+        statement = statement.order_by(Image.id)
+        if after:
+            statement = statement.where(Image.id > after[0])
+        return statement, lambda row: (row.Image.id,)
+
+    # websearch syntax accepts free text, "quoted phrases", OR and -excluded words
+    query = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, text)
+    rank = cast(func.ts_rank_cd(ImageLabel.prompt_tsv, query), Float)
+    statement = (
+        statement
+        .add_columns(rank.label("rank"))
+        .where(ImageLabel.prompt_tsv.bool_op("@@")(query))
+        .order_by(rank.desc(), Image.id)
+    )
+    if after:
+        if len(after) != 2:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        statement = statement.where(or_(rank < after[0], and_(rank == after[0], Image.id > after[1])))
+    return statement, lambda row: (row.rank, row.Image.id)
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
+)
+def search_images(
+        tags_all: list[str],
+        tags_any: list[str],
+        gender: str | None,
+        limit: int,
+        cursor: str | None,
+        session: Session,
+        text: str | None = None
+    ) -> tuple[list[Image], str | None]:
+    """
+    Returns one page of labelled images whose tags include every tag in tags_all and at
+    least one in tags_any, optionally of a single gender and matching a text search of
+    the prompt. Text searches come back best match first, others in id order.
+    """
+    try:
+        statement, key = build_search_statement(tags_all, tags_any, gender, text, limit, cursor)
+        rows = session.execute(statement).all()
+        rows, next_cursor = page_from_rows(rows, limit, key=key)
+        return [row.Image for row in rows], next_cursor
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
+
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
+)
+def get_unhashed_images(limit: int, after_id: str | None, session: Session) -> list[tuple[str, str]]:
+    """The (id, image_name) of up to limit images without a perceptual hash, in id order after after_id."""
+    try:
+        statement = select(Image.id, Image.image_name).where(Image.phash.is_(None)).order_by(Image.id).limit(limit)
+        if after_id:
+            statement = statement.where(Image.id > after_id)
+        return [(row.id, row.image_name) for row in session.execute(statement)]
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
+
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
+)
+def set_image_hashes(hashes: list[tuple[str, int]], session: Session) -> None:
+    """Stores (image_name, phash) pairs with one executemany round trip."""
+    try:
+        images = Image.__table__
+        session.execute(
+            update(images)
+            .where(images.c.image_name == bindparam("b_image_name"))
+            # The hash is not exported, so keep change_seq from marking every image as changed
+            .values(phash=bindparam("b_phash"), change_seq=images.c.change_seq, change_xid=images.c.change_xid),
+            [{"b_image_name": image_name, "b_phash": image_hash} for image_name, image_hash in hashes]
+        )
+        session.commit()
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
+
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
+)
+def get_image_hashes(session: Session) -> list[tuple[str, int]]:
+    """The (image_name, phash) of every hashed image."""
+    try:
+        rows = session.execute(
+            select(Image.image_name, Image.phash).where(Image.phash.is_not(None)).execution_options(yield_per=10000)
+        )
+        return [(row.image_name, row.phash) for row in rows]
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
+
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
+)
+def get_unanalysed_images(limit: int, after_id: str | None, session: Session) -> list[tuple[str, str]]:
+    """The (id, image_name) of up to limit images without quality metrics, in id order after after_id."""
+    try:
+        statement = (
+            select(Image.id, Image.image_name).where(Image.quality_score.is_(None)).order_by(Image.id).limit(limit)
+        )
+        if after_id:
+            statement = statement.where(Image.id > after_id)
+        return [(row.id, row.image_name) for row in session.execute(statement)]
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
+
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
+)
+def set_image_quality(metrics: list[tuple[str, dict]], session: Session) -> None:
+    """Stores (image_name, metrics) pairs with one executemany round trip."""
+    try:
+        images = Image.__table__
+        session.execute(
+            update(images)
+            .where(images.c.image_name == bindparam("b_image_name"))
+            # Quality metrics are not exported, so keep change_seq from marking the image as changed
+            .values(
+                change_seq=images.c.change_seq,
+                change_xid=images.c.change_xid,
+                **{column: bindparam(f"b_{column}") for column in QUALITY_COLUMNS}
+            ),
+            [
+                {"b_image_name": image_name, **{f"b_{column}": values[column] for column in QUALITY_COLUMNS}}
+                for image_name, values in metrics
+            ]
+        )
+        session.commit()
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
@@ -0,0 +1,122 @@
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+import csv
+import io
+import logging
+from itertools import islice
+from typing import Iterable, Iterator
+
+CREATE_STAGING_TABLE: str = """
+CREATE TEMP TABLE label_import (
+    line_no BIGINT NOT NULL,
+    image_name TEXT NOT NULL,
+    prompt TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    gender TEXT NOT NULL
+) ON COMMIT DROP
+"""
+
+# csv writes empty strings unquoted, which COPY would otherwise read as NULL
+COPY_STAGING_ROWS: str = (
+    "COPY label_import (line_no, image_name, prompt, tags, gender) FROM STDIN "
+    "WITH (FORMAT csv, FORCE_NOT_NULL (prompt, tags, gender))"
+)
+
+# The last line for an image wins when a file labels it more than once
+UPSERT_LABELS: str = """
+WITH latest AS (
+    SELECT DISTINCT ON (image_name) image_name, prompt, tags, gender
+    FROM label_import
+    ORDER BY image_name, line_no DESC
+), upserted AS (
+    INSERT INTO image_labels (id, prompt, tags, gender, image_id)
+    SELECT 'IMAGE_LABEL-' || gen_random_uuid(), latest.prompt, string_to_array(latest.tags, ','), latest.gender, images.id
+    FROM latest
+    JOIN images ON images.image_name = latest.image_name
+    ON CONFLICT (image_id) DO UPDATE
+    SET prompt = EXCLUDED.prompt, tags = EXCLUDED.tags, gender = EXCLUDED.gender
+    RETURNING (xmax = 0) AS inserted
+)
+SELECT count(*) FILTER (WHERE inserted) AS inserted, count(*) FILTER (WHERE NOT inserted) AS updated
+FROM upserted
+"""
+
+MARK_IMAGES_LABELLED: str = """
+UPDATE images
+SET status = 'labelled', claimed_by = NULL, lease_expires_at = NULL, change_seq = nextval('change_seq'),
+    change_xid = pg_current_xact_id()::text::bigint
+FROM (SELECT DISTINCT image_name FROM label_import) imported
+WHERE images.image_name = imported.image_name
+"""
+
+SELECT_UNMATCHED: str = """
+SELECT line_no, image_name, count(*) OVER () AS total
+FROM label_import
+WHERE NOT EXISTS (SELECT 1 FROM images WHERE images.image_name = label_import.image_name)
+ORDER BY line_no
+LIMIT :limit
+"""
+
+
+class CsvCopyStream:
+    """A file-like view of row tuples encoded as CSV, so COPY pulls rows as they are parsed."""
+
+    def __init__(self, rows: Iterable[tuple], rows_per_chunk: int = 1000):
+        self._rows: Iterator[tuple] = iter(rows)
+        self._rows_per_chunk = rows_per_chunk
+        self._buffer: bytes = b""
+
+    def _fill(self) -> bool:
+        chunk: list[tuple] = list(islice(self._rows, self._rows_per_chunk))
+        if not chunk:
+            return False
+        out = io.StringIO()
+        csv.writer(out, lineterminator="\n").writerows(chunk)
+        self._buffer += out.getvalue().encode()
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        while (size < 0 or len(self._buffer) < size) and self._fill():
+            pass
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+# Not retried: the rows are consumed while copying and could not be replayed
+def copy_labels(rows: Iterable[tuple[int, str, str, str, str]], session: Session, max_unmatched: int = 100) -> dict:
+    """
+    Bulk upserts labels in one transaction. Rows of (line_no, image_name, prompt, tags,
+    gender) are streamed into a temporary staging table with COPY, matched to images by
+    name in a single join, upserted into image_labels and the matched images marked as
+    labelled with one set based UPDATE. Returns the inserted and updated counts and the
+    lines whose image name matched no image.
+    """
+    try:
+        connection = session.connection()
+        connection.execute(text(CREATE_STAGING_TABLE))
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(COPY_STAGING_ROWS, CsvCopyStream(rows))
+        finally:
+            cursor.close()
+        connection.execute(text("CREATE INDEX ON label_import (image_name)"))
+        connection.execute(text("ANALYZE label_import"))
+
+        counts = connection.execute(text(UPSERT_LABELS)).one()
+        connection.execute(text(MARK_IMAGES_LABELLED))
+        unmatched = connection.execute(text(SELECT_UNMATCHED), {"limit": max_unmatched}).all()
+        session.commit()
+    except Exception as e:
+        logging.error(f"Failed to import labels: {e}")
+        session.rollback()
+        raise
+    return {
+        "inserted": counts.inserted,
+        "updated": counts.updated,
+        "unmatched": unmatched[0].total if unmatched else 0,
+        "unmatched_rows": [(row.line_no, row.image_name) for row in unmatched],
+    }
@@ -0,0 +1,160 @@
+from tenacity import retry, stop_after_attempt, wait_exponential
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, StatementError
+
+import logging
+
+from app.core.config import config
+from app.db.db import engine
+
+RETRYABLE_EXCEPTIONS = (OperationalError, StatementError)
+
+# Ordered schema changes for databases created before the current models. Fresh databases
+# built by create_all_tables already match the models and are stamped as fully migrated.
+MIGRATIONS: list[tuple[str, list[str]]] = [
+    ("0001_image_checksum", [
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS checksum VARCHAR(64)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_images_checksum ON images (checksum)",
+    ]),
+    ("0002_image_label_leases", [
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMPTZ",
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS claimed_by VARCHAR",
+        "CREATE INDEX IF NOT EXISTS ix_images_status_id ON images (status, id)",
+    ]),
+    ("0003_image_indexes_and_status_enum", [
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_images_image_name ON images (image_name)",
+        """
+        DO $$ BEGIN
+            CREATE TYPE image_status AS ENUM ('unlabelled', 'in_progress', 'labelled');
+        EXCEPTION WHEN duplicate_object THEN NULL;
+        END $$
+        """,
+        # Indexes on the old varchar column have to go before its type can change
+        "DROP INDEX IF EXISTS ix_images_status_id",
+        "ALTER TABLE images ALTER COLUMN status DROP DEFAULT",
+        "ALTER TABLE images ALTER COLUMN status TYPE image_status "
+        "USING COALESCE(status, 'unlabelled')::image_status",
+        "ALTER TABLE images ALTER COLUMN status SET DEFAULT 'unlabelled'",
+        "ALTER TABLE images ALTER COLUMN status SET NOT NULL",
+        "CREATE INDEX IF NOT EXISTS ix_images_unlabelled_id ON images (id) WHERE status = 'unlabelled'",
+        "CREATE INDEX IF NOT EXISTS ix_images_in_progress_lease ON images (lease_expires_at) "
+        "WHERE status = 'in_progress'",
+        # An image has at most one label; keep one row per image before enforcing it
+        """
+        DELETE FROM image_labels duplicate USING image_labels kept
+        WHERE duplicate.image_id = kept.image_id AND duplicate.id < kept.id
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_image_labels_image_id ON image_labels (image_id)",
+        "ANALYZE images",
+        "ANALYZE image_labels",
+    ]),
+    ("0004_change_sequence", [
+        "CREATE SEQUENCE IF NOT EXISTS change_seq",
+        # The volatile default numbers every existing row while the column is added
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS change_seq BIGINT NOT NULL DEFAULT nextval('change_seq')",
+        "CREATE INDEX IF NOT EXISTS ix_images_change_seq ON images (change_seq)",
+        """
+        CREATE TABLE IF NOT EXISTS tombstones (
+            change_seq BIGINT PRIMARY KEY DEFAULT nextval('change_seq'),
+            image_id VARCHAR NOT NULL,
+            image_name VARCHAR NOT NULL,
+            deleted_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """,
+    ]),
+    ("0005_image_label_tag_array", [
+        # "a, b,,c" becomes {a,b,c}: split on commas with surrounding whitespace, drop empties
+        r"""
+        ALTER TABLE image_labels ALTER COLUMN tags TYPE VARCHAR[]
+        USING COALESCE(array_remove(regexp_split_to_array(btrim(tags), '\s*,\s*'), ''), '{}')
+        """,
+        "ALTER TABLE image_labels ALTER COLUMN tags SET DEFAULT '{}'",
+        "ALTER TABLE image_labels ALTER COLUMN tags SET NOT NULL",
+        "CREATE INDEX IF NOT EXISTS ix_image_labels_tags ON image_labels USING gin (tags)",
+        "ANALYZE image_labels",
+    ]),
+    ("0006_image_label_prompt_search", [
+        "ALTER TABLE image_labels ADD COLUMN IF NOT EXISTS prompt_tsv TSVECTOR "
+        "GENERATED ALWAYS AS (to_tsvector('english', coalesce(prompt, ''))) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_image_labels_prompt_tsv ON image_labels USING gin (prompt_tsv)",
+    ]),
+    ("0007_image_phash", [
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS phash BIGINT",
+        "CREATE INDEX IF NOT EXISTS ix_images_phash_missing ON images (id) WHERE phash IS NULL",
+    ]),
+    ("0008_image_quality_metrics", [
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS width INTEGER",
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS height INTEGER",
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS blur_score DOUBLE PRECISION",
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS brightness DOUBLE PRECISION",
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS contrast DOUBLE PRECISION",
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS entropy DOUBLE PRECISION",
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS quality_score DOUBLE PRECISION",
+        "CREATE INDEX IF NOT EXISTS ix_images_quality_missing ON images (id) WHERE quality_score IS NULL",
+        "CREATE INDEX IF NOT EXISTS ix_images_quality_order ON images ((coalesce(quality_score, -1)) DESC, id)",
+    ]),
+    ("0009_change_xid", [
+        "ALTER TABLE images ADD COLUMN IF NOT EXISTS change_xid BIGINT NOT NULL DEFAULT pg_current_xact_id()::text::bigint",
+        "ALTER TABLE tombstones ADD COLUMN IF NOT EXISTS change_xid BIGINT NOT NULL DEFAULT pg_current_xact_id()::text::bigint",
+        "CREATE INDEX IF NOT EXISTS ix_images_change_xid ON images (change_xid)",
+        "CREATE INDEX IF NOT EXISTS ix_tombstones_change_xid ON tombstones (change_xid)",
+    ]),
+]
+
+CREATE_MIGRATIONS_TABLE: str = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    name VARCHAR PRIMARY KEY,
+    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+"""
+
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+)
+def apply_migrations():
+    try:
+        with engine.begin() as connection:
+            connection.execute(text(CREATE_MIGRATIONS_TABLE))
+            applied: set[str] = set(connection.scalars(text("SELECT name FROM schema_migrations")))
+        for name, statements in MIGRATIONS:
+            if name in applied:
+                continue
+            logging.info(f"Applying migration {name}")
+            # Each migration runs in its own transaction so a failure leaves earlier ones applied
+            with engine.begin() as connection:
+                for statement in statements:
+                    connection.execute(text(statement))
+                connection.execute(text("INSERT INTO schema_migrations (name) VALUES (:name)"), {"name": name})
+            logging.info(f"Applied migration {name}")
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        raise
+
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+)
+def stamp_migrations():
+    """Marks every migration as applied, for databases created directly from the models."""
+    try:
+        with engine.begin() as connection:
+            connection.execute(text(CREATE_MIGRATIONS_TABLE))
+            for name, _ in MIGRATIONS:
+                connection.execute(
+                    text("INSERT INTO schema_migrations (name) VALUES (:name) ON CONFLICT DO NOTHING"),
+                    {"name": name}
+                )
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        raise
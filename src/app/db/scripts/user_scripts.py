@@ -1,3 +1,4 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from tenacity import retry, stop_after_attempt, wait_exponential
 from sqlalchemy.exc import OperationalError, StatementError
@@ -8,7 +9,9 @@ import logging
 from app.db.schema import User
 from app.models.user_model import UserUpdate, UserCreate
 from app.core.config import config
+from app.core.concurrency import retry_sleep
 from app.core.utils import generate_id
+from app.core.pagination import decode_cursor, page_from_rows
 
 # Define which exceptions are transient and should trigger a retry
 RETRYABLE_EXCEPTIONS = (OperationalError, StatementError)
@@ -21,8 +24,10 @@ RETRYABLE_EXCEPTIONS = (OperationalError, StatementError)
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
-def create_user(user: UserCreate, session: Session) -> User:
+def create_user(user: UserCreate, session: Session, password_hash: str | None = None) -> User:
+    """Password hashing is CPU bound, so async callers should hash on the password pool first."""
     try:
         logging.info(f"Creating user with email: {user.email}")
         id: str = generate_id(prefix="USER")
@@ -33,7 +38,7 @@ def create_user(user: UserCreate, session: Session) -> User:
             id=id,
             name=user.name,
             email=user.email,
-            password_hash=User.hash_password(user.password)
+            password_hash=password_hash or User.hash_password(user.password)
         )
         session.add(new_user)
         session.commit()
@@ -51,6 +56,7 @@ def create_user(user: UserCreate, session: Session) -> User:
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
 def authenticate_user(email: str, password: str, session: Session) -> bool:
     try:
@@ -77,6 +83,7 @@ def authenticate_user(email: str, password: str, session: Session) -> bool:
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
 def get_user(user_id: str, session: Session) -> User | None:
     try:
@@ -96,6 +103,7 @@ def get_user(user_id: str, session: Session) -> User | None:
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
 def get_user_by_email(email: str, session: Session) -> User | None:
     try:
@@ -115,6 +123,7 @@ def get_user_by_email(email: str, session: Session) -> User | None:
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
 def delete_user(user_id: str, session: Session) -> None:
     try:
@@ -134,6 +143,7 @@ def delete_user(user_id: str, session: Session) -> None:
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
 def update_user(user_id: str, user_update: UserUpdate, session: Session) -> User | None:
     try:
@@ -162,6 +172,7 @@ def update_user(user_id: str, user_update: UserUpdate, session: Session) -> User
         min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
     ),
     reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
 )
 def get_all_users(limit: int, offset: int, session: Session) -> list[User]:
     try:
@@ -170,3 +181,25 @@ def get_all_users(limit: int, offset: int, session: Session) -> list[User]:
     except RETRYABLE_EXCEPTIONS as e:
         logging.error(f"There was a database error: {e}, retrying")
         session.rollback()
+
+@retry(
+    stop=stop_after_attempt(config.STOP_AFTER_ATTEMPTS),
+    wait=wait_exponential(
+        multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER, 
+        min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+    ),
+    reraise=config.RERAISE, # Re-raise the exception if all retries fail
+    sleep=retry_sleep,
+)
+def get_users_page(limit: int, cursor: str | None, session: Session) -> tuple[list[User], str | None]:
+    """Returns one page of users in id order, seeking past the cursor instead of using OFFSET."""
+    try:
+        statement = select(User).order_by(User.id).limit(limit + 1)
+        after: list | None = decode_cursor(cursor)
+        if after:
+            statement = statement.where(User.id > after[0])
+        users: list[User] = session.scalars(statement).all()
+        return page_from_rows(users, limit, key=lambda user: (user.id,))
+    except RETRYABLE_EXCEPTIONS as e:
+        logging.error(f"There was a database error: {e}, retrying")
+        session.rollback()
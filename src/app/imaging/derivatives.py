@@ -0,0 +1,89 @@
+from fastapi import HTTPException
+from PIL import Image as PILImage, ImageOps
+
+import logging
+import os
+import uuid
+
+from app.core.config import config
+from app.core.storage import resolve_image_path, shard_dir
+from app.imaging.pool import get_pool, run_in_pool_once
+
+# Longest edge, in pixels, of each derivative preset
+DERIVATIVE_PRESETS: dict[str, int] = {
+    "thumb": 256,
+    "preview": 1024,
+}
+
+DERIVATIVE_MEDIA_TYPE: str = "image/webp"
+
+
+def derivative_path(image_name: str, preset: str) -> str:
+    """Returns the deterministic cache location of a derivative."""
+    stem: str = os.path.splitext(image_name)[0]
+    return os.path.join(config.DERIVATIVES_DIR, preset, shard_dir(image_name), f"{stem}.webp")
+
+
+def render_derivative(source_path: str, destination: str, max_edge: int, quality: int) -> str:
+    """Decodes, downsizes and encodes one derivative. Runs inside the image worker processes."""
+    with PILImage.open(source_path) as image:
+        # Let the JPEG decoder skip detail we are about to throw away
+        image.draft("RGB", (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_edge, max_edge), PILImage.Resampling.LANCZOS)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        temp_path: str = f"{destination}.{uuid.uuid4()}.part"
+        try:
+            image.save(temp_path, format="WEBP", quality=quality, method=4)
+            os.replace(temp_path, destination)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    return destination
+
+
+def schedule_derivatives(image_names: list[str]) -> None:
+    """Queues every preset of the given images on the worker pool without waiting for them."""
+    pool = get_pool()
+    for image_name in image_names:
+        source_path: str | None = resolve_image_path(image_name)
+        if not source_path:
+            continue
+        for preset, max_edge in DERIVATIVE_PRESETS.items():
+            future = pool.submit(
+                render_derivative, source_path, derivative_path(image_name, preset), max_edge,
+                int(config.DERIVATIVE_QUALITY)
+            )
+            future.add_done_callback(_log_failure)
+
+
+def _log_failure(future) -> None:
+    if not future.cancelled() and future.exception():
+        logging.error(f"Failed to render derivative: {future.exception()}")
+
+
+async def ensure_derivative(image_name: str, preset: str) -> str:
+    """
+    Returns the path of a cached derivative, rendering it on the worker pool if it is
+    missing. Concurrent requests for the same missing derivative share one render.
+    """
+    if preset not in DERIVATIVE_PRESETS:
+        raise HTTPException(status_code=404, detail="Unknown derivative preset")
+    destination: str = derivative_path(image_name, preset)
+    if os.path.exists(destination):
+        return destination
+
+    source_path: str | None = resolve_image_path(image_name)
+    if not source_path:
+        raise HTTPException(status_code=404, detail="Image not found")
+    try:
+        return await run_in_pool_once(
+            destination, render_derivative, source_path, destination, DERIVATIVE_PRESETS[preset],
+            int(config.DERIVATIVE_QUALITY)
+        )
+    except Exception as e:
+        logging.error(f"Failed to render {preset} for {image_name}: {e}")
+        raise HTTPException(status_code=422, detail="Could not render image")
@@ -0,0 +1,61 @@
+import numpy as np
+from PIL import Image as PILImage, ImageOps
+
+import logging
+
+# Images are reduced to SAMPLE_SIZE x SAMPLE_SIZE grey pixels and the lowest HASH_SIZE x
+# HASH_SIZE frequencies of their DCT become the 64 bits of the hash
+SAMPLE_SIZE: int = 32
+HASH_SIZE: int = 8
+HASH_BITS: int = HASH_SIZE * HASH_SIZE
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """Orthonormal DCT-II basis; M @ X @ M.T is the 2D DCT of a square block X."""
+    k: np.ndarray = np.arange(size)[:, None]
+    n: np.ndarray = np.arange(size)[None, :]
+    matrix: np.ndarray = np.sqrt(2 / size) * np.cos(np.pi * (2 * n + 1) * k / (2 * size))
+    matrix[0] /= np.sqrt(2)
+    return matrix
+
+
+DCT_MATRIX: np.ndarray = _dct_matrix(SAMPLE_SIZE)
+
+
+def to_signed(image_hash: int) -> int:
+    """Maps an unsigned 64 bit hash onto the range of a Postgres BIGINT."""
+    return image_hash - (1 << HASH_BITS) if image_hash >= 1 << (HASH_BITS - 1) else image_hash
+
+
+def to_unsigned(image_hash: int) -> int:
+    return image_hash & ((1 << HASH_BITS) - 1)
+
+
+def hamming_distance(first: int, second: int) -> int:
+    return (first ^ second).bit_count()
+
+
+def compute_phash(image: PILImage.Image) -> int:
+    """
+    The perceptual hash of an image: one bit per low frequency DCT coefficient, set when the
+    coefficient is above their median. Resizing, recompression and light crops barely move
+    those coefficients, so near duplicates differ in only a few bits.
+    """
+    grey: PILImage.Image = image.convert("L").resize((SAMPLE_SIZE, SAMPLE_SIZE), PILImage.Resampling.LANCZOS)
+    pixels: np.ndarray = np.asarray(grey, dtype=np.float64)
+    coefficients: np.ndarray = (DCT_MATRIX @ pixels @ DCT_MATRIX.T)[:HASH_SIZE, :HASH_SIZE].ravel()
+    # The DC term is the overall brightness and would skew the median
+    bits: np.ndarray = coefficients > np.median(coefficients[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def phash_file(source_path: str) -> int | None:
+    """Hashes one stored image, or returns None if it cannot be decoded. Runs inside the image worker processes."""
+    try:
+        with PILImage.open(source_path) as image:
+            # Only a 32 pixel thumbnail is needed, so let the JPEG decoder skip most of the detail
+            image.draft("L", (SAMPLE_SIZE * 4, SAMPLE_SIZE * 4))
+            return compute_phash(ImageOps.exif_transpose(image))
+    except Exception as e:
+        logging.error(f"Failed to hash {source_path}: {e}")
+        return None
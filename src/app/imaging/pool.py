@@ -0,0 +1,39 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import asyncio
+import logging
+from typing import Any, Callable
+
+from app.core.config import config
+
+_pool: ProcessPoolExecutor | None = None
+_inflight: dict[str, asyncio.Future] = {}
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """Returns the process pool used for CPU bound image work, creating it on first use."""
+    global _pool
+    if _pool is None:
+        logging.info(f"Starting image worker pool with {config.IMAGE_WORKERS} processes")
+        _pool = ProcessPoolExecutor(max_workers=int(config.IMAGE_WORKERS))
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+async def run_in_pool_once(key: str, func: Callable[..., Any], *args) -> Any:
+    """
+    Runs func on the image worker pool. Concurrent callers passing the same key share
+    a single run instead of rendering the same output several times.
+    """
+    future: asyncio.Future | None = _inflight.get(key)
+    if future is None:
+        future = asyncio.get_running_loop().run_in_executor(get_pool(), func, *args)
+        _inflight[key] = future
+        future.add_done_callback(lambda _: _inflight.pop(key, None))
+    return await asyncio.shield(future)
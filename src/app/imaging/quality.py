@@ -0,0 +1,79 @@
+import numpy as np
+from PIL import Image as PILImage, ImageOps
+
+import logging
+
+# Metrics are measured on a copy scaled to this longest edge, so blur scores stay
+# comparable between a phone snapshot and a 40 megapixel original
+ANALYSIS_EDGE: int = 512
+
+# Reference points for the quality score: an image at or above all of them scores 1.0
+SHARP_BLUR_SCORE: float = 100.0
+FULL_ENTROPY: float = 7.0
+MIN_USEFUL_EDGE: int = 512
+
+# Grey levels at or below SHADOW_LEVEL and at or above HIGHLIGHT_LEVEL count as clipped
+SHADOW_LEVEL: int = 5
+HIGHLIGHT_LEVEL: int = 250
+
+# EXIF orientations that rotate the image by 90 degrees
+TRANSPOSED_ORIENTATIONS: set[int] = {5, 6, 7, 8}
+
+
+def measure_quality(image: PILImage.Image, width: int, height: int) -> dict[str, float | int]:
+    """
+    Triage metrics for one image:
+
+    - blur_score: variance of the Laplacian; low when there are no sharp edges.
+    - brightness and contrast: mean and standard deviation of the grey levels.
+    - entropy: Shannon entropy of the grey level histogram, in bits; near zero for
+      blank or flat images.
+    - quality_score: 0 to 1, the product of sharpness, entropy and size relative to the
+      reference points, times the share of pixels that are not crushed or blown out.
+    """
+    pixels: np.ndarray = np.asarray(image.convert("L"), dtype=np.uint8)
+    grey: np.ndarray = pixels.astype(np.float32)
+    if min(grey.shape) >= 3:
+        laplacian: np.ndarray = (
+            grey[:-2, 1:-1] + grey[2:, 1:-1] + grey[1:-1, :-2] + grey[1:-1, 2:] - 4 * grey[1:-1, 1:-1]
+        )
+        blur_score: float = float(laplacian.var())
+    else:
+        blur_score = 0.0
+
+    histogram: np.ndarray = np.bincount(pixels.ravel(), minlength=256) / pixels.size
+    nonzero: np.ndarray = histogram[histogram > 0]
+    entropy: float = float(-(nonzero * np.log2(nonzero)).sum())
+    clipped: float = float(histogram[:SHADOW_LEVEL + 1].sum() + histogram[HIGHLIGHT_LEVEL:].sum())
+
+    quality_score: float = (
+        min(blur_score / SHARP_BLUR_SCORE, 1.0)
+        * min(entropy / FULL_ENTROPY, 1.0)
+        * min(min(width, height) / MIN_USEFUL_EDGE, 1.0)
+        * (1.0 - clipped)
+    )
+    return {
+        "width": width,
+        "height": height,
+        "blur_score": blur_score,
+        "brightness": float(grey.mean()),
+        "contrast": float(grey.std()),
+        "entropy": entropy,
+        "quality_score": quality_score,
+    }
+
+
+def quality_file(source_path: str) -> dict[str, float | int] | None:
+    """Measures one stored image, or returns None if it cannot be decoded. Runs inside the image worker processes."""
+    try:
+        with PILImage.open(source_path) as image:
+            width, height = image.size
+            if image.getexif().get(0x0112) in TRANSPOSED_ORIENTATIONS:
+                width, height = height, width
+            image.draft("L", (ANALYSIS_EDGE, ANALYSIS_EDGE))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((ANALYSIS_EDGE, ANALYSIS_EDGE), PILImage.Resampling.BILINEAR)
+            return measure_quality(image, width, height)
+    except Exception as e:
+        logging.error(f"Failed to measure {source_path}: {e}")
+        return None
@@ -0,0 +1,228 @@
+from fastapi import HTTPException
+from PIL import Image as PILImage, ImageOps
+from pydantic import BaseModel, Field, model_validator
+
+import fcntl
+import hashlib
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Literal
+
+from app.core.config import config
+from app.core.storage import resolve_image_path
+from app.imaging.pool import run_in_pool_once
+
+TRANSFORM_MEDIA_TYPES: dict[str, str] = {
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+}
+
+
+class TransformParams(BaseModel):
+    width: int | None = Field(default=None, ge=1, le=int(config.TRANSFORM_MAX_EDGE))
+    height: int | None = Field(default=None, ge=1, le=int(config.TRANSFORM_MAX_EDGE))
+    fit: Literal["contain", "cover"] = "contain"
+    format: Literal["webp", "jpeg", "png"] = "webp"
+    quality: int = Field(default=85, ge=1, le=100)
+
+    @model_validator(mode="after")
+    def check_dimensions(self) -> "TransformParams":
+        if self.width is None and self.height is None:
+            raise ValueError("At least one of width or height is required")
+        if self.fit == "cover" and (self.width is None or self.height is None):
+            raise ValueError("Cover crops require both width and height")
+        return self
+
+    def cache_key(self, image_name: str) -> str:
+        """
+        Stored images are never rewritten in place, so the name and the parameters
+        fully determine the output and double as a strong validator.
+        """
+        raw: str = f"{image_name}|{self.width}|{self.height}|{self.fit}|{self.format}|{self.quality}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def render_transform(source_path: str, destination: str, params: TransformParams) -> int:
+    """Decodes, resizes or center crops and encodes an image. Runs inside the image worker processes."""
+    with PILImage.open(source_path) as image:
+        target: tuple[int, int] = (
+            params.width or int(config.TRANSFORM_MAX_EDGE),
+            params.height or int(config.TRANSFORM_MAX_EDGE)
+        )
+        image.draft("RGB", target)
+        image = ImageOps.exif_transpose(image)
+        if params.fit == "cover":
+            image = ImageOps.fit(image, target, PILImage.Resampling.LANCZOS, centering=(0.5, 0.5))
+        else:
+            image.thumbnail(target, PILImage.Resampling.LANCZOS)
+        if params.format == "jpeg" or image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB" if params.format == "jpeg" else "RGBA")
+
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        temp_path: str = f"{destination}.{uuid.uuid4()}.part"
+        try:
+            image.save(temp_path, format=params.format.upper(), quality=params.quality)
+            os.replace(temp_path, destination)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    return os.path.getsize(destination)
+
+
+class TransformCache:
+    """
+    A size capped on-disk cache of transformed images shared by every worker process.
+    The budget is enforced from the directory itself: the running total lives in a usage
+    file and recency in the files' access times, both only changed under an exclusive lock
+    file, and the least recently used files are deleted once the cache grows past its budget.
+    """
+
+    LOCK_FILE: str = ".lock"
+    USAGE_FILE: str = ".usage"
+    # Eviction trims the cache to this share of the budget so it does not rescan on every put
+    LOW_WATERMARK: float = 0.9
+    # Temp files older than this were abandoned by a crashed worker
+    STALE_PART_SECONDS: int = 3600
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        with self._locked():
+            self._write_usage(self._scan(remove_stale_parts=True))
+            self._evict_if_over_budget()
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with open(os.path.join(self.directory, self.LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_usage(self) -> int:
+        try:
+            with open(os.path.join(self.directory, self.USAGE_FILE)) as usage_file:
+                return int(usage_file.read() or 0)
+        except (FileNotFoundError, ValueError):
+            return self._scan()
+
+    def _write_usage(self, total_bytes: int) -> None:
+        with open(os.path.join(self.directory, self.USAGE_FILE), "w") as usage_file:
+            usage_file.write(str(total_bytes))
+
+    def _entries(self, remove_stale_parts: bool = False) -> list[tuple[float, str, int]]:
+        """Every cached file as (access time, path, size)."""
+        entries: list[tuple[float, str, int]] = []
+        now: float = time.time()
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name in (self.LOCK_FILE, self.USAGE_FILE):
+                    continue
+                path: str = os.path.join(root, name)
+                try:
+                    stat_result = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if name.endswith(".part"):
+                    # Another worker may still be writing it unless it is long abandoned
+                    if remove_stale_parts and now - stat_result.st_mtime > self.STALE_PART_SECONDS:
+                        os.remove(path)
+                    continue
+                entries.append((stat_result.st_atime, path, stat_result.st_size))
+        return entries
+
+    def _scan(self, remove_stale_parts: bool = False) -> int:
+        return sum(size for _, _, size in self._entries(remove_stale_parts))
+
+    def _evict_if_over_budget(self) -> None:
+        """Called with the lock held. Deletes the least recently used files across all workers."""
+        if self._read_usage() <= self.max_bytes:
+            return
+        entries: list[tuple[float, str, int]] = sorted(self._entries())
+        total_bytes: int = sum(size for _, _, size in entries)
+        target: int = int(self.max_bytes * self.LOW_WATERMARK)
+        for _, path, size in entries[:-1]:
+            if total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+        self._write_usage(total_bytes)
+
+    def path(self, key: str, format: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{format}")
+
+    def get(self, key: str, format: str) -> str | None:
+        path: str = self.path(key, format)
+        try:
+            # Access times carry the recency order every worker evicts by; set explicitly so
+            # noatime mounts still record the hit
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key: str, format: str, size: int) -> None:
+        with self._locked():
+            self._write_usage(self._read_usage() + size)
+            self._evict_if_over_budget()
+
+
+_cache: TransformCache | None = None
+
+
+def get_transform_cache() -> TransformCache:
+    global _cache
+    if _cache is None:
+        _cache = TransformCache(config.TRANSFORM_CACHE_DIR, int(config.TRANSFORM_CACHE_MAX_BYTES))
+    return _cache
+
+
+# A transform evicted by another worker between the lookup and the open is rendered again,
+# at most this many times before giving up
+TRANSFORM_OPEN_ATTEMPTS: int = 3
+
+
+async def ensure_transform(image_name: str, params: TransformParams) -> BinaryIO:
+    """
+    Opens a cached transform, rendering it on the worker pool on a miss. Another worker may
+    evict the file at any moment, so it is opened here: the open handle keeps the bytes
+    readable until the response has streamed them.
+    """
+    cache: TransformCache = get_transform_cache()
+    key: str = params.cache_key(image_name)
+    source_path: str | None = resolve_image_path(image_name)
+    if not source_path:
+        raise HTTPException(status_code=404, detail="Image not found")
+    for _ in range(TRANSFORM_OPEN_ATTEMPTS):
+        path: str | None = cache.get(key, params.format)
+        if not path:
+            path = cache.path(key, params.format)
+            try:
+                size: int = await run_in_pool_once(path, render_transform, source_path, path, params)
+            except Exception as e:
+                logging.error(f"Failed to transform {image_name}: {e}")
+                raise HTTPException(status_code=422, detail="Could not transform image")
+            cache.put(key, params.format, size)
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:
+            logging.info(f"Transform of {image_name} was evicted before it was opened, rendering it again")
+    raise HTTPException(status_code=503, detail="Transform cache is too busy, try again")
+
+
+def iter_file(file: BinaryIO, chunk_size: int | None = None) -> Iterator[bytes]:
+    """Yields an open file in chunks and closes it once it has been read."""
+    chunk_size = int(chunk_size or config.UPLOAD_CHUNK_SIZE)
+    with file:
+        while chunk := file.read(chunk_size):
+            yield chunk
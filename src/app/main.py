@@ -1,12 +1,21 @@
 from fastapi import FastAPI, status
+from fastapi.responses import ORJSONResponse
 
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 from app.core.config import config
 from app.core.logging import setup_logging
 
 from app.main_helpers import setup_app
+from app.db.db import get_pool_stats
+from app.services.jobs import jobs
+from app.imaging.pool import shutdown_pool
+from app.core.concurrency import configure_thread_pool, shutdown_password_pool
+from app.services.leases import reclaim_expired_leases_forever
+from app.services.tag_index import refresh_tag_index_forever
+from app.services.near_duplicates import refresh_near_duplicate_index_forever
 
 setup_logging()
 
@@ -20,12 +29,23 @@ if config.ENVIRONMENT == "production":
 async def lifespan(app: FastAPI):
     logging.info("Starting application...")
     # init_app(app)
+    configure_thread_pool()
+    lease_reclaimer = asyncio.create_task(reclaim_expired_leases_forever())
+    tag_index_refresher = asyncio.create_task(refresh_tag_index_forever())
+    near_duplicate_index_refresher = asyncio.create_task(refresh_near_duplicate_index_forever())
     yield
+    lease_reclaimer.cancel()
+    tag_index_refresher.cancel()
+    near_duplicate_index_refresher.cancel()
+    jobs.shutdown()
+    shutdown_pool()
+    shutdown_password_pool()
 
 app = FastAPI(
     title=config.APP_NAME, 
     debug=config.DEBUG, 
     lifespan=lifespan, 
+    default_response_class=ORJSONResponse,
     summary=config.APP_SUMMARY,
     description=config.APP_DESCRIPTION,
     version=config.APP_VERSION,
@@ -47,4 +67,16 @@ async def health_check():
     logging.info("Health check")
     return {"status": "ok"}
 
+@app.get(
+        "/health/db-pool", 
+        status_code=status.HTTP_200_OK, 
+        response_model=dict, 
+        tags=["Health"],
+        summary="Database pool statistics",
+        description="Checked out connections, overflow and checkout wait times for each engine",
+        response_description="Database pool statistics"
+        )
+async def db_pool_stats():
+    return get_pool_stats()
+
 logging.info("Application started successfully.")
\ No newline at end of file
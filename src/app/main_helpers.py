@@ -5,9 +5,12 @@ from fastapi.middleware.cors import CORSMiddleware
 import logging
 
 from app.core.config import config
+from app.core.storage import ShardedStaticFiles
+from app.db.query_counter import QueryCountMiddleware
 from app.ui import ui
 from app.api import image_router
 from app.api import user_router
+from app.api import export_router
 from app.exception_handlers import register_exception_handlers
  
 def mount_static_directories(app: FastAPI):
@@ -18,7 +21,7 @@ def mount_static_directories(app: FastAPI):
         )
     app.mount(
         "/data", 
-        StaticFiles(directory=config.DATA_DIR), 
+        ShardedStaticFiles(directory=config.DATA_DIR), 
         name="data"
     )
 
@@ -30,12 +33,15 @@ def add_middleware(app: FastAPI):
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    if config.QUERY_COUNT_HEADER:
+        app.add_middleware(QueryCountMiddleware, warn_threshold=int(config.QUERY_COUNT_WARN_THRESHOLD))
 
 def register_routers(app: FastAPI):
     api_version: str = config.API_VERSION
     app.include_router(ui.router, include_in_schema=False)
     app.include_router(image_router.router, prefix=f"/api/{api_version}/images")
     app.include_router(user_router.router, prefix=f"/api/{api_version}/users")
+    app.include_router(export_router.router, prefix=f"/api/{api_version}/export")
 
 def setup_app(app: FastAPI):
     mount_static_directories(app)
@@ -1,13 +1,13 @@
 from __future__ import annotations
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Literal
 from app.db.schema import ImageLabel
 
 class ImageLabelCreate(BaseModel):
     image_name: str
     prompt: str
-    tags: str = ""
+    tags: list[str] = []
     gender: str = Literal["male", "female"]
 
 
@@ -19,16 +19,45 @@ class ImageLabelRead(BaseModel):
     gender: str
 
     @classmethod
-    def from_orm(cls, image_label: ImageLabel):
+    def from_orm(cls, image_label: ImageLabel, image_name: str | None = None):
+        """
+        Pass image_name when serializing a label reached from its image, so the
+        back reference to the image is never loaded.
+        """
         return cls(
             id=image_label.id,
-            image_name=image_label.image.image_name,
+            image_name=image_name or image_label.image.image_name,
             prompt=image_label.prompt,
-            tags=image_label.tags.split(","),
+            tags=list(image_label.tags),
             gender=image_label.gender
         )
+
+    @staticmethod
+    def row(image_label: ImageLabel, image_name: str | None = None) -> dict:
+        """The serialized form of from_orm as a plain dict, for bulk responses that skip validation."""
+        return {
+            "id": image_label.id,
+            "image_name": image_name or image_label.image.image_name,
+            "prompt": image_label.prompt,
+            "tags": list(image_label.tags),
+            "gender": image_label.gender,
+        }
     
 class ImageLabelUpdate(BaseModel):
     prompt: str | None = None
-    tags: str | None = None
-    gender: str | None = None
\ No newline at end of file
+    tags: list[str] | None = None
+    gender: str | None = None
+
+
+class TagCount(BaseModel):
+    tag: str
+    count: int
+
+
+class LabelImportReport(BaseModel):
+    total: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unmatched: int = 0
+    invalid: int = 0
+    errors: list[str] = Field(default_factory=list)
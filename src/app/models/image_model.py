@@ -1,21 +1,24 @@
 from __future__ import annotations
 
 from pydantic import BaseModel
-from app.db.schema import Image
+from datetime import datetime
+from app.db.schema import Image, ImageStatus
 from app.models.image_label_model import ImageLabelRead
 
 
 class ImageCreate(BaseModel):
     image_name: str
     version: str = "v1"
-    status: str = "unlabelled"
+    status: ImageStatus = ImageStatus.UNLABELLED
+    checksum: str | None = None
 
 
 class ImageRead(BaseModel):
     id: str
     image_name: str
     version: str
-    status: str
+    status: ImageStatus
+    checksum: str | None = None
     label: ImageLabelRead | None
 
     @classmethod
@@ -25,9 +28,42 @@ class ImageRead(BaseModel):
             image_name=image.image_name, 
             version=image.version, 
             status=image.status,
-            label=ImageLabelRead.from_orm(image.label) if image.label else None
+            checksum=image.checksum,
+            label=ImageLabelRead.from_orm(image.label, image_name=image.image_name) if image.label else None
         )
+
+    @staticmethod
+    def row(image: Image) -> dict:
+        """The serialized form of from_orm as a plain dict, for bulk responses that skip validation."""
+        return {
+            "id": image.id,
+            "image_name": image.image_name,
+            "version": image.version,
+            "status": image.status,
+            "checksum": image.checksum,
+            "label": ImageLabelRead.row(image.label, image_name=image.image_name) if image.label else None,
+        }
     
 
+class ImageClaimRead(BaseModel):
+    id: str
+    image_name: str
+    lease_expires_at: datetime | None
+
+    @classmethod
+    def from_orm(cls, image: Image) -> ImageClaimRead:
+        return cls(id=image.id, image_name=image.image_name, lease_expires_at=image.lease_expires_at)
+
+
+class NearDuplicate(BaseModel):
+    image_name: str
+    distance: int
+
+
+class DuplicateCluster(BaseModel):
+    size: int
+    image_names: list[str]
+
+
 class ImageUpdate(BaseModel):
     image_name: str | None = None
\ No newline at end of file
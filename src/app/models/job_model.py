@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from pydantic import BaseModel, Field
+from datetime import datetime, timezone
+from typing import Literal
+
+
+class JobRead(BaseModel):
+    id: str
+    kind: str
+    status: Literal["pending", "running", "completed", "failed"] = "pending"
+    total: int | None = None
+    processed: int = 0
+    created: int = 0
+    updated: int = 0
+    duplicates: int = 0
+    skipped: int = 0
+    failed: int = 0
+    errors: list[str] = Field(default_factory=list)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    finished_at: datetime | None = None
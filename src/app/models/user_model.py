@@ -23,6 +23,11 @@ class UserRead(BaseModel):
             email=user.email   
         )
 
+    @staticmethod
+    def row(user: User) -> dict:
+        """The serialized form of from_orm as a plain dict, for bulk responses that skip validation."""
+        return {"id": user.id, "name": user.name, "email": user.email}
+
 class UserUpdate(BaseModel):
     name: str | None = None
     email: str | None = None
\ No newline at end of file
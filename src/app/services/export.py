@@ -0,0 +1,237 @@
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Row
+
+import io
+import logging
+import os
+import tarfile
+import time
+from typing import Callable, Iterator, Literal
+
+from app.core.config import config
+from app.core.storage import resolve_image_path
+from app.db.db import SessionLocal
+from app.db.scripts.change_scripts import get_change_watermark
+from app.db.scripts.image_label_scripts import iter_labelled_image_batches
+
+ExportFormat = Literal["jsonl", "webdataset", "parquet"]
+
+EXPORT_MEDIA_TYPES: dict[str, str] = {
+    "jsonl": "application/x-ndjson",
+    "webdataset": "application/x-tar",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+EXPORT_EXTENSIONS: dict[str, str] = {
+    "jsonl": "jsonl",
+    "webdataset": "tar",
+    "parquet": "parquet",
+}
+
+PARQUET_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("image_name", pa.string()),
+    ("checksum", pa.string()),
+    ("prompt", pa.string()),
+    ("tags", pa.list_(pa.string())),
+    ("gender", pa.string()),
+    ("change_seq", pa.int64()),
+    ("deleted", pa.bool_()),
+])
+
+
+class _ChunkSink(io.RawIOBase):
+    """A write-only file that hands back whatever was written since it was last drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: list[bytes] = []
+        self._position: int = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data: bytes = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def export_record(row: Row) -> dict:
+    """Tombstones carry only the id, image name and change_seq, with deleted set."""
+    return {
+        "id": row.id,
+        "image_name": row.image_name,
+        "checksum": row.checksum,
+        "prompt": row.prompt,
+        "tags": row.tags,
+        "gender": row.gender,
+        "change_seq": row.change_seq,
+        "deleted": row.deleted,
+    }
+
+
+def export_watermark() -> int:
+    """
+    The watermark to pass as until on this export and as since on the next one. Changes from
+    transactions still in flight when it is read fall at or above it, so the next incremental
+    export picks them up once they commit instead of skipping them.
+    """
+    session = SessionLocal()
+    try:
+        return get_change_watermark(session)
+    finally:
+        session.close()
+
+
+def iter_labelled_batches(
+        batch_size: int | None = None,
+        since: int | None = None,
+        until: int | None = None
+    ) -> Iterator[list[Row]]:
+    """Streams labelled images in batches on a dedicated session that is closed with the stream."""
+    session = SessionLocal()
+    try:
+        yield from iter_labelled_image_batches(
+            int(batch_size or config.EXPORT_BATCH_SIZE), session, since=since, until=until
+        )
+    finally:
+        session.close()
+
+
+def iter_jsonl(batches: Iterator[list[Row]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield b"".join(orjson.dumps(export_record(row)) + b"\n" for row in batch)
+
+
+def _add_bytes(archive: tarfile.TarFile, name: str, data: bytes, mtime: float) -> None:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = mtime
+    archive.addfile(info, io.BytesIO(data))
+
+
+def add_webdataset_sample(archive: tarfile.TarFile, row: Row) -> bool:
+    """
+    Writes one sample as WebDataset members sharing a key: the image, the prompt as the
+    caption and the remaining fields as JSON. Samples whose image file is missing are skipped.
+    """
+    path: str | None = resolve_image_path(row.image_name)
+    if not path:
+        logging.warning(f"Skipping {row.image_name} in export, the image file is missing")
+        return False
+    # WebDataset splits keys from extensions at the first dot of the basename
+    key, extension = os.path.splitext(row.image_name)
+    key = key.replace(".", "_")
+    mtime: float = time.time()
+
+    info = tarfile.TarInfo(f"{key}{extension.lower()}")
+    info.size = os.path.getsize(path)
+    info.mtime = mtime
+    with open(path, "rb") as image_file:
+        archive.addfile(info, image_file)
+    _add_bytes(archive, f"{key}.txt", row.prompt.encode(), mtime)
+    _add_bytes(archive, f"{key}.json", orjson.dumps(export_record(row)), mtime)
+    return True
+
+
+def iter_webdataset(batches: Iterator[list[Row]]) -> Iterator[bytes]:
+    sink = _ChunkSink()
+    with tarfile.open(fileobj=sink, mode="w|", format=tarfile.PAX_FORMAT) as archive:
+        for batch in batches:
+            for row in batch:
+                if row.deleted:
+                    continue
+                add_webdataset_sample(archive, row)
+                yield sink.drain()
+    yield sink.drain()
+
+
+def iter_parquet(batches: Iterator[list[Row]]) -> Iterator[bytes]:
+    """Writes each batch as its own row group and emits the bytes as soon as it is encoded."""
+    sink = _ChunkSink()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), PARQUET_SCHEMA, compression="zstd") as writer:
+        for batch in batches:
+            writer.write_table(pa.Table.from_pylist([export_record(row) for row in batch], schema=PARQUET_SCHEMA))
+            yield sink.drain()
+    yield sink.drain()
+
+
+EXPORT_WRITERS: dict[str, Callable[[Iterator[list[Row]]], Iterator[bytes]]] = {
+    "jsonl": iter_jsonl,
+    "webdataset": iter_webdataset,
+    "parquet": iter_parquet,
+}
+
+
+# WebDataset shards hold samples only and have no way to express a deletion
+INCREMENTAL_FORMATS: set[str] = {"jsonl", "parquet"}
+
+
+def stream_export(
+        format: ExportFormat,
+        batch_size: int | None = None,
+        since: int | None = None,
+        until: int | None = None
+    ) -> Iterator[bytes]:
+    """
+    Encodes the labelled dataset incrementally, one database batch at a time. With since,
+    only the changes after that watermark (up to until) are exported, tombstones included.
+    """
+    if since is not None and format not in INCREMENTAL_FORMATS:
+        raise ValueError(f"Incremental exports are not supported for {format}")
+    return EXPORT_WRITERS[format](iter_labelled_batches(batch_size, since=since, until=until))
+
+
+def write_webdataset_shards(directory: str, shard_size: int, batch_size: int | None = None) -> list[str]:
+    """Writes the labelled dataset as numbered WebDataset tar shards of shard_size samples each."""
+    os.makedirs(directory, exist_ok=True)
+    shard_paths: list[str] = []
+    archive: tarfile.TarFile | None = None
+    samples: int = 0
+    try:
+        for batch in iter_labelled_batches(batch_size):
+            for row in batch:
+                if archive is None or samples == shard_size:
+                    if archive is not None:
+                        archive.close()
+                    shard_paths.append(os.path.join(directory, f"dataset-{len(shard_paths):06d}.tar"))
+                    archive = tarfile.open(shard_paths[-1], mode="w", format=tarfile.PAX_FORMAT)
+                    samples = 0
+                if add_webdataset_sample(archive, row):
+                    samples += 1
+    finally:
+        if archive is not None:
+            archive.close()
+    logging.info(f"Wrote {len(shard_paths)} WebDataset shards to {directory}")
+    return shard_paths
+
+
+def write_export(
+        format: ExportFormat,
+        output_path: str,
+        batch_size: int | None = None,
+        since: int | None = None
+    ) -> int:
+    """Streams an export into a single file and returns the watermark to pass as the next since."""
+    directory: str = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    watermark: int = export_watermark()
+    size: int = 0
+    with open(output_path, "wb") as out_file:
+        for chunk in stream_export(format, batch_size, since=since, until=watermark):
+            out_file.write(chunk)
+            size += len(chunk)
+    logging.info(f"Wrote {size} bytes of {format} to {output_path}, changes up to {watermark}")
+    return watermark
@@ -0,0 +1,216 @@
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import hashlib
+import logging
+import os
+import shutil
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+from app.core.config import config
+from app.core.storage import resolve_image_path
+from app.services.export import iter_labelled_batches
+
+SPLITS: tuple[str, ...] = ("train", "validation")
+
+# Feature metadata the datasets library reads from the Parquet schema to decode each column
+HF_FEATURES: dict[str, dict] = {
+    "id": {"dtype": "string", "_type": "Value"},
+    "image": {"_type": "Image"},
+    "image_name": {"dtype": "string", "_type": "Value"},
+    "prompt": {"dtype": "string", "_type": "Value"},
+    "tags": {"feature": {"dtype": "string", "_type": "Value"}, "_type": "Sequence"},
+    "gender": {"dtype": "string", "_type": "Value"},
+}
+
+HF_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("image", pa.struct([("bytes", pa.binary()), ("path", pa.string())])),
+    ("image_name", pa.string()),
+    ("prompt", pa.string()),
+    ("tags", pa.list_(pa.string())),
+    ("gender", pa.string()),
+]).with_metadata({"huggingface": orjson.dumps({"info": {"features": HF_FEATURES}}).decode()})
+
+# Small row groups let datasets stream image shards without reading whole files
+HF_ROW_GROUP_SIZE: int = 100
+
+
+def assign_split(image_id: str, validation_fraction: float) -> str:
+    """Splits by a hash of the id so every image stays in the same split across exports."""
+    bucket: float = int(hashlib.sha256(image_id.encode()).hexdigest()[:8], 16) / 0xFFFFFFFF
+    return "validation" if bucket < validation_fraction else "train"
+
+
+def write_parquet_shard(records: list[dict], path: str, embed_images: bool) -> tuple[int, int]:
+    """
+    Reads the images for one shard and writes it as Parquet. Runs inside the export worker
+    processes. Returns the number of examples written and their in-memory size in bytes.
+    """
+    rows: list[dict] = []
+    for record in records:
+        image_path: str | None = resolve_image_path(record["image_name"])
+        if not image_path:
+            logging.warning(f"Skipping {record['image_name']} in export, the image file is missing")
+            continue
+        if embed_images:
+            with open(image_path, "rb") as image_file:
+                image: dict = {"bytes": image_file.read(), "path": record["image_name"]}
+        else:
+            image = {"bytes": None, "path": os.path.abspath(image_path)}
+        rows.append({**record, "image": image})
+
+    table: pa.Table = pa.Table.from_pylist(rows, schema=HF_SCHEMA)
+    temp_path: str = f"{path}.part"
+    pq.write_table(table, temp_path, row_group_size=HF_ROW_GROUP_SIZE)
+    os.replace(temp_path, path)
+    return table.num_rows, table.nbytes
+
+
+def _readme(splits: dict[str, dict], download_size: int) -> str:
+    """The dataset card front matter the Hub and load_dataset use to find the splits and features."""
+    feature_lines: list[str] = []
+    for name, feature in HF_FEATURES.items():
+        feature_lines.append(f"  - name: {name}")
+        if feature["_type"] == "Image":
+            feature_lines.append("    dtype: image")
+        elif feature["_type"] == "Sequence":
+            feature_lines.append(f"    sequence: {feature['feature']['dtype']}")
+        else:
+            feature_lines.append(f"    dtype: {feature['dtype']}")
+    split_lines: list[str] = []
+    data_file_lines: list[str] = []
+    for name, split in splits.items():
+        split_lines += [f"  - name: {name}", f"    num_bytes: {split['num_bytes']}", f"    num_examples: {split['num_examples']}"]
+        data_file_lines += [f"  - split: {name}", f"    path: data/{name}-*"]
+    dataset_size: int = sum(split["num_bytes"] for split in splits.values())
+    return "\n".join([
+        "---",
+        "configs:",
+        "- config_name: default",
+        "  data_files:",
+        *data_file_lines,
+        "dataset_info:",
+        "  features:",
+        *feature_lines,
+        "  splits:",
+        *split_lines,
+        f"  download_size: {download_size}",
+        f"  dataset_size: {dataset_size}",
+        "---",
+        "",
+        f"# {config.APP_NAME}",
+        "",
+        "Labelled images exported from the annotation service.",
+        "",
+    ])
+
+
+def _write_shards(
+        data_dir: str,
+        shard_size: int,
+        workers: int,
+        embed_images: bool,
+        validation_fraction: float,
+        batch_size: int | None
+    ) -> tuple[dict[str, dict], int]:
+    """Writes every split's shards into data_dir and returns the split metadata and download size."""
+    pending: dict[str, list[dict]] = {split: [] for split in SPLITS}
+    shards: dict[str, list[tuple[str, Future]]] = {split: [] for split in SPLITS}
+    in_flight: set[Future] = set()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def submit(split: str) -> None:
+            path: str = os.path.join(data_dir, f"{split}-{len(shards[split]):05d}.parquet")
+            future: Future = executor.submit(write_parquet_shard, pending[split], path, embed_images)
+            shards[split].append((path, future))
+            in_flight.add(future)
+            pending[split] = []
+            while len(in_flight) > workers * 2:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                in_flight.difference_update(done)
+
+        for batch in iter_labelled_batches(batch_size):
+            for row in batch:
+                split: str = assign_split(row.id, validation_fraction)
+                pending[split].append({
+                    "id": row.id,
+                    "image_name": row.image_name,
+                    "prompt": row.prompt,
+                    "tags": row.tags,
+                    "gender": row.gender,
+                })
+                if len(pending[split]) >= shard_size:
+                    submit(split)
+        for split in SPLITS:
+            if pending[split]:
+                submit(split)
+        wait(in_flight)
+
+    # The shard count is only known once every row has been read
+    splits: dict[str, dict] = {}
+    download_size: int = 0
+    for split, split_shards in shards.items():
+        if not split_shards:
+            continue
+        num_examples, num_bytes = 0, 0
+        for index, (path, future) in enumerate(split_shards):
+            examples, size = future.result()
+            num_examples += examples
+            num_bytes += size
+            final_path: str = os.path.join(data_dir, f"{split}-{index:05d}-of-{len(split_shards):05d}.parquet")
+            os.replace(path, final_path)
+            download_size += os.path.getsize(final_path)
+        splits[split] = {"name": split, "num_bytes": num_bytes, "num_examples": num_examples}
+        logging.info(f"Wrote {num_examples} {split} examples in {len(split_shards)} shards")
+    return splits, download_size
+
+
+def export_hf_dataset(
+        output_dir: str,
+        shard_size: int = 1000,
+        workers: int | None = None,
+        embed_images: bool = True,
+        validation_fraction: float = 0.0,
+        batch_size: int | None = None
+    ) -> dict[str, dict]:
+    """
+    Writes the labelled dataset as a directory load_dataset can read: Parquet shards of
+    shard_size examples under data/, named <split>-NNNNN-of-MMMMM.parquet, with the split
+    and feature metadata in README.md and dataset_info.json.
+
+    Rows stream from the database in this process while whole shards are encoded on a
+    process pool, so reading the images and compressing Parquet use every core. At most
+    twice as many shards as workers are held in memory at once. Referenced images store
+    absolute paths into DATA_DIR instead of the image bytes.
+
+    Shards are written to a fresh directory that replaces data/ once complete, so shards
+    left by an earlier export to the same directory never match the README's globs.
+    """
+    workers = int(workers or config.IMAGE_WORKERS)
+    data_dir: str = os.path.join(output_dir, "data")
+    staging_dir: str = os.path.join(output_dir, f".data-{uuid.uuid4().hex}")
+    os.makedirs(staging_dir)
+    try:
+        splits, download_size = _write_shards(
+            staging_dir, shard_size, workers, embed_images, validation_fraction, batch_size
+        )
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    if os.path.isdir(data_dir):
+        shutil.rmtree(data_dir)
+    os.replace(staging_dir, data_dir)
+
+    with open(os.path.join(output_dir, "dataset_info.json"), "wb") as info_file:
+        info_file.write(orjson.dumps({
+            "features": HF_FEATURES,
+            "splits": splits,
+            "download_size": download_size,
+            "dataset_size": sum(split["num_bytes"] for split in splits.values()),
+        }, option=orjson.OPT_INDENT_2))
+    with open(os.path.join(output_dir, "README.md"), "w") as readme_file:
+        readme_file.write(_readme(splits, download_size))
+    return splits
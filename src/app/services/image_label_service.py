@@ -1,34 +1,53 @@
-from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, status, Cookie
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Depends
 
-from datetime import datetime, timedelta,timezone
-from typing import Annotated
-import logging
+from app.core.concurrency import run_script
+from app.db.db import get_async_db
 
-from app.core.config import config
-from app.db.db import get_db
-
-from app.db.schema import Image
-from app.models.image_label_model import ImageLabelCreate, ImageLabelUpdate, ImageLabelRead
+from app.models.image_label_model import ImageLabelCreate, ImageLabelUpdate
 from app.db.scripts.image_label_scripts import (
-    get_image_label, get_all_image_labels, create_image_label, update_image_label, delete_image_label
+    get_image_label, get_all_image_labels, create_image_label, update_image_label, delete_image_label,
+    get_image_labels_page
 )
+from app.services.tag_index import tag_index
+
 
-class ImageLabelService:
-    def __init__(self, db: Session = Depends(get_db)):
+class AsyncImageLabelService:
+    def __init__(self, db: AsyncSession = Depends(get_async_db)):
         self.db = db
 
-    def get_image_label(self, image_label_id: str):
-        return get_image_label(image_label_id=image_label_id, session=self.db)
-    
-    def get_all_image_labels(self, limit: int, offset: int):
-        return get_all_image_labels(limit=limit, offset=offset, session=self.db)
-    
-    def create_image_label(self, image_label: ImageLabelCreate):
-        return create_image_label(image_label=image_label, session=self.db)
-    
-    def update_image_label(self, image_label_id: str, image_label: ImageLabelUpdate):
-        return update_image_label(image_label_id=image_label_id, image_label=image_label, session=self.db)
-    
-    def delete_image_label(self, image_label_id: str):
-        return delete_image_label(image_label_id=image_label_id, session=self.db)
\ No newline at end of file
+    async def get_image_label(self, image_label_id: str):
+        return await run_script(self.db, get_image_label, image_label_id=image_label_id)
+
+    async def get_all_image_labels(self, limit: int, offset: int):
+        return await run_script(self.db, get_all_image_labels, limit=limit, offset=offset)
+
+    async def get_image_labels_page(self, limit: int, cursor: str | None):
+        return await run_script(self.db, get_image_labels_page, limit=limit, cursor=cursor)
+
+    async def create_image_label(self, image_label: ImageLabelCreate):
+        created = await run_script(self.db, create_image_label, image_label=image_label)
+        if not created:
+            return None
+        # Relabelling updates the image's label in place, replacing the tags it had
+        new_image_label, previous_tags = created
+        tag_index.update(added=new_image_label.tags, removed=previous_tags)
+        return new_image_label
+
+    async def update_image_label(self, image_label_id: str, image_label: ImageLabelUpdate):
+        # Only a tag change touches the index, and it needs the tags being replaced
+        previous_tags: list[str] = []
+        if image_label.tags:
+            previous = await run_script(self.db, get_image_label, image_label_id=image_label_id)
+            previous_tags = list(previous.tags)
+        updated = await run_script(
+            self.db, update_image_label, image_label_id=image_label_id, image_label=image_label
+        )
+        if updated and image_label.tags:
+            tag_index.update(added=updated.tags, removed=previous_tags)
+        return updated
+
+    async def delete_image_label(self, image_label_id: str):
+        tags: list[str] | None = await run_script(self.db, delete_image_label, image_label_id=image_label_id)
+        if tags:
+            tag_index.update(removed=tags)
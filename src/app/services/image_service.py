@@ -1,42 +1,78 @@
-from sqlalchemy.orm import Session
-from fastapi import Depends, HTTPException, status, Cookie
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import Depends
 
-from datetime import datetime, timedelta,timezone
-from typing import Annotated
-import logging
+from app.core.concurrency import run_script
+from app.db.db import get_async_db
 
-from app.core.config import config
-from app.db.db import get_db
-
-from app.db.schema import Image
 from app.models.image_model import ImageCreate, ImageUpdate
 from app.db.scripts.image_scripts import (
-    get_image, get_image_by_name, get_all_images, create_image, update_image, delete_image, 
-    get_unlabelled_image
+    get_image, get_image_by_name, get_all_images, create_image, create_images, update_image, delete_image,
+    get_unlabelled_image, get_image_by_checksum, get_images_page, get_image_names_page, claim_unlabelled_images,
+    release_expired_leases, search_images
 )
 
 
-class ImageService:
-    def __init__(self, db: Session = Depends(get_db)):
+class AsyncImageService:
+    def __init__(self, db: AsyncSession = Depends(get_async_db)):
         self.db = db
 
-    def get_image(self, image_id: str):
-        return get_image(image_id=image_id, session=self.db)
+    async def get_image(self, image_id: str):
+        return await run_script(self.db, get_image, image_id=image_id)
+
+    async def get_image_by_name(self, image_name: str):
+        return await run_script(self.db, get_image_by_name, image_name=image_name)
+
+    async def get_image_by_checksum(self, checksum: str):
+        return await run_script(self.db, get_image_by_checksum, checksum=checksum)
+
+    async def get_all_images(self, limit: int, offset: int):
+        return await run_script(self.db, get_all_images, limit=limit, offset=offset)
+
+    async def get_images_page(self, limit: int, cursor: str | None):
+        return await run_script(self.db, get_images_page, limit=limit, cursor=cursor)
+
+    async def search_images(
+            self, tags_all: list[str], tags_any: list[str], gender: str | None, limit: int, cursor: str | None,
+            text: str | None = None
+        ):
+        return await run_script(
+            self.db, search_images,
+            tags_all=tags_all, tags_any=tags_any, gender=gender, limit=limit, cursor=cursor, text=text
+        )
+
+    async def get_image_names_page(
+            self, limit: int, cursor: str | None, min_quality: float | None = None, order_by_quality: bool = False
+        ):
+        return await run_script(
+            self.db, get_image_names_page,
+            limit=limit, cursor=cursor, min_quality=min_quality, order_by_quality=order_by_quality
+        )
+
+    async def create_image(self, image: ImageCreate):
+        return await run_script(self.db, create_image, image=image)
+
+    async def create_images(self, images: list[ImageCreate]):
+        return await run_script(self.db, create_images, images=images)
 
-    def get_image_by_name(self, image_name: str):
-        return get_image_by_name(image_name=image_name, session=self.db)
+    async def update_image(self, image_id: str, image: ImageUpdate):
+        return await run_script(self.db, update_image, image_id=image_id, image=image)
 
-    def get_all_images(self, limit: int, offset: int):
-        return get_all_images(limit=limit, offset=offset, session=self.db)
+    async def delete_image(self, image_id: str):
+        return await run_script(self.db, delete_image, image_id=image_id)
 
-    def create_image(self, image: ImageCreate):
-        return create_image(image=image, session=self.db)
+    async def get_unlabelled_image(self, min_quality: float | None = None, order_by_quality: bool = False):
+        return await run_script(
+            self.db, get_unlabelled_image, min_quality=min_quality, order_by_quality=order_by_quality
+        )
 
-    def update_image(self, image_id: str, image: ImageUpdate):
-        return update_image(image_id=image_id, image=image, session=self.db)
+    async def claim_unlabelled_images(
+            self, count: int, claimed_by: str | None = None, min_quality: float | None = None,
+            order_by_quality: bool = False
+        ):
+        return await run_script(
+            self.db, claim_unlabelled_images,
+            count=count, claimed_by=claimed_by, min_quality=min_quality, order_by_quality=order_by_quality
+        )
 
-    def delete_image(self, image_id: str):
-        return delete_image(image_id=image_id, session=self.db)
-    
-    def get_unlabelled_image(self):
-        return get_unlabelled_image(session=self.db)
\ No newline at end of file
+    async def release_expired_leases(self):
+        return await run_script(self.db, release_expired_leases)
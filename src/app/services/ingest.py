@@ -0,0 +1,123 @@
+import mimetypes
+import os
+import tarfile
+import zipfile
+import logging
+from typing import BinaryIO, Iterator
+
+from app.core.config import config
+from app.core.storage import (
+    ALLOWED_CONTENT_TYPES, CONTENT_TYPE_EXTENSIONS, StoredFile, discard_duplicate, discard_stored, save_fileobj,
+    sniff_content_type
+)
+from app.db.db import SessionLocal
+from app.db.scripts.image_scripts import create_images
+from app.imaging.derivatives import schedule_derivatives
+from app.services.near_duplicates import hash_images
+from app.services.quality import analyse_images
+from app.models.image_model import ImageCreate
+from app.services.jobs import jobs
+
+
+def iter_archive_members(archive_path: str) -> Iterator[tuple[str, BinaryIO]]:
+    """
+    Yields the regular files in a ZIP or tar archive one at a time as readable streams,
+    so members are decompressed on the fly instead of extracting the whole archive.
+    """
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                with archive.open(info) as member:
+                    yield info.filename, member
+    else:
+        # "r|*" reads the tar sequentially, transparently handling gzip/bz2/xz compression
+        with tarfile.open(archive_path, mode="r|*") as archive:
+            for info in archive:
+                if not info.isfile():
+                    continue
+                member = archive.extractfile(info)
+                if member:
+                    yield info.name, member
+
+
+def count_archive_members(archive_path: str) -> int | None:
+    """Returns the number of files in a ZIP archive; tar streams cannot be counted up front."""
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            return sum(1 for info in archive.infolist() if not info.is_dir())
+    return None
+
+
+def is_image_member(name: str) -> bool:
+    basename: str = os.path.basename(name)
+    if not basename or basename.startswith(".") or name.startswith("__MACOSX/"):
+        return False
+    content_type, _ = mimetypes.guess_type(basename)
+    return content_type in ALLOWED_CONTENT_TYPES
+
+
+def register_stored_files(job_id: str, stored_files: list[StoredFile]) -> None:
+    """
+    Bulk registers a chunk of stored files, discarding duplicates of existing images
+    and the files this chunk created if the insert fails.
+    """
+    if not stored_files:
+        return
+    session = SessionLocal()
+    try:
+        results = create_images(
+            [ImageCreate(image_name=stored.filename, checksum=stored.checksum) for stored in stored_files],
+            session
+        )
+    except Exception as e:
+        logging.error(f"Failed to register {len(stored_files)} images: {e}")
+        for stored in stored_files:
+            discard_stored(stored)
+        jobs.add_error(job_id, f"Failed to register {len(stored_files)} images: {e}", failed=len(stored_files))
+        return
+    finally:
+        session.close()
+
+    created: list[str] = []
+    for stored, (image, was_created) in zip(stored_files, results):
+        if was_created:
+            created.append(image.image_name)
+        else:
+            discard_duplicate(stored, image.image_name)
+    schedule_derivatives(created)
+    jobs.increment(job_id, created=len(created), duplicates=len(stored_files) - len(created))
+    hash_images(created)
+    analyse_images(created)
+
+
+def ingest_archive(job_id: str, archive_path: str) -> None:
+    """Extracts the JPEG and PNG members of an archive into the data directory in chunks."""
+    logging.info(f"Ingesting archive {archive_path} for job {job_id}")
+    batch_size: int = int(config.INGEST_BATCH_SIZE)
+    batch: list[StoredFile] = []
+    try:
+        jobs.update(job_id, total=count_archive_members(archive_path))
+        for name, member in iter_archive_members(archive_path):
+            jobs.increment(job_id, processed=1)
+            if not is_image_member(name):
+                jobs.increment(job_id, skipped=1)
+                continue
+            content_type: str | None = sniff_content_type(member.peek(16)[:16])
+            if content_type is None:
+                jobs.add_error(job_id, f"{name}: not a JPEG or PNG image")
+                continue
+            try:
+                stored: StoredFile = save_fileobj(member, CONTENT_TYPE_EXTENSIONS[content_type])
+            except Exception as e:
+                jobs.add_error(job_id, f"{name}: {getattr(e, 'detail', e)}")
+                continue
+            batch.append(stored)
+            if len(batch) >= batch_size:
+                register_stored_files(job_id, batch)
+                batch = []
+        register_stored_files(job_id, batch)
+    finally:
+        os.remove(archive_path)
+        logging.info(f"Finished ingesting archive for job {job_id}")
@@ -0,0 +1,72 @@
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Callable
+from uuid import uuid4
+import logging
+
+from app.core.config import config
+from app.models.job_model import JobRead
+
+# Only the most recent errors are kept so that a bad archive cannot grow a job without bound
+MAX_JOB_ERRORS: int = 100
+
+
+class JobRegistry:
+    """Tracks the progress of long running ingest jobs executed on a small worker pool."""
+
+    def __init__(self, max_workers: int):
+        self._jobs: dict[str, JobRead] = {}
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+
+    def submit(self, kind: str, func: Callable[..., None], *args, **kwargs) -> JobRead:
+        job = JobRead(id=f"JOB-{uuid4()}", kind=kind)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job.id, func, *args, **kwargs)
+        return job
+
+    def get(self, job_id: str) -> JobRead:
+        with self._lock:
+            job: JobRead | None = self._jobs.get(job_id)
+            if not job:
+                raise HTTPException(status_code=404, detail="Job not found")
+            return job.model_copy(deep=True)
+
+    def update(self, job_id: str, **changes) -> None:
+        with self._lock:
+            job: JobRead = self._jobs[job_id]
+            for key, value in changes.items():
+                setattr(job, key, value)
+
+    def increment(self, job_id: str, **counts: int) -> None:
+        with self._lock:
+            job: JobRead = self._jobs[job_id]
+            for key, value in counts.items():
+                setattr(job, key, getattr(job, key) + value)
+
+    def add_error(self, job_id: str, error: str, failed: int = 1) -> None:
+        with self._lock:
+            job: JobRead = self._jobs[job_id]
+            job.failed += failed
+            job.errors = (job.errors + [error])[-MAX_JOB_ERRORS:]
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job_id: str, func: Callable[..., None], *args, **kwargs) -> None:
+        self.update(job_id, status="running")
+        try:
+            func(job_id, *args, **kwargs)
+        except Exception as e:
+            logging.exception(f"Job {job_id} failed: {e}")
+            self.add_error(job_id, str(e), failed=0)
+            self.update(job_id, status="failed", finished_at=datetime.now(timezone.utc))
+        else:
+            self.update(job_id, status="completed", finished_at=datetime.now(timezone.utc))
+
+
+jobs = JobRegistry(max_workers=int(config.JOB_WORKERS))
@@ -0,0 +1,124 @@
+import orjson
+
+import csv
+import logging
+import os
+from typing import Callable, Iterator
+
+from app.core.utils import normalize_tags
+from app.db.db import SessionLocal
+from app.db.scripts.image_label_scripts import get_tag_counts
+from app.db.scripts.label_import_scripts import copy_labels
+from app.models.image_label_model import LabelImportReport
+from app.services.jobs import MAX_JOB_ERRORS, jobs
+from app.services.tag_index import tag_index
+
+LABEL_IMPORT_FORMATS: dict[str, str] = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+}
+
+# How often, in rows, progress is reported while the file is being copied
+PROGRESS_INTERVAL: int = 10000
+
+
+def iter_label_records(path: str, format: str) -> Iterator[tuple[int, dict | None, str | None]]:
+    """
+    Yields (line number, record, error) for each label in a CSV file with an image_name,
+    prompt, tags, gender header or a JSONL file with one object per line.
+    """
+    with open(path, newline="", encoding="utf-8") as in_file:
+        if format == "csv":
+            reader = csv.DictReader(in_file)
+            for record in reader:
+                yield reader.line_num, record, None
+        else:
+            for line_no, line in enumerate(in_file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = orjson.loads(line)
+                except orjson.JSONDecodeError as e:
+                    yield line_no, None, f"invalid JSON: {e}"
+                    continue
+                if not isinstance(record, dict):
+                    yield line_no, None, "expected a JSON object"
+                    continue
+                yield line_no, record, None
+
+
+def normalize_label(record: dict) -> tuple[str, str, str, str]:
+    image_name: str = str(record.get("image_name") or "").strip()
+    if not image_name:
+        raise ValueError("missing image_name")
+    tags = record.get("tags") or []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    # Staged as comma joined text and split back into an array by the upsert
+    tags = ",".join(normalize_tags([str(tag).replace(",", " ") for tag in tags]))
+    return image_name, str(record.get("prompt") or ""), tags, str(record.get("gender") or "")
+
+
+def import_labels_file(
+        path: str,
+        format: str | None = None,
+        on_progress: Callable[[int], None] | None = None
+    ) -> LabelImportReport:
+    """Parses a label file and loads it with copy_labels, collecting invalid and unmatched lines."""
+    format = format or LABEL_IMPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+    if format not in LABEL_IMPORT_FORMATS.values():
+        raise ValueError("Label files must be CSV or JSONL")
+    report = LabelImportReport()
+
+    def rows() -> Iterator[tuple[int, str, str, str, str]]:
+        for line_no, record, error in iter_label_records(path, format):
+            report.total += 1
+            if on_progress and report.total % PROGRESS_INTERVAL == 0:
+                on_progress(report.total)
+            if record is not None:
+                try:
+                    yield (line_no, *normalize_label(record))
+                    continue
+                except ValueError as e:
+                    error = str(e)
+            report.invalid += 1
+            if len(report.errors) < MAX_JOB_ERRORS:
+                report.errors.append(f"line {line_no}: {error}")
+
+    session = SessionLocal()
+    try:
+        result: dict = copy_labels(rows(), session, max_unmatched=MAX_JOB_ERRORS)
+        # The upsert bypasses the per-label index updates, so recount every tag instead
+        tag_index.load(get_tag_counts(session=session) or [])
+    finally:
+        session.close()
+    report.inserted = result["inserted"]
+    report.updated = result["updated"]
+    report.unmatched = result["unmatched"]
+    report.errors += [f"line {line_no}: no image named {image_name}" for line_no, image_name in result["unmatched_rows"]]
+    logging.info(
+        f"Imported labels from {path}: {report.inserted} inserted, {report.updated} updated, "
+        f"{report.unmatched} unmatched, {report.invalid} invalid"
+    )
+    return report
+
+
+def import_labels(job_id: str, path: str) -> None:
+    """Runs a label import in a job worker thread, removing the uploaded file when done."""
+    try:
+        report: LabelImportReport = import_labels_file(
+            path, on_progress=lambda processed: jobs.update(job_id, processed=processed)
+        )
+    finally:
+        os.remove(path)
+    jobs.update(
+        job_id,
+        total=report.total,
+        processed=report.total,
+        created=report.inserted,
+        updated=report.updated,
+        skipped=report.unmatched,
+        failed=report.invalid,
+        errors=report.errors[-MAX_JOB_ERRORS:]
+    )
@@ -0,0 +1,19 @@
+import asyncio
+import logging
+
+from app.core.config import config
+from app.db.db import AsyncSessionLocal
+from app.services.image_service import AsyncImageService
+
+
+async def reclaim_expired_leases_forever() -> None:
+    """Periodically returns images whose labelling lease expired to the unlabelled queue."""
+    while True:
+        try:
+            async with AsyncSessionLocal() as session:
+                released: int | None = await AsyncImageService(session).release_expired_leases()
+            if released:
+                logging.info(f"Returned {released} images with expired leases to the queue")
+        except Exception as e:
+            logging.error(f"Failed to reclaim expired leases: {e}")
+        await asyncio.sleep(int(config.LEASE_RECLAIM_INTERVAL))
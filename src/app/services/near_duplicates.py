@@ -0,0 +1,231 @@
+from fastapi import HTTPException
+
+import asyncio
+import logging
+from threading import Lock
+from typing import Iterable
+
+from app.core.config import config
+from app.core.storage import resolve_image_path
+from app.db.db import SessionLocal
+from app.db.scripts.image_scripts import get_image_hashes, get_unhashed_images, set_image_hashes
+from app.imaging.phash import hamming_distance, phash_file, to_signed, to_unsigned
+from app.imaging.pool import get_pool
+from app.models.image_model import DuplicateCluster, NearDuplicate
+from app.services.jobs import jobs
+
+
+class _Node:
+    __slots__ = ("image_hash", "image_names", "children")
+
+    def __init__(self, image_hash: int, image_name: str):
+        self.image_hash = image_hash
+        self.image_names: list[str] = [image_name]
+        self.children: dict[int, _Node] = {}
+
+
+class BKTree:
+    """
+    A BK-tree over perceptual hashes. Every child sits at a known Hamming distance from
+    its parent, so by the triangle inequality a search for hashes within d of a query
+    only descends into children whose edge distance is within d of the parent's distance
+    to the query, skipping most of the tree. Images with identical hashes share a node.
+    """
+
+    def __init__(self):
+        self._root: _Node | None = None
+        self._hashes: dict[str, int] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def get(self, image_name: str) -> int | None:
+        return self._hashes.get(image_name)
+
+    def load(self, hashes: Iterable[tuple[str, int]]) -> None:
+        """Replaces the whole tree, building the new one before swapping it in."""
+        tree = BKTree()
+        for image_name, image_hash in hashes:
+            tree._insert(image_name, to_unsigned(image_hash))
+        with self._lock:
+            self._root, self._hashes = tree._root, tree._hashes
+
+    def add(self, image_name: str, image_hash: int) -> None:
+        with self._lock:
+            if image_name not in self._hashes:
+                self._insert(image_name, to_unsigned(image_hash))
+
+    def _insert(self, image_name: str, image_hash: int) -> None:
+        self._hashes[image_name] = image_hash
+        if self._root is None:
+            self._root = _Node(image_hash, image_name)
+            return
+        node: _Node = self._root
+        while True:
+            distance: int = hamming_distance(image_hash, node.image_hash)
+            if distance == 0:
+                node.image_names.append(image_name)
+                return
+            child: _Node | None = node.children.get(distance)
+            if child is None:
+                node.children[distance] = _Node(image_hash, image_name)
+                return
+            node = child
+
+    def _search(self, image_hash: int, max_distance: int) -> list[tuple[_Node, int]]:
+        matches: list[tuple[_Node, int]] = []
+        stack: list[_Node] = [self._root] if self._root else []
+        while stack:
+            node: _Node = stack.pop()
+            distance: int = hamming_distance(image_hash, node.image_hash)
+            if distance <= max_distance:
+                matches.append((node, distance))
+            stack.extend(
+                child for edge, child in node.children.items()
+                if distance - max_distance <= edge <= distance + max_distance
+            )
+        return matches
+
+    def search(self, image_hash: int, max_distance: int) -> list[tuple[str, int]]:
+        """Every (image_name, distance) within max_distance of a hash, closest first."""
+        with self._lock:
+            matches = self._search(to_unsigned(image_hash), max_distance)
+        return sorted(
+            ((image_name, distance) for node, distance in matches for image_name in node.image_names),
+            key=lambda match: (match[1], match[0])
+        )
+
+    def clusters(self, max_distance: int) -> list[list[str]]:
+        """
+        Groups images into connected components of the "within max_distance" relation,
+        searching once per distinct hash and merging the matches with union-find.
+        """
+        parents: dict[int, int] = {}
+
+        def find(image_hash: int) -> int:
+            root: int = image_hash
+            while parents.get(root, root) != root:
+                root = parents[root]
+            while image_hash != root:
+                parents[image_hash], image_hash = root, parents.get(image_hash, image_hash)
+            return root
+
+        with self._lock:
+            nodes: list[_Node] = []
+            stack: list[_Node] = [self._root] if self._root else []
+            while stack:
+                node: _Node = stack.pop()
+                nodes.append(node)
+                stack.extend(node.children.values())
+            for node in nodes:
+                for match, _ in self._search(node.image_hash, max_distance):
+                    first, second = find(node.image_hash), find(match.image_hash)
+                    if first != second:
+                        parents[second] = first
+
+            groups: dict[int, list[str]] = {}
+            for node in nodes:
+                groups.setdefault(find(node.image_hash), []).extend(node.image_names)
+        return [group for group in groups.values() if len(group) > 1]
+
+
+near_duplicate_index = BKTree()
+
+
+def hash_images(image_names: list[str]) -> int:
+    """
+    Computes the perceptual hashes of stored images on the image worker pool, saves them
+    and adds them to the index. Images that are missing or fail to decode are skipped.
+    Returns the number of images hashed.
+    """
+    found: list[tuple[str, str]] = [
+        (image_name, path) for image_name in image_names if (path := resolve_image_path(image_name))
+    ]
+    hashes: list[tuple[str, int]] = [
+        (image_name, to_signed(image_hash))
+        for (image_name, _), image_hash in zip(
+            found, get_pool().map(phash_file, [path for _, path in found], chunksize=16)
+        )
+        if image_hash is not None
+    ]
+    if not hashes:
+        return 0
+    session = SessionLocal()
+    try:
+        set_image_hashes(hashes, session=session)
+    finally:
+        session.close()
+    for image_name, image_hash in hashes:
+        near_duplicate_index.add(image_name, image_hash)
+    return len(hashes)
+
+
+def backfill_image_hashes(job_id: str | None = None, batch_size: int | None = None) -> int:
+    """Hashes every stored image that has no perceptual hash yet, a batch at a time."""
+    batch_size = int(batch_size or config.PHASH_BATCH_SIZE)
+    hashed: int = 0
+    after_id: str | None = None
+    while True:
+        session = SessionLocal()
+        try:
+            batch: list[tuple[str, str]] = get_unhashed_images(limit=batch_size, after_id=after_id, session=session)
+        finally:
+            session.close()
+        if not batch:
+            break
+        # Keyset paging moves past images that could not be hashed instead of retrying them forever
+        after_id = batch[-1][0]
+        count: int = hash_images([image_name for _, image_name in batch])
+        hashed += count
+        if job_id:
+            jobs.increment(job_id, processed=len(batch), updated=count, failed=len(batch) - count)
+        logging.info(f"Hashed {hashed} images")
+    return hashed
+
+
+def load_near_duplicate_index() -> None:
+    session = SessionLocal()
+    try:
+        hashes: list[tuple[str, int]] = get_image_hashes(session=session) or []
+    finally:
+        session.close()
+    near_duplicate_index.load(hashes)
+    logging.info(f"Loaded {len(near_duplicate_index)} image hashes into the near duplicate index")
+
+
+async def refresh_near_duplicate_index_forever() -> None:
+    """
+    Builds the index at startup, then rebuilds it periodically. Images hashed by this
+    process are added immediately; the rebuilds drop deleted images and pick up images
+    hashed by other workers or the backfill command.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(load_near_duplicate_index)
+        except Exception as e:
+            logging.error(f"Failed to load the near duplicate index: {e}")
+        await asyncio.sleep(int(config.NEAR_DUPLICATE_INDEX_REFRESH_INTERVAL))
+
+
+def find_near_duplicates(image_name: str, max_distance: int) -> list[NearDuplicate]:
+    image_hash: int | None = near_duplicate_index.get(image_name)
+    if image_hash is None:
+        raise HTTPException(status_code=404, detail="Image has not been hashed")
+    return [
+        NearDuplicate(image_name=match, distance=distance)
+        for match, distance in near_duplicate_index.search(image_hash, max_distance)
+        if match != image_name
+    ]
+
+
+def find_duplicate_clusters(max_distance: int, min_size: int = 2) -> list[DuplicateCluster]:
+    """Groups of near duplicate images, largest first."""
+    clusters: list[list[str]] = near_duplicate_index.clusters(max_distance)
+    return sorted(
+        (
+            DuplicateCluster(size=len(cluster), image_names=sorted(cluster))
+            for cluster in clusters if len(cluster) >= min_size
+        ),
+        key=lambda cluster: -cluster.size
+    )
@@ -0,0 +1,64 @@
+import logging
+
+from app.core.config import config
+from app.core.storage import resolve_image_path
+from app.db.db import SessionLocal
+from app.db.scripts.image_scripts import get_unanalysed_images, set_image_quality
+from app.imaging.pool import get_pool
+from app.imaging.quality import quality_file
+from app.services.jobs import jobs
+
+
+def label_queue_options(min_quality: float | None = None, order: str | None = None) -> dict:
+    """The labelling queue's quality filter and order, falling back to the configured defaults."""
+    if min_quality is None and config.LABEL_MIN_QUALITY:
+        min_quality = float(config.LABEL_MIN_QUALITY)
+    return {"min_quality": min_quality, "order_by_quality": (order or config.LABEL_QUEUE_ORDER) == "quality"}
+
+
+def analyse_images(image_names: list[str]) -> int:
+    """
+    Measures the quality metrics of stored images on the image worker pool and saves them.
+    Images that are missing or fail to decode are skipped. Returns the number measured.
+    """
+    found: list[tuple[str, str]] = [
+        (image_name, path) for image_name in image_names if (path := resolve_image_path(image_name))
+    ]
+    metrics: list[tuple[str, dict]] = [
+        (image_name, values)
+        for (image_name, _), values in zip(
+            found, get_pool().map(quality_file, [path for _, path in found], chunksize=16)
+        )
+        if values is not None
+    ]
+    if not metrics:
+        return 0
+    session = SessionLocal()
+    try:
+        set_image_quality(metrics, session=session)
+    finally:
+        session.close()
+    return len(metrics)
+
+
+def backfill_image_quality(job_id: str | None = None, batch_size: int | None = None) -> int:
+    """Measures every stored image that has no quality metrics yet, a batch at a time."""
+    batch_size = int(batch_size or config.QUALITY_BATCH_SIZE)
+    analysed: int = 0
+    after_id: str | None = None
+    while True:
+        session = SessionLocal()
+        try:
+            batch: list[tuple[str, str]] = get_unanalysed_images(limit=batch_size, after_id=after_id, session=session)
+        finally:
+            session.close()
+        if not batch:
+            break
+        # Keyset paging moves past images that could not be measured instead of retrying them forever
+        after_id = batch[-1][0]
+        count: int = analyse_images([image_name for _, image_name in batch])
+        analysed += count
+        if job_id:
+            jobs.increment(job_id, processed=len(batch), updated=count, failed=len(batch) - count)
+        logging.info(f"Measured the quality of {analysed} images")
+    return analysed
@@ -0,0 +1,132 @@
+import asyncio
+import heapq
+import logging
+from itertools import chain
+from threading import Lock
+from typing import Iterable
+
+from app.core.config import config
+from app.core.concurrency import run_script
+from app.db.db import AsyncSessionLocal
+from app.db.scripts.image_label_scripts import get_tag_counts
+from app.models.image_label_model import TagCount
+
+# (-count, casefolded tag, tag): sorts the most used tags first, alphabetically among equals
+Rank = tuple[int, str, str]
+
+
+class _Node:
+    """A trie node over casefolded tags, caching the best ranked tags beneath it."""
+    __slots__ = ("children", "tags", "top")
+
+    def __init__(self):
+        self.children: dict[str, _Node] = {}
+        self.tags: set[str] = set()
+        self.top: list[Rank] = []
+
+
+class TagIndex:
+    """
+    Label tags with the number of labels carrying each, kept in memory for autocomplete.
+    Tags sit in a trie keyed by their casefolded form, whatever the case they were typed
+    in, and every node keeps the top_k best ranked tags beneath it. A completion walks
+    the prefix and slices that list, so it costs O(len(prefix) + limit) however many
+    tags share the prefix; a count change re-ranks only the nodes on the tag's path.
+    """
+
+    def __init__(self, top_k: int = int(config.MAX_TAG_AUTOCOMPLETE_LIMIT)):
+        self._counts: dict[str, int] = {}
+        self._root: _Node = _Node()
+        self._top_k: int = top_k
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def load(self, tag_counts: Iterable[tuple[str, int]]) -> None:
+        """Replaces the whole index, e.g. with the counts aggregated from the database."""
+        counts: dict[str, int] = {tag: count for tag, count in tag_counts if count > 0}
+        root: _Node = _Node()
+        # Inserting the best ranked tags first fills every node's top with the best beneath it
+        for rank in sorted((-count, tag.casefold(), tag) for tag, count in counts.items()):
+            node: _Node = root
+            if len(node.top) < self._top_k:
+                node.top.append(rank)
+            for char in rank[1]:
+                node = node.children.setdefault(char, _Node())
+                if len(node.top) < self._top_k:
+                    node.top.append(rank)
+            node.tags.add(rank[2])
+        with self._lock:
+            self._counts, self._root = counts, root
+
+    def update(self, added: Iterable[str] = (), removed: Iterable[str] = ()) -> None:
+        """Counts the tags of a created label as added and those of a deleted one as removed."""
+        added, removed = set(added), set(removed)
+        with self._lock:
+            for tag in removed - added:
+                if tag not in self._counts:
+                    continue
+                count: int = self._counts[tag] - 1
+                if count > 0:
+                    self._counts[tag] = count
+                else:
+                    del self._counts[tag]
+                self._rerank(tag)
+            for tag in added - removed:
+                self._counts[tag] = self._counts.get(tag, 0) + 1
+                self._rerank(tag)
+
+    def _rerank(self, tag: str) -> None:
+        """Rebuilds the top of every node on the path to tag after its count changed, bottom up."""
+        key: str = tag.casefold()
+        path: list[_Node] = [self._root]
+        for char in key:
+            path.append(path[-1].children.setdefault(char, _Node()))
+        if tag in self._counts:
+            path[-1].tags.add(tag)
+        else:
+            path[-1].tags.discard(tag)
+        for depth in range(len(path) - 1, -1, -1):
+            node: _Node = path[depth]
+            if depth and not node.tags and not node.children:
+                del path[depth - 1].children[key[depth - 1]]
+                continue
+            node.top = heapq.nsmallest(self._top_k, chain(
+                ((-self._counts[name], name.casefold(), name) for name in node.tags),
+                *(child.top for child in node.children.values())
+            ))
+
+    def complete(self, prefix: str, limit: int) -> list[TagCount]:
+        """The most used tags starting with prefix, ignoring case, alphabetical among equals."""
+        with self._lock:
+            node: _Node | None = self._root
+            for char in prefix.strip().casefold():
+                node = node.children.get(char)
+                if node is None:
+                    return []
+            return [TagCount(tag=tag, count=-count) for count, _, tag in node.top[:limit]]
+
+
+tag_index = TagIndex()
+
+
+async def load_tag_index() -> None:
+    """Rebuilds the index from the tags stored on every label."""
+    async with AsyncSessionLocal() as session:
+        tag_counts: list[tuple[str, int]] = await run_script(session, get_tag_counts)
+    tag_index.load(tag_counts or [])
+    logging.info(f"Loaded {len(tag_index)} tags into the autocomplete index")
+
+
+async def refresh_tag_index_forever() -> None:
+    """
+    Loads the index at startup, then reloads it periodically. Labels written through this
+    process update it immediately; the reloads catch up with bulk imports and other workers.
+    """
+    while True:
+        try:
+            await load_tag_index()
+        except Exception as e:
+            logging.error(f"Failed to load the tag index: {e}")
+        await asyncio.sleep(int(config.TAG_INDEX_REFRESH_INTERVAL))
@@ -0,0 +1,121 @@
+import httpx
+from fastapi import HTTPException, status
+from tenacity import AsyncRetrying, retry_if_exception_type, stop_after_attempt, wait_exponential
+
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Iterable, Iterator
+
+from app.core.config import config
+from app.core.storage import ALLOWED_CONTENT_TYPES, CONTENT_TYPE_EXTENSIONS, StoredFile, save_stream
+from app.services.ingest import register_stored_files
+from app.services.jobs import jobs
+
+
+class RetryableStatusError(Exception):
+    """Raised for responses that are worth retrying, such as 429 and 5xx."""
+
+
+RETRYABLE_FETCH_EXCEPTIONS = (httpx.TransportError, RetryableStatusError)
+
+
+def parse_url_lines(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Parses a plain text file with one URL per line, or a JSONL file whose lines are
+    either JSON strings or objects with a "url" key. Blank lines and comments are skipped.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("{") or line.startswith('"'):
+            record = json.loads(line)
+            line = record.get("url", "") if isinstance(record, dict) else str(record)
+        if line.startswith(("http://", "https://")):
+            yield line
+
+
+async def fetch_to_disk(
+        client: httpx.AsyncClient,
+        url: str,
+        host_limits: dict[str, asyncio.Semaphore]
+    ) -> StoredFile:
+    """Streams a remote image to disk, applying the same validation as direct uploads."""
+    async with host_limits[httpx.URL(url).host]:
+        async for attempt in AsyncRetrying(
+            stop=stop_after_attempt(int(config.URL_IMPORT_RETRIES)),
+            wait=wait_exponential(
+                multiplier=config.WAIT_EXPONENTIAL_MUTIPLIER,
+                min=config.WAIT_EXPONENTIAL_MIN, max=config.WAIT_EXPONENTIAL_MAX
+            ),
+            retry=retry_if_exception_type(RETRYABLE_FETCH_EXCEPTIONS),
+            reraise=True,
+        ):
+            with attempt:
+                async with client.stream("GET", url) as response:
+                    if response.status_code == 429 or response.status_code >= 500:
+                        raise RetryableStatusError(f"HTTP {response.status_code}")
+                    if response.status_code != 200:
+                        raise HTTPException(status_code=response.status_code, detail=f"HTTP {response.status_code}")
+
+                    content_type: str = response.headers.get("content-type", "").split(";")[0].strip()
+                    if content_type not in ALLOWED_CONTENT_TYPES:
+                        raise HTTPException(status_code=415, detail="Unsupported file type.")
+                    content_length: int = int(response.headers.get("content-length") or 0)
+                    if content_length > int(config.MAX_UPLOAD_SIZE):
+                        raise HTTPException(
+                            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+                            detail=f"File exceeds the maximum upload size of {config.MAX_UPLOAD_SIZE} bytes."
+                        )
+                    return await save_stream(
+                        response.aiter_bytes(int(config.UPLOAD_CHUNK_SIZE)),
+                        CONTENT_TYPE_EXTENSIONS[content_type]
+                    )
+
+
+async def import_urls_async(job_id: str, urls: list[str]) -> None:
+    """
+    Fetches the URLs with a fixed number of workers sharing one connection pool, so the
+    number of open sockets is bounded by URL_IMPORT_CONCURRENCY regardless of the list size.
+    """
+    concurrency: int = int(config.URL_IMPORT_CONCURRENCY)
+    batch_size: int = int(config.INGEST_BATCH_SIZE)
+    host_limits: dict[str, asyncio.Semaphore] = defaultdict(
+        lambda: asyncio.Semaphore(int(config.URL_IMPORT_PER_HOST))
+    )
+    pending = iter(urls)
+    batch: list[StoredFile] = []
+
+    async def flush() -> None:
+        nonlocal batch
+        stored_files, batch = batch, []
+        await asyncio.to_thread(register_stored_files, job_id, stored_files)
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        for url in pending:
+            try:
+                batch.append(await fetch_to_disk(client, url, host_limits))
+            except Exception as e:
+                jobs.add_error(job_id, f"{url}: {getattr(e, 'detail', e)}")
+            finally:
+                jobs.increment(job_id, processed=1)
+            if len(batch) >= batch_size:
+                await flush()
+
+    async with httpx.AsyncClient(
+        timeout=httpx.Timeout(float(config.URL_IMPORT_TIMEOUT)),
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        follow_redirects=True,
+    ) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    await flush()
+
+
+def import_urls(job_id: str, urls: list[str]) -> None:
+    """Runs a URL import on its own event loop inside a job worker thread."""
+    logging.info(f"Importing {len(urls)} urls for job {job_id}")
+    jobs.update(job_id, total=len(urls))
+    asyncio.run(import_urls_async(job_id, urls))
+    logging.info(f"Finished importing urls for job {job_id}")
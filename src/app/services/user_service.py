@@ -1,46 +1,63 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException
 
 import logging
 
+from app.core.concurrency import run_password_hash, run_script
 from app.db.schema import User
-from app.models.user_model import UserRead, UserUpdate
+from app.models.user_model import UserCreate, UserRead, UserUpdate
 from app.db.scripts.user_scripts import (
-    get_user, get_user_by_email, get_all_users, update_user, delete_user, create_user, authenticate_user
+    get_user, get_user_by_email, get_all_users, update_user, delete_user, create_user, get_users_page
 )
 from app.services.user_service_helpers import create_access_token
 
 
-class UserService:
-    def __init__(self, db: Session):
+class AsyncUserService:
+    def __init__(self, db: AsyncSession):
         self._db = db
 
-    def create_user(self, user: User) -> UserRead:
-        return UserRead.from_orm(create_user(user=user, session=self._db))
-    
-    def authenticate_user(self, email: str, password: str) -> bool:
-        return authenticate_user(email, password, self._db)
-    
+    async def create_user(self, user: UserCreate) -> UserRead:
+        hashed_password: str = await run_password_hash(User.hash_password, user.password)
+        new_user: User = await run_script(self._db, create_user, user=user, password_hash=hashed_password)
+        return UserRead.from_orm(new_user)
+
+    async def authenticate_user(self, email: str, password: str) -> bool:
+        """Verifies the password on the hashing pool so the event loop stays free."""
+        logging.info(f"Getting the user with email: {email}")
+        try:
+            user: User = await run_script(self._db, get_user_by_email, email=email)
+        except HTTPException:
+            logging.info(f"Could not find the user with email: {email}")
+            raise HTTPException(status_code=401, detail="Incorrect email or password")
+        if not await run_password_hash(User.verify_password, password, user.password_hash):
+            logging.info(f"The user with email {email} provided an incorrect password")
+            raise HTTPException(status_code=401, detail="Incorrect email or password")
+        return True
+
     def create_access_token(
             self, 
             data: dict, 
         ) -> str:
         return create_access_token(data=data)
-        
-    def get_user(self, user_id: str) -> UserRead | None:
-        user: User = get_user(user_id=user_id, session=self._db)
+
+    async def get_user(self, user_id: str) -> UserRead | None:
+        user: User = await run_script(self._db, get_user, user_id=user_id)
         return UserRead.from_orm(user)
-    
-    def get_user_by_email(self, email: str) -> UserRead | None:
-        user: User = get_user_by_email(email=email, session=self._db)
+
+    async def get_user_by_email(self, email: str) -> UserRead | None:
+        user: User = await run_script(self._db, get_user_by_email, email=email)
         return UserRead.from_orm(user)
-    
-    def delete_user(self, user_id: str) -> None:
-        return delete_user(user_id=user_id, session=self._db)
 
-    def update_user(self, user_id: str, user_update: UserUpdate) -> UserRead | None:
-        user: User = update_user(user_id=user_id, user_update=user_update, session=self._db)
+    async def delete_user(self, user_id: str) -> None:
+        return await run_script(self._db, delete_user, user_id=user_id)
+
+    async def update_user(self, user_id: str, user_update: UserUpdate) -> UserRead | None:
+        user: User = await run_script(self._db, update_user, user_id=user_id, user_update=user_update)
         return UserRead.from_orm(user)
-    
-    def get_all_users(self, limit: int, offset: int) -> list[UserRead]:
-        users: list[User] = get_all_users(limit=limit, offset=offset, session=self._db)
-        return [UserRead.from_orm(user) for user in users]
\ No newline at end of file
+
+    async def get_all_users(self, limit: int, offset: int) -> list[UserRead]:
+        users: list[User] = await run_script(self._db, get_all_users, limit=limit, offset=offset)
+        return [UserRead.from_orm(user) for user in users]
+
+    async def get_users_page(self, limit: int, cursor: str | None) -> tuple[list[User], str | None]:
+        return await run_script(self._db, get_users_page, limit=limit, cursor=cursor)
@@ -1,5 +1,5 @@
 import jwt
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from jwt.exceptions import InvalidTokenError
 from fastapi import Depends, HTTPException, status, Cookie
 
@@ -8,7 +8,8 @@ from typing import Annotated
 import logging
 
 from app.core.config import config
-from app.db.db import get_db
+from app.core.concurrency import run_script
+from app.db.db import get_async_db
 from app.models.user_model import UserRead
 from app.db.scripts.user_scripts import get_user_by_email
 from app.db.schema import User
@@ -26,7 +27,7 @@ def create_access_token(
     return encoded_jwt
 
 async def get_current_user(
-        session: Annotated[Session, Depends(get_db)],
+        session: Annotated[AsyncSession, Depends(get_async_db)],
         access_token: Annotated[str, Cookie()] = None,
         ) -> UserRead | None: 
     credentials_exception = HTTPException(
@@ -46,7 +47,7 @@ async def get_current_user(
             raise credentials_exception
 
         try:
-            user: User = get_user_by_email(email=email, session=session)
+            user: User = await run_script(session, get_user_by_email, email=email)
         except HTTPException:
             logging.error("User not found after verifying token")
             raise credentials_exception            
@@ -66,3 +67,15 @@ async def get_current_active_user(
 
     return current_user
 
+
+def get_optional_user_email(
+        access_token: Annotated[str, Cookie()] = None,
+    ) -> str | None:
+    """Identifies the caller from the access token without a database lookup, if logged in."""
+    if not access_token:
+        return None
+    try:
+        payload = jwt.decode(access_token, config.SECRET_KEY, algorithms=[config.ALGORITHM])
+    except InvalidTokenError:
+        return None
+    return payload.get("sub")
@@ -1,20 +1,20 @@
 from fastapi import Depends
 
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.db import get_db
-from app.services.user_service import UserService
-from app.services.image_service import ImageService
-from app.services.image_label_service import ImageLabelService
+from app.db.db import get_async_db
+from app.services.user_service import AsyncUserService
+from app.services.image_service import AsyncImageService
+from app.services.image_label_service import AsyncImageLabelService
 
 
-def get_user_service(db: Session = Depends(get_db)):
-    return UserService(db)
+def get_async_user_service(db: AsyncSession = Depends(get_async_db)):
+    return AsyncUserService(db)
 
 
-def get_image_service(db: Session = Depends(get_db)):
-    return ImageService(db)
+def get_async_image_service(db: AsyncSession = Depends(get_async_db)):
+    return AsyncImageService(db)
 
 
-def get_image_label_service(db: Session = Depends(get_db)):
-    return ImageLabelService(db)
\ No newline at end of file
+def get_async_image_label_service(db: AsyncSession = Depends(get_async_db)):
+    return AsyncImageLabelService(db)
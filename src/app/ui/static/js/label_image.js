@@ -62,4 +62,34 @@ function addTag() {
     newTag.innerText = tagInput;
     document.getElementById("tags").appendChild(newTag);
     closeAddTagModal();
-}
\ No newline at end of file
+}
+
+// Suggest existing tags while typing so annotators reuse them instead of adding variants
+const tagSuggestions = document.getElementById("tagSuggestions")
+
+function suggestTags(event) {
+    const prefix = event.target.value.trim()
+    if (!prefix) {
+        tagSuggestions.replaceChildren()
+        return
+    }
+    fetch(`/api/v1/images/tags/autocomplete?prefix=${encodeURIComponent(prefix)}`)
+    .then(response => response.json())
+    .then(suggestions => {
+        // Ignore responses for a prefix the annotator has already typed past
+        if (event.target.value.trim() !== prefix) {
+            return
+        }
+        tagSuggestions.replaceChildren(...suggestions.map(suggestion => {
+            const option = document.createElement("option")
+            option.value = suggestion.tag
+            option.label = `${suggestion.tag} (${suggestion.count})`
+            return option
+        }))
+    }).catch(error => {
+        console.error(error)
+    })
+}
+
+document.getElementById("tagInput").addEventListener("input", suggestTags)
+document.getElementById("editTagInput").addEventListener("input", suggestTags)
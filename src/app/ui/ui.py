@@ -1,13 +1,16 @@
 from fastapi import status
-from fastapi import APIRouter, Depends, Request
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 
 import logging
+from typing import Literal
 
 from app.core.config import config
-from app.ui.ui_helpers import list_images, get_image
-from app.services.utils import ImageService, get_image_service
+from app.db.schema import Image
+from app.services.user_service_helpers import get_optional_user_email
+from app.services.utils import AsyncImageService, get_async_image_service
+from app.services.quality import label_queue_options
 from app.models.image_model import ImageRead
 
 templates = Jinja2Templates(directory=config.TEMPLATES_DIR)
@@ -75,12 +78,16 @@ async def get_upload_page(request: Request):
     )
 
 @router.get('/image/label', status_code=status.HTTP_200_OK, response_class=HTMLResponse)
-async def get_label_page(request: Request, service: ImageService = Depends(get_image_service)):
+async def get_label_page(
+    request: Request,
+    annotator: str | None = Depends(get_optional_user_email),
+    service: AsyncImageService = Depends(get_async_image_service)
+    ):
     """Load the label page"""
     logging.info("Loading label page")
-    image: ImageRead = service.get_unlabelled_image()
-    if image:
-        image_name = image.image_name
+    images: list[Image] = await service.claim_unlabelled_images(count=1, claimed_by=annotator, **label_queue_options())
+    if images:
+        image_name = images[0].image_name
     else:
         image_name = None
     return templates.TemplateResponse(
@@ -95,10 +102,10 @@ async def get_label_page(request: Request, service: ImageService = Depends(get_i
     
 
 @router.get('/image/view/{image_name}', status_code=status.HTTP_200_OK, response_class=HTMLResponse)
-async def get_view_page(request: Request, image_name: str, service: ImageService = Depends(get_image_service)):
+async def get_view_page(request: Request, image_name: str, service: AsyncImageService = Depends(get_async_image_service)):
     """Load the view page"""
     logging.info("Loading view page")
-    image: ImageRead = service.get_image_by_name(image_name)
+    image: ImageRead = ImageRead.from_orm(await service.get_image_by_name(image_name))
     return templates.TemplateResponse(
         "view.html", 
         {
@@ -110,17 +117,40 @@ async def get_view_page(request: Request, image_name: str, service: ImageService
     )
 
 @router.get('/gallery', status_code=status.HTTP_200_OK, response_class=HTMLResponse)
-async def get_gallery(request: Request, service: ImageService = Depends(get_image_service)):
-    """Load the gallery page"""
+async def get_gallery(
+    request: Request,
+    cursor: str | None = None,
+    q: str | None = None,
+    sort: Literal["id", "quality"] = "id",
+    min_quality: float | None = Query(default=None, ge=0, le=1),
+    service: AsyncImageService = Depends(get_async_image_service)
+    ):
+    """
+    Load the gallery page. Searches come back best match first, so sort and min_quality
+    only apply when browsing; the page disables those controls while a search is active.
+    """
     logging.info("Loading gallery page")
-    images: list[ImageRead] = service.get_all_images(limit=None, offset=None)
-    image_names = [image.image_name for image in images]
+    q = q.strip() if q else None
+    if q:
+        images, next_cursor = await service.search_images(
+            tags_all=[], tags_any=[], gender=None, limit=int(config.GALLERY_PAGE_SIZE), cursor=cursor, text=q
+        )
+        image_names: list[str] = [image.image_name for image in images]
+    else:
+        image_names, next_cursor = await service.get_image_names_page(
+            limit=int(config.GALLERY_PAGE_SIZE), cursor=cursor, min_quality=min_quality,
+            order_by_quality=sort == "quality"
+        )
     return templates.TemplateResponse(
         "gallery_.html", 
         {
             "request": request,
             "title": "Gallery",
-            "images": image_names
+            "images": image_names,
+            "next_cursor": next_cursor,
+            "q": q,
+            "sort": sort,
+            "min_quality": min_quality
         } 
     )
 
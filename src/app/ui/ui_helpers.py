@@ -1,10 +1,9 @@
-from app.core.config import config
-import os
+from app.core.storage import iter_image_names
 import random
 
 
 def list_images():
-    images: list[str] = os.listdir(config.DATA_DIR)
+    images: list[str] = list(iter_image_names())
     return images
 
 def get_image():
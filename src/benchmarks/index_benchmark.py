@@ -0,0 +1,173 @@
+"""
+Before/after benchmark of the image lookup and labelling queue queries.
+
+Seeds two copies of the images and image_labels tables with the same rows in a scratch
+schema: one shaped like the tables before migration 0003 (varchar status, no indexes
+beyond the primary keys) and one shaped like the current models (enum status, unique
+image_name and image_id indexes, partial queue indexes). Each query is then timed with
+EXPLAIN ANALYZE against both copies, e.g.
+
+    python -m benchmarks.index_benchmark --rows 1000000 --repeats 20
+
+The scratch schema is dropped afterwards unless --keep is given.
+"""
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+import argparse
+import json
+import statistics
+import time
+
+from app.db.db import engine
+
+SCHEMA: str = "index_benchmark"
+
+SETUP: dict[str, list[str]] = {
+    "before": [
+        """
+        CREATE TABLE {schema}.images_before (
+            id VARCHAR PRIMARY KEY,
+            image_name VARCHAR NOT NULL,
+            version VARCHAR NOT NULL,
+            status VARCHAR NOT NULL,
+            lease_expires_at TIMESTAMPTZ,
+            claimed_by VARCHAR
+        )
+        """,
+        """
+        CREATE TABLE {schema}.image_labels_before (
+            id VARCHAR PRIMARY KEY,
+            prompt VARCHAR NOT NULL,
+            tags VARCHAR NOT NULL,
+            gender VARCHAR NOT NULL,
+            image_id VARCHAR NOT NULL REFERENCES {schema}.images_before (id)
+        )
+        """,
+    ],
+    "after": [
+        "CREATE TYPE {schema}.image_status AS ENUM ('unlabelled', 'in_progress', 'labelled')",
+        """
+        CREATE TABLE {schema}.images_after (
+            id VARCHAR PRIMARY KEY,
+            image_name VARCHAR NOT NULL,
+            version VARCHAR NOT NULL,
+            status {schema}.image_status NOT NULL,
+            lease_expires_at TIMESTAMPTZ,
+            claimed_by VARCHAR
+        )
+        """,
+        """
+        CREATE TABLE {schema}.image_labels_after (
+            id VARCHAR PRIMARY KEY,
+            prompt VARCHAR NOT NULL,
+            tags VARCHAR NOT NULL,
+            gender VARCHAR NOT NULL,
+            image_id VARCHAR NOT NULL REFERENCES {schema}.images_after (id)
+        )
+        """,
+    ],
+}
+
+# Built after seeding, the same way migration 0003 builds them on a populated table
+INDEXES: list[str] = [
+    "CREATE UNIQUE INDEX ON {schema}.images_after (image_name)",
+    "CREATE INDEX ON {schema}.images_after (id) WHERE status = 'unlabelled'",
+    "CREATE INDEX ON {schema}.images_after (lease_expires_at) WHERE status = 'in_progress'",
+    "CREATE UNIQUE INDEX ON {schema}.image_labels_after (image_id)",
+]
+
+# Roughly the mix of a live project: most images labelled, a tail still queued
+SEED_IMAGES: str = """
+INSERT INTO {schema}.images_{variant} (id, image_name, version, status)
+SELECT
+    'IMAGE_' || lpad(i::text, 10, '0'),
+    md5(i::text) || '.jpg',
+    'v1',
+    (CASE WHEN i % 10 < 8 THEN 'labelled' WHEN i % 100 = 99 THEN 'in_progress' ELSE 'unlabelled' END){cast}
+FROM generate_series(1, :rows) AS i
+"""
+
+SEED_LABELS: str = """
+INSERT INTO {schema}.image_labels_{variant} (id, prompt, tags, gender, image_id)
+SELECT 'IMAGE_LABEL_' || substr(id, 7), 'a photo', 'person,outdoor', 'female', id
+FROM {schema}.images_{variant}
+WHERE status = 'labelled'
+"""
+
+QUERIES: dict[str, str] = {
+    "lookup by image_name": "SELECT * FROM {schema}.images_{variant} WHERE image_name = md5('{probe}') || '.jpg'",
+    "next unlabelled (queue)": (
+        "SELECT id FROM {schema}.images_{variant} WHERE status = 'unlabelled' ORDER BY id LIMIT 10"
+    ),
+    "expired leases (sweep)": (
+        "SELECT id FROM {schema}.images_{variant} WHERE status = 'in_progress' AND lease_expires_at < now()"
+    ),
+    "count unlabelled": "SELECT count(*) FROM {schema}.images_{variant} WHERE status = 'unlabelled'",
+    "label by image_id": (
+        "SELECT * FROM {schema}.image_labels_{variant} WHERE image_id = 'IMAGE_' || lpad('{probe}', 10, '0')"
+    ),
+}
+
+
+def execution_time(connection: Connection, query: str) -> float:
+    """Returns the server side execution time of a query in milliseconds."""
+    plan: list[dict] | str = connection.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Execution Time"]
+
+
+def seed(connection: Connection, rows: int) -> None:
+    connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    connection.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    for variant, statements in SETUP.items():
+        for statement in statements:
+            connection.execute(text(statement.format(schema=SCHEMA)))
+        cast: str = f"::{SCHEMA}.image_status" if variant == "after" else ""
+        start: float = time.perf_counter()
+        connection.execute(text(SEED_IMAGES.format(schema=SCHEMA, variant=variant, cast=cast)), {"rows": rows})
+        connection.execute(text(SEED_LABELS.format(schema=SCHEMA, variant=variant)))
+        if variant == "after":
+            for statement in INDEXES:
+                connection.execute(text(statement.format(schema=SCHEMA)))
+        connection.execute(text(f"ANALYZE {SCHEMA}.images_{variant}"))
+        connection.execute(text(f"ANALYZE {SCHEMA}.image_labels_{variant}"))
+        print(f"seeded {variant:<6} {rows} rows in {time.perf_counter() - start:.1f}s")
+
+
+def table_size(connection: Connection, table: str) -> str:
+    return connection.execute(
+        text("SELECT pg_size_pretty(pg_total_relation_size(:table))"), {"table": f"{SCHEMA}.{table}"}
+    ).scalar()
+
+
+def main(rows: int, repeats: int, keep: bool) -> None:
+    with engine.begin() as connection:
+        seed(connection, rows)
+    with engine.connect() as connection:
+        print(f"images size:  before {table_size(connection, 'images_before')}, "
+              f"after {table_size(connection, 'images_after')} (including indexes)")
+        print(f"{'query':<26}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+        for name, query in QUERIES.items():
+            medians: dict[str, float] = {}
+            for variant in ("before", "after"):
+                timings: list[float] = [
+                    execution_time(connection, query.format(schema=SCHEMA, variant=variant, probe=(i * 7919) % rows + 1))
+                    for i in range(repeats)
+                ]
+                medians[variant] = statistics.median(timings)
+            speedup: float = medians["before"] / medians["after"] if medians["after"] else float("inf")
+            print(f"{name:<26}{medians['before']:>12.3f}{medians['after']:>12.3f}{speedup:>9.1f}x")
+    if not keep:
+        with engine.begin() as connection:
+            connection.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark image lookups before and after migration 0003")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Number of images to seed")
+    parser.add_argument("--repeats", type=int, default=20, help="Runs per query, the median is reported")
+    parser.add_argument("--keep", action="store_true", help="Keep the seeded scratch schema")
+    args = parser.parse_args()
+    main(args.rows, args.repeats, args.keep)
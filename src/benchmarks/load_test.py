@@ -0,0 +1,82 @@
+"""
+Concurrent throughput load test for the running app.
+
+Fires requests from many concurrent clients for a fixed duration and reports the
+throughput and latency percentiles. Run it against a build from before and after a
+change to compare, e.g.
+
+    uvicorn app.main:app --workers 1 &
+    python -m benchmarks.load_test --path /image/label --path /api/v1/users/login:POST \
+        --concurrency 100 --duration 30
+"""
+import httpx
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.core.config import config
+
+
+async def run_client(
+        client: httpx.AsyncClient,
+        targets: list[tuple[str, str]],
+        deadline: float,
+        latencies: list[float],
+        errors: list[int]
+    ) -> None:
+    index: int = 0
+    while time.perf_counter() < deadline:
+        path, method = targets[index % len(targets)]
+        index += 1
+        data: dict | None = None
+        if method == "POST":
+            data = {"email": config.DEFAULT_USER_EMAIL, "password": config.DEFAULT_USER_PASSWORD}
+        start: float = time.perf_counter()
+        try:
+            response = await client.request(method, path, data=data)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+        except httpx.HTTPError:
+            errors.append(0)
+        latencies.append(time.perf_counter() - start)
+
+
+async def main(base_url: str, targets: list[tuple[str, str]], concurrency: int, duration: float) -> None:
+    latencies: list[float] = []
+    errors: list[int] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline: float = time.perf_counter() + duration
+        await asyncio.gather(*(
+            run_client(client, targets, deadline, latencies, errors) for _ in range(concurrency)
+        ))
+
+    latencies.sort()
+    quantiles: list[float] = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"targets:     {', '.join(f'{method} {path}' for path, method in targets)}")
+    print(f"concurrency: {concurrency}")
+    print(f"requests:    {len(latencies)} ({len(errors)} errors)")
+    print(f"throughput:  {len(latencies) / duration:.1f} req/s")
+    print(f"latency p50: {quantiles[49] * 1000:.1f} ms")
+    print(f"latency p95: {quantiles[94] * 1000:.1f} ms")
+    print(f"latency p99: {quantiles[98] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument(
+        "--path", action="append", default=None,
+        help="Path to request, optionally suffixed with :POST for the login form (repeatable)"
+    )
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20.0)
+    args = parser.parse_args()
+
+    targets: list[tuple[str, str]] = []
+    for path in args.path or ["/image/label"]:
+        path, _, method = path.partition(":")
+        targets.append((path, method.upper() or "GET"))
+    asyncio.run(main(args.base_url, targets, args.concurrency, args.duration))
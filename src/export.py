@@ -0,0 +1,65 @@
+import argparse
+
+from app.core.logging import setup_logging
+from app.services.export import write_export, write_webdataset_shards
+from app.services.hf_export import export_hf_dataset
+
+setup_logging()
+
+
+def export_file(args: argparse.Namespace):
+    watermark: int = write_export(args.format, args.output, batch_size=args.batch_size, since=args.since)
+    print(f"Exported changes up to {watermark}; pass --since {watermark} to export only later changes")
+
+
+def export_webdataset(args: argparse.Namespace):
+    write_webdataset_shards(args.output, shard_size=args.shard_size, batch_size=args.batch_size)
+
+
+def export_hf(args: argparse.Namespace):
+    export_hf_dataset(
+        args.output,
+        shard_size=args.shard_size,
+        workers=args.workers,
+        embed_images=not args.reference_images,
+        validation_fraction=args.validation_fraction,
+        batch_size=args.batch_size
+    )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Export the labelled dataset for training")
+    subparsers = parser.add_subparsers(dest="format", required=True)
+
+    for format, default_output in (("jsonl", "labels.jsonl"), ("parquet", "labels.parquet")):
+        file_parser = subparsers.add_parser(format, help=f"Write the dataset as a single {format} file")
+        file_parser.add_argument("--output", default=default_output)
+        file_parser.add_argument("--batch-size", type=int, default=None)
+        file_parser.add_argument(
+            "--since", type=int, default=None, help="Only export changes since this watermark, with tombstones"
+        )
+        file_parser.set_defaults(func=export_file)
+
+    webdataset_parser = subparsers.add_parser("webdataset", help="Write the dataset as WebDataset tar shards")
+    webdataset_parser.add_argument("--output", default="shards")
+    webdataset_parser.add_argument("--shard-size", type=int, default=1000, help="Samples per shard")
+    webdataset_parser.add_argument("--batch-size", type=int, default=None)
+    webdataset_parser.set_defaults(func=export_webdataset)
+
+    hf_parser = subparsers.add_parser("hf", help="Write a Hugging Face datasets directory of Parquet shards")
+    hf_parser.add_argument("--output", default="hf_dataset")
+    hf_parser.add_argument("--shard-size", type=int, default=1000, help="Examples per Parquet shard")
+    hf_parser.add_argument("--workers", type=int, default=None, help="Shard encoding processes")
+    hf_parser.add_argument(
+        "--reference-images", action="store_true", help="Store image paths instead of embedding the image bytes"
+    )
+    hf_parser.add_argument("--validation-fraction", type=float, default=0.0)
+    hf_parser.add_argument("--batch-size", type=int, default=None)
+    hf_parser.set_defaults(func=export_hf)
+
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    args.func(args)
@@ -1,8 +1,87 @@
+import argparse
+
 from app.db.scripts.base import create_all_tables, delete_all_tables
+from app.db.scripts.migrations import apply_migrations
 from app.core.logging import setup_logging
+from app.core.storage import migrate_to_sharded_layout
+from app.services.label_import import import_labels_file
+from app.services.near_duplicates import backfill_image_hashes
+from app.services.quality import backfill_image_quality
+from app.imaging.pool import shutdown_pool
 
 setup_logging()
 
-if __name__ == "__main__":
+
+def reset(args: argparse.Namespace):
     delete_all_tables()
-    create_all_tables()
\ No newline at end of file
+    create_all_tables()
+
+
+def migrate(args: argparse.Namespace):
+    apply_migrations()
+
+
+def migrate_layout(args: argparse.Namespace):
+    migrate_to_sharded_layout(workers=args.workers)
+
+
+def import_labels(args: argparse.Namespace):
+    report = import_labels_file(args.path, format=args.format)
+    print(report.model_dump_json(indent=2))
+
+
+def backfill_hashes(args: argparse.Namespace):
+    try:
+        hashed = backfill_image_hashes(batch_size=args.batch_size)
+    finally:
+        shutdown_pool()
+    print(f"Hashed {hashed} images")
+
+
+def backfill_quality(args: argparse.Namespace):
+    try:
+        analysed = backfill_image_quality(batch_size=args.batch_size)
+    finally:
+        shutdown_pool()
+    print(f"Measured the quality of {analysed} images")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Savannah Faces management commands")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("reset", help="Drop and recreate all tables (default)").set_defaults(func=reset)
+    subparsers.add_parser("migrate", help="Apply pending schema migrations").set_defaults(func=migrate)
+
+    layout_parser = subparsers.add_parser(
+        "migrate-layout", help="Move images from the flat data directory into shards while the app runs"
+    )
+    layout_parser.add_argument("--workers", type=int, default=8)
+    layout_parser.set_defaults(func=migrate_layout)
+
+    labels_parser = subparsers.add_parser(
+        "import-labels", help="Bulk upsert labels from a CSV or JSONL file"
+    )
+    labels_parser.add_argument("path")
+    labels_parser.add_argument("--format", choices=["csv", "jsonl"], default=None, help="Defaults to the file extension")
+    labels_parser.set_defaults(func=import_labels)
+
+    hashes_parser = subparsers.add_parser(
+        "backfill-hashes", help="Compute perceptual hashes for stored images that do not have one"
+    )
+    hashes_parser.add_argument("--batch-size", type=int, default=None)
+    hashes_parser.set_defaults(func=backfill_hashes)
+
+    quality_parser = subparsers.add_parser(
+        "backfill-quality", help="Measure blur, exposure and entropy for stored images that lack them"
+    )
+    quality_parser.add_argument("--batch-size", type=int, default=None)
+    quality_parser.set_defaults(func=backfill_quality)
+
+    parser.set_defaults(func=reset)
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    args.func(args)
@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import config
+from app.db.db import Base, SessionLocal, engine
+from app.db.scripts.base import create_all_tables, delete_all_tables
+
+
+@pytest.fixture
+def storage_dirs(tmp_path, monkeypatch):
+    """Points the data and upload directories at a fresh temporary directory."""
+    monkeypatch.setattr(config, "DATA_DIR", str(tmp_path / "images"))
+    monkeypatch.setattr(config, "UPLOAD_TMP_DIR", str(tmp_path / "images" / "tmp"))
+    return tmp_path / "images"
+
+
+@pytest.fixture(scope="session")
+def database():
+    """
+    Recreates the schema once per run. The tables are dropped first, so this only runs
+    against a database whose name ends in _test (set POSTGRES_DB and POSTGRES_PORT).
+    """
+    if not str(config.POSTGRES_DB).endswith("_test"):
+        pytest.skip("POSTGRES_DB does not name a _test database")
+    try:
+        with engine.connect():
+            pass
+    except OperationalError:
+        pytest.skip("test database is not reachable")
+    delete_all_tables()
+    create_all_tables()
+    return engine
+
+
+@pytest.fixture
+def session(database):
+    """A session on empty tables."""
+    tables: str = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    with database.begin() as connection:
+        connection.execute(text(f"TRUNCATE {tables} CASCADE"))
+    session = SessionLocal()
+    yield session
+    session.close()
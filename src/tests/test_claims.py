@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app.db.db import SessionLocal
+from app.db.schema import Image, ImageStatus
+from app.db.scripts.image_scripts import (
+    claim_unlabelled_images, create_images, get_image_names_page, set_image_quality
+)
+from app.models.image_model import ImageCreate
+
+
+def add_images(session, count: int) -> list[str]:
+    images: list[ImageCreate] = [ImageCreate(image_name=f"{n:04d}.png", checksum=f"{n:064x}") for n in range(count)]
+    return [image.image_name for image, _ in create_images(images, session=session)]
+
+
+def claim(count: int, claimed_by: str | None = None, **options) -> list[str]:
+    session = SessionLocal()
+    try:
+        return [image.image_name for image in claim_unlabelled_images(count, claimed_by, session=session, **options)]
+    finally:
+        session.close()
+
+
+def test_claims_exactly_count(session):
+    add_images(session, 10)
+
+    first: list[str] = claim(3)
+    second: list[str] = claim(3)
+
+    assert len(first) == 3 and len(second) == 3
+    assert not set(first) & set(second)
+
+
+def test_concurrent_claims_are_disjoint_and_cover_the_queue(session):
+    add_images(session, 40)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        claims: list[list[str]] = list(executor.map(lambda n: claim(5, f"annotator-{n}"), range(8)))
+
+    claimed: list[str] = [image_name for images in claims for image_name in images]
+    assert all(len(images) == 5 for images in claims)
+    assert len(set(claimed)) == 40
+
+
+def test_held_leases_are_topped_up_to_count(session):
+    add_images(session, 10)
+    held: list[str] = claim(2, "ann")
+
+    images: list[str] = claim(5, "ann")
+
+    assert images[:2] == held
+    assert len(images) == 5 and len(set(images)) == 5
+    assert claim(2, "ann") == held
+
+
+def score(session, image_names: list[str], scores: list[float]) -> None:
+    set_image_quality(
+        [(image_name, {"width": 8, "height": 8, "blur_score": 1.0, "brightness": 0.5, "contrast": 0.5,
+                       "entropy": 1.0, "quality_score": quality_score})
+         for image_name, quality_score in zip(image_names, scores)],
+        session=session
+    )
+
+
+def test_claims_best_quality_first(session):
+    image_names: list[str] = add_images(session, 4)
+    score(session, image_names[:3], [0.2, 0.9, 0.5])
+
+    assert claim(4, order_by_quality=True) == ["0001.png", "0002.png", "0000.png", "0003.png"]
+    session.expire_all()
+    assert session.query(Image).filter(Image.claimed_by.is_(None), Image.status == ImageStatus.IN_PROGRESS).count() == 4
+
+
+def test_gallery_and_queue_keep_unanalysed_images_above_min_quality(session):
+    image_names: list[str] = add_images(session, 4)
+    score(session, image_names[:3], [0.2, 0.9, 0.5])
+
+    listed, _ = get_image_names_page(10, None, session=session, min_quality=0.4, order_by_quality=True)
+
+    assert listed == ["0001.png", "0002.png", "0003.png"]
+    assert claim(4, min_quality=0.4, order_by_quality=True) == listed
@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+from sqlalchemy.util.concurrency import greenlet_spawn
+
+from app.core.concurrency import retry_sleep
+
+
+def test_retry_sleep_yields_to_the_event_loop_under_run_sync():
+    async def main() -> int:
+        ticks: int = 0
+
+        async def ticker() -> None:
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        # run_sync runs scripts through greenlet_spawn, so this is where their retries back off
+        await greenlet_spawn(retry_sleep, 0.2)
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(main()) >= 5
+
+
+def test_retry_sleep_blocks_outside_the_event_loop():
+    started: float = time.monotonic()
+    retry_sleep(0.05)
+    assert time.monotonic() - started >= 0.05
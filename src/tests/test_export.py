@@ -0,0 +1,58 @@
+from sqlalchemy import update
+
+from app.db.db import SessionLocal
+from app.db.schema import Image
+from app.db.scripts.change_scripts import next_change_seq
+from app.db.scripts.image_label_scripts import create_image_label
+from app.db.scripts.image_scripts import create_images
+from app.models.image_label_model import ImageLabelCreate
+from app.models.image_model import ImageCreate
+from app.services.export import export_watermark, iter_labelled_batches
+
+
+def add_labelled_images(session, image_names: list[str]) -> None:
+    create_images([ImageCreate(image_name=image_name) for image_name in image_names], session=session)
+    for image_name in image_names:
+        create_image_label(
+            ImageLabelCreate(image_name=image_name, prompt="a face", tags=["outdoor"], gender="female"),
+            session=session
+        )
+
+
+def exported(since: int | None, until: int) -> list[str]:
+    return [row.image_name for batch in iter_labelled_batches(since=since, until=until) for row in batch]
+
+
+def touch(session, image_name: str) -> None:
+    session.execute(update(Image).where(Image.image_name == image_name).values(change_seq=next_change_seq()))
+
+
+def test_changes_committed_after_the_watermark_are_not_skipped(session):
+    add_labelled_images(session, ["0000.png", "0001.png"])
+    watermark: int = export_watermark()
+
+    in_flight = SessionLocal()
+    try:
+        # Takes the lower change_seq but commits only after the next export read its watermark
+        touch(in_flight, "0000.png")
+        touch(session, "0001.png")
+        session.commit()
+        first_watermark: int = export_watermark()
+        first: list[str] = exported(watermark, first_watermark)
+        in_flight.commit()
+    finally:
+        in_flight.close()
+    second: list[str] = exported(first_watermark, export_watermark())
+
+    assert "0000.png" not in first
+    assert "0000.png" in second
+    assert set(first) | set(second) == {"0000.png", "0001.png"}
+
+
+def test_full_export_stops_at_its_watermark(session):
+    add_labelled_images(session, ["0000.png", "0001.png"])
+    watermark: int = export_watermark()
+    add_labelled_images(session, ["0002.png"])
+
+    assert set(exported(None, watermark)) == {"0000.png", "0001.png"}
+    assert set(exported(watermark, export_watermark())) == {"0002.png"}
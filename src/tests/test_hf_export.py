@@ -0,0 +1,27 @@
+from PIL import Image as PILImage
+
+import os
+
+from app.core.storage import image_path
+from app.services.hf_export import export_hf_dataset
+from tests.test_export import add_labelled_images
+
+
+def test_export_replaces_shards_of_an_earlier_export(session, storage_dirs, tmp_path):
+    image_names: list[str] = ["0000.png", "0001.png", "0002.png"]
+    add_labelled_images(session, image_names)
+    for image_name in image_names:
+        os.makedirs(os.path.dirname(image_path(image_name)), exist_ok=True)
+        PILImage.new("RGB", (8, 8)).save(image_path(image_name))
+    output_dir = tmp_path / "dataset"
+    stale = output_dir / "data" / "train-00002-of-00003.parquet"
+    stale.parent.mkdir(parents=True)
+    stale.write_bytes(b"left over from a larger export")
+
+    splits: dict[str, dict] = export_hf_dataset(str(output_dir), shard_size=2, workers=1, embed_images=False)
+
+    assert splits["train"]["num_examples"] == 3
+    assert sorted(os.listdir(output_dir / "data")) == [
+        "train-00000-of-00002.parquet", "train-00001-of-00002.parquet"
+    ]
+    assert not [name for name in os.listdir(output_dir) if name.startswith(".data-")]
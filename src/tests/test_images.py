@@ -0,0 +1,20 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.db.scripts.image_scripts import create_image
+from app.models.image_model import ImageCreate
+
+
+def test_concurrent_duplicate_resolves_to_the_image_with_the_same_checksum(session):
+    first = create_image(ImageCreate(image_name="first.png", checksum="a" * 64), session=session)
+
+    second = create_image(ImageCreate(image_name="second.png", checksum="a" * 64), session=session)
+
+    assert second.id == first.id
+
+
+def test_name_conflict_without_a_checksum_is_not_a_duplicate(session):
+    create_image(ImageCreate(image_name="legacy.png"), session=session)
+
+    with pytest.raises(IntegrityError):
+        create_image(ImageCreate(image_name="legacy.png"), session=session)
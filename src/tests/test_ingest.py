@@ -0,0 +1,74 @@
+from PIL import Image as PILImage
+from sqlalchemy import select
+
+import io
+import os
+import tarfile
+import zipfile
+
+from app.core.storage import resolve_image_path
+from app.db.schema import Image
+from app.services import ingest
+from app.services.jobs import jobs
+
+
+def encoded(color: str, format: str) -> bytes:
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (32, 32), color).save(buffer, format)
+    return buffer.getvalue()
+
+
+MEMBERS: dict[str, bytes] = {
+    "faces/a.jpg": encoded("red", "JPEG"),
+    "faces/b.png": encoded("blue", "PNG"),
+    "faces/a-copy.JPG": encoded("red", "JPEG"),
+    "faces/fake.png": b"not an image",
+    "notes.txt": b"labels to come",
+    "__MACOSX/faces/._a.jpg": b"resource fork",
+}
+
+
+def ingest_archive(path: str, monkeypatch):
+    # Derivatives are rendered into the configured cache, outside the test's directories
+    monkeypatch.setattr(ingest, "schedule_derivatives", lambda image_names: None)
+    job = jobs.submit("test", lambda job_id: None)
+    ingest.ingest_archive(job.id, path)
+    return jobs.get(job.id)
+
+
+def check_ingested(session, job, archive_path: str) -> None:
+    assert (job.created, job.duplicates, job.skipped, job.processed) == (2, 1, 2, 6)
+    assert len(job.errors) == 1 and "faces/fake.png" in job.errors[0]
+    images: list[Image] = session.scalars(select(Image)).all()
+    assert len(images) == 2
+    assert all(image.image_name.endswith((".jpg", ".png")) for image in images)
+    assert all(resolve_image_path(image.image_name) for image in images)
+    # Hashes and quality metrics are measured right after registration
+    assert all(image.phash is not None and image.quality_score is not None for image in images)
+    assert not os.path.exists(archive_path)
+
+
+def test_ingests_a_zip_archive(session, storage_dirs, tmp_path, monkeypatch):
+    path = str(tmp_path / "faces.zip")
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("faces/", b"")
+        for name, data in MEMBERS.items():
+            archive.writestr(name, data)
+
+    job = ingest_archive(path, monkeypatch)
+
+    assert job.total == 6
+    check_ingested(session, job, path)
+
+
+def test_ingests_a_compressed_tar_stream(session, storage_dirs, tmp_path, monkeypatch):
+    path = str(tmp_path / "faces.tar.gz")
+    with tarfile.open(path, "w:gz") as archive:
+        for name, data in MEMBERS.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+    job = ingest_archive(path, monkeypatch)
+
+    check_ingested(session, job, path)
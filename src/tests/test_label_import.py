@@ -0,0 +1,58 @@
+import orjson
+from sqlalchemy import select
+
+from app.db.schema import Image, ImageLabel, ImageStatus
+from app.db.scripts.image_scripts import create_images
+from app.models.image_label_model import LabelImportReport
+from app.models.image_model import ImageCreate
+from app.services.label_import import import_labels_file
+from app.services.tag_index import tag_index
+
+
+def labels(session) -> dict[str, tuple]:
+    rows = session.execute(
+        select(Image.image_name, Image.status, ImageLabel.prompt, ImageLabel.tags, ImageLabel.gender)
+        .join(ImageLabel, ImageLabel.image_id == Image.id)
+    )
+    return {row.image_name: (row.status, row.prompt, row.tags, row.gender) for row in rows}
+
+
+def test_jsonl_import_round_trips_through_copy(session, tmp_path):
+    create_images([ImageCreate(image_name=f"{n:04d}.png") for n in range(3)], session=session)
+    path = tmp_path / "labels.jsonl"
+    path.write_bytes(b"\n".join([
+        orjson.dumps({"image_name": "0000.png", "prompt": "first try", "tags": ["Smile"], "gender": "female"}),
+        orjson.dumps({"image_name": "0001.png", "prompt": 'a "quoted", comma\nand newline', "tags": "hat, red hat"}),
+        b"{not json",
+        orjson.dumps({"image_name": "missing.png", "prompt": "no such image"}),
+        orjson.dumps({"image_name": "0000.png", "prompt": "a woman smiling", "tags": ["smile", "Outdoor"], "gender": "female"}),
+        orjson.dumps({"prompt": "no image name"}),
+    ]) + b"\n")
+
+    report: LabelImportReport = import_labels_file(str(path))
+
+    assert (report.total, report.inserted, report.updated, report.unmatched, report.invalid) == (6, 2, 0, 1, 2)
+    assert any("no image named missing.png" in error for error in report.errors)
+    session.expire_all()
+    imported: dict[str, tuple] = labels(session)
+    # The last line for an image wins
+    assert imported["0000.png"] == (ImageStatus.LABELLED, "a woman smiling", ["smile", "Outdoor"], "female")
+    assert imported["0001.png"] == (ImageStatus.LABELLED, 'a "quoted", comma\nand newline', ["hat", "red hat"], "")
+    assert "0002.png" not in imported
+    assert [(suggestion.tag, suggestion.count) for suggestion in tag_index.complete("", 10)] == [
+        ("hat", 1), ("Outdoor", 1), ("red hat", 1), ("smile", 1)
+    ]
+
+
+def test_csv_import_updates_existing_labels(session, tmp_path):
+    create_images([ImageCreate(image_name="0000.png")], session=session)
+    path = tmp_path / "labels.csv"
+    path.write_text("image_name,prompt,tags,gender\n0000.png,a face,smile,male\n")
+    import_labels_file(str(path))
+    path.write_text("image_name,prompt,tags,gender\n0000.png,a bald man,\"bald,smile\",male\n")
+
+    report: LabelImportReport = import_labels_file(str(path))
+
+    assert (report.inserted, report.updated) == (0, 1)
+    session.expire_all()
+    assert labels(session) == {"0000.png": (ImageStatus.LABELLED, "a bald man", ["bald", "smile"], "male")}
@@ -0,0 +1,39 @@
+import asyncio
+
+from sqlalchemy import func, select
+
+from app.db.db import AsyncSessionLocal
+from app.db.schema import Image, ImageLabel
+from app.db.scripts.image_scripts import create_images
+from app.models.image_label_model import ImageLabelCreate
+from app.models.image_model import ImageCreate
+from app.services.image_label_service import AsyncImageLabelService
+from app.services.tag_index import tag_index
+
+
+def label(image_name: str, tags: list[str]) -> ImageLabel:
+    async def main() -> ImageLabel:
+        async with AsyncSessionLocal() as db:
+            return await AsyncImageLabelService(db).create_image_label(
+                ImageLabelCreate(image_name=image_name, prompt="a face", tags=tags, gender="female")
+            )
+
+    return asyncio.run(main())
+
+
+def test_relabelling_updates_the_label_and_the_tag_index(session):
+    create_images([ImageCreate(image_name="0000.png")], session=session)
+    tag_index.load([])
+
+    first: ImageLabel = label("0000.png", ["outdoor", "smile"])
+    first_change: int = session.scalar(select(Image.change_seq))
+    second: ImageLabel = label("0000.png", ["indoor", "smile"])
+
+    assert second.id == first.id
+    assert session.scalar(select(func.count()).select_from(ImageLabel)) == 1
+    assert session.scalar(select(ImageLabel.tags)) == ["indoor", "smile"]
+    assert session.scalar(select(Image.change_seq)) > first_change
+    assert tag_index.complete("out", 10) == []
+    assert [(suggestion.tag, suggestion.count) for suggestion in tag_index.complete("", 10)] == [
+        ("indoor", 1), ("smile", 1)
+    ]
@@ -0,0 +1,68 @@
+import numpy as np
+from PIL import Image as PILImage
+
+import io
+import random
+
+from app.imaging.phash import compute_phash, hamming_distance, to_signed, to_unsigned
+from app.services.near_duplicates import BKTree
+
+
+def photo(seed: int, size: tuple[int, int] = (256, 192)) -> PILImage.Image:
+    """Smooth random shapes, so the low DCT frequencies carry the structure like in a photo."""
+    rng = np.random.default_rng(seed)
+    small: np.ndarray = rng.integers(0, 256, (6, 8, 3), dtype=np.uint8)
+    return PILImage.fromarray(small).resize(size, PILImage.Resampling.BICUBIC)
+
+
+def recompressed(image: PILImage.Image, size: tuple[int, int], quality: int) -> PILImage.Image:
+    buffer = io.BytesIO()
+    image.resize(size, PILImage.Resampling.LANCZOS).save(buffer, "JPEG", quality=quality)
+    return PILImage.open(io.BytesIO(buffer.getvalue()))
+
+
+def test_hamming_distance_counts_differing_bits():
+    assert hamming_distance(0b1011, 0b0010) == 2
+    assert hamming_distance(to_unsigned(-1), 0) == 64
+
+
+def test_signed_hashes_round_trip():
+    for image_hash in [0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1]:
+        assert -(1 << 63) <= to_signed(image_hash) < 1 << 63
+        assert to_unsigned(to_signed(image_hash)) == image_hash
+
+
+def test_resized_and_recompressed_copies_hash_close():
+    original: int = compute_phash(photo(1))
+
+    assert hamming_distance(original, compute_phash(recompressed(photo(1), (128, 96), 60))) <= 6
+    assert hamming_distance(original, compute_phash(photo(2))) > 12
+
+
+def test_search_matches_a_full_scan():
+    rng = random.Random(3)
+    hashes: dict[str, int] = {f"{n:04d}.png": rng.getrandbits(64) for n in range(300)}
+    # Near copies of a few hashes, a few bits apart
+    for n in range(20):
+        hashes[f"copy-{n:04d}.png"] = hashes[f"{n:04d}.png"] ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64))
+    tree = BKTree()
+    tree.load((image_name, to_signed(image_hash)) for image_name, image_hash in hashes.items())
+
+    for query in list(hashes.values())[:40]:
+        expected = sorted(
+            ((image_name, hamming_distance(query, image_hash)) for image_name, image_hash in hashes.items()
+             if hamming_distance(query, image_hash) <= 10),
+            key=lambda match: (match[1], match[0])
+        )
+        assert tree.search(to_signed(query), 10) == expected
+
+
+def test_identical_hashes_share_a_node_and_clusters_chain():
+    tree = BKTree()
+    tree.load([("a.png", 0b0000), ("a-copy.png", 0b0000), ("b.png", 0b0011), ("c.png", 0b1111), ("far.png", -1)])
+    tree.add("a.png", 0b0101)
+
+    assert tree.search(0, 0) == [("a-copy.png", 0), ("a.png", 0)]
+    assert len(tree) == 5
+    # c is 4 bits from a but 2 from b, which is 2 from a: one cluster through b
+    assert sorted(sorted(cluster) for cluster in tree.clusters(2)) == [["a-copy.png", "a.png", "b.png", "c.png"]]
@@ -0,0 +1,59 @@
+import numpy as np
+from PIL import Image as PILImage, ImageFilter
+
+import pytest
+
+from app.imaging.quality import measure_quality, quality_file
+
+
+def noise(size: tuple[int, int] = (640, 512), seed: int = 5) -> PILImage.Image:
+    rng = np.random.default_rng(seed)
+    return PILImage.fromarray(rng.integers(20, 236, (size[1], size[0]), dtype=np.uint8))
+
+
+def test_flat_image_has_no_blur_entropy_or_quality():
+    metrics = measure_quality(PILImage.new("L", (600, 600), 128), 600, 600)
+
+    assert metrics["blur_score"] == 0
+    assert metrics["entropy"] == 0
+    assert metrics["brightness"] == 128 and metrics["contrast"] == 0
+    assert metrics["quality_score"] == 0
+
+
+def test_sharp_detailed_image_scores_near_one():
+    metrics = measure_quality(noise(), 640, 512)
+
+    assert metrics["blur_score"] > 100
+    assert metrics["entropy"] > 7
+    assert metrics["quality_score"] == pytest.approx(1.0)
+
+
+def test_blurring_small_and_clipped_images_score_lower():
+    sharp: float = measure_quality(noise(), 640, 512)["quality_score"]
+    blurred: float = measure_quality(noise().filter(ImageFilter.GaussianBlur(4)), 640, 512)["quality_score"]
+    small: float = measure_quality(noise((256, 256)), 256, 256)["quality_score"]
+    half_black = noise()
+    half_black.paste(0, (0, 0, 320, 512))
+    clipped: float = measure_quality(half_black, 640, 512)["quality_score"]
+
+    assert blurred < sharp / 2
+    assert small == pytest.approx(0.5)
+    # Half the pixels are crushed, and the black half also lowers the entropy
+    assert clipped < 0.5
+
+
+def test_quality_file_reports_the_original_size(tmp_path):
+    path = tmp_path / "large.png"
+    noise((1600, 1200)).save(path)
+
+    metrics = quality_file(str(path))
+
+    assert (metrics["width"], metrics["height"]) == (1600, 1200)
+    assert metrics["quality_score"] > 0.5
+
+
+def test_quality_file_returns_none_for_undecodable_files(tmp_path):
+    path = tmp_path / "broken.png"
+    path.write_bytes(b"\x89PNG\r\n\x1a\n not really")
+
+    assert quality_file(str(path)) is None
@@ -0,0 +1,70 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import asyncio
+
+from app.db.db import AsyncSessionLocal
+from app.db.query_counter import assert_max_queries
+from app.db.scripts.image_label_scripts import create_image_label
+from app.db.scripts.image_scripts import create_images
+from app.main import app
+from app.models.image_label_model import ImageLabelCreate
+from app.models.image_model import ImageCreate, ImageRead
+from app.services.image_service import AsyncImageService
+
+LABELLED: int = 20
+
+
+@pytest.fixture
+def client(session, storage_dirs):
+    storage_dirs.mkdir(parents=True)
+    images: list[ImageCreate] = [
+        ImageCreate(image_name=f"{n:04d}.png", checksum=f"{n:064x}") for n in range(LABELLED + 5)
+    ]
+    create_images(images, session=session)
+    for image in images[:LABELLED]:
+        create_image_label(
+            ImageLabelCreate(image_name=image.image_name, prompt="a face", tags=["outdoor"], gender="female"),
+            session=session
+        )
+    return TestClient(app)
+
+
+def test_list_images(client):
+    with assert_max_queries(1) as counter:
+        response = client.get("/api/v1/images?limit=100")
+
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == LABELLED + 5
+    assert counter.count == 1
+
+
+def test_list_image_labels(client):
+    with assert_max_queries(1) as counter:
+        response = client.get("/api/v1/images/labels?limit=100")
+
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == LABELLED
+    assert counter.count == 1
+
+
+def test_image_detail(client):
+    async def read_image() -> ImageRead:
+        async with AsyncSessionLocal() as session:
+            # The query path behind the image view page
+            return ImageRead.from_orm(await AsyncImageService(session).get_image_by_name("0000.png"))
+
+    with assert_max_queries(1) as counter:
+        image: ImageRead = asyncio.run(read_image())
+
+    assert image.label is not None
+    assert counter.count == 1
+
+
+def test_labelled_export(client):
+    with assert_max_queries(2) as counter:
+        response = client.get("/api/v1/export/labels?format=jsonl&batch_size=7")
+
+    assert response.status_code == 200
+    assert len(response.content.splitlines()) == LABELLED
+    assert counter.count == 2
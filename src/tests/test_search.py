@@ -0,0 +1,59 @@
+from app.db.scripts.image_label_scripts import create_image_label
+from app.db.scripts.image_scripts import create_images, search_images
+from app.models.image_label_model import ImageLabelCreate
+from app.models.image_model import ImageCreate
+
+LABELS: dict[str, tuple[str, list[str], str]] = {
+    "0000.png": ("a woman smiling outdoors in a red hat", ["smile", "hat", "outdoor"], "female"),
+    "0001.png": ("a man smiling at the camera", ["smile", "indoor"], "male"),
+    "0002.png": ("a bald man frowning outdoors", ["bald", "outdoor"], "male"),
+    "0003.png": ("a woman in a hat, smiling, smiling widely", ["smile", "hat"], "female"),
+}
+
+
+def add_labels(session) -> None:
+    create_images([ImageCreate(image_name=image_name) for image_name in LABELS], session=session)
+    for image_name, (prompt, tags, gender) in LABELS.items():
+        create_image_label(
+            ImageLabelCreate(image_name=image_name, prompt=prompt, tags=tags, gender=gender), session=session
+        )
+
+
+def search(session, tags_all=(), tags_any=(), gender=None, text=None, limit=10) -> list[str]:
+    """Every matching image name, following the cursor across pages of limit."""
+    image_names: list[str] = []
+    cursor: str | None = None
+    while True:
+        images, cursor = search_images(
+            list(tags_all), list(tags_any), gender, limit, cursor, session=session, text=text
+        )
+        image_names += [image.image_name for image in images]
+        if not cursor:
+            return image_names
+
+
+def test_tag_filters(session):
+    add_labels(session)
+
+    assert sorted(search(session, tags_all=["smile", "hat"])) == ["0000.png", "0003.png"]
+    assert sorted(search(session, tags_any=["bald", "indoor"])) == ["0001.png", "0002.png"]
+    assert sorted(search(session, tags_all=["smile"], tags_any=["outdoor", "indoor"], gender="male")) == ["0001.png"]
+    assert search(session, tags_all=["smile", "bald"]) == []
+
+
+def test_tag_search_pages_cover_every_match_once(session):
+    add_labels(session)
+
+    assert sorted(search(session, tags_any=["smile", "outdoor"], limit=1)) == sorted(LABELS)
+
+
+def test_text_search_ranks_best_match_first(session):
+    add_labels(session)
+
+    best, *rest = search(session, text="smiles")
+    assert best == "0003.png"
+    assert sorted(rest) == ["0000.png", "0001.png"]
+    assert search(session, text="smiling -man") == ["0003.png", "0000.png"]
+    assert search(session, text='"red hat"') == ["0000.png"]
+    assert search(session, text="smiling", tags_all=["outdoor"]) == ["0000.png"]
+    assert search(session, text="smiling", limit=1) == search(session, text="smiling")
@@ -0,0 +1,86 @@
+import pytest
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+
+import asyncio
+import io
+import os
+
+from app.core.storage import StoredFile, discard_duplicate, discard_stored, save_fileobj, save_stream, save_upload
+from app.services import ingest
+from app.services.jobs import jobs
+
+
+async def chunks(data: bytes):
+    yield data
+
+
+def upload(data: bytes, filename: str, content_type: str) -> StoredFile:
+    file = UploadFile(io.BytesIO(data), filename=filename, headers=Headers({"content-type": content_type}))
+    return asyncio.run(save_upload(file))
+
+
+def test_upload_extension_comes_from_the_sniffed_content(storage_dirs):
+    jpeg: bytes = b"\xff\xd8\xff\xe0 jpeg bytes"
+
+    lower: StoredFile = upload(jpeg, "face.jpg", "image/jpeg")
+    upper: StoredFile = upload(jpeg, "face.JPG", "application/octet-stream")
+
+    assert lower.filename.endswith(".jpg")
+    assert upper.filename == lower.filename
+
+
+def test_upload_rejects_content_that_is_not_an_image(storage_dirs):
+    with pytest.raises(HTTPException) as error:
+        upload(b"<script>alert(1)</script>", "face.html", "image/png")
+
+    assert error.value.status_code == 415
+    assert not any(files for _, _, files in os.walk(storage_dirs) if files)
+
+
+def test_identical_content_reuses_the_existing_file(storage_dirs):
+    first: StoredFile = save_fileobj(io.BytesIO(b"same bytes"), ".png")
+    second: StoredFile = asyncio.run(save_stream(chunks(b"same bytes"), ".png"))
+
+    assert first.created is True
+    assert second.created is False
+    assert second.path == first.path
+    assert second.checksum == first.checksum
+
+
+def test_discard_stored_keeps_reused_files(storage_dirs):
+    first: StoredFile = save_fileobj(io.BytesIO(b"shared"), ".png")
+    second: StoredFile = save_fileobj(io.BytesIO(b"shared"), ".png")
+
+    discard_stored(second)
+    assert os.path.exists(first.path)
+
+    discard_stored(first)
+    assert not os.path.exists(first.path)
+
+
+def test_discard_duplicate_only_removes_files_under_another_name(storage_dirs):
+    stored: StoredFile = save_fileobj(io.BytesIO(b"duplicate"), ".png")
+
+    discard_duplicate(stored, stored.filename)
+    assert os.path.exists(stored.path)
+
+    discard_duplicate(stored, "legacy-name.png")
+    assert not os.path.exists(stored.path)
+
+
+def test_failed_registration_keeps_files_of_registered_images(storage_dirs, monkeypatch):
+    existing: StoredFile = save_fileobj(io.BytesIO(b"already registered"), ".png")
+    reused: StoredFile = save_fileobj(io.BytesIO(b"already registered"), ".png")
+    new: StoredFile = save_fileobj(io.BytesIO(b"brand new"), ".png")
+
+    def fail(images, session):
+        raise RuntimeError("connection reset")
+
+    monkeypatch.setattr(ingest, "create_images", fail)
+    job = jobs.submit("test", lambda job_id: None)
+    ingest.register_stored_files(job.id, [reused, new])
+
+    assert os.path.exists(existing.path)
+    assert not os.path.exists(new.path)
+    assert jobs.get(job.id).failed == 2
@@ -0,0 +1,57 @@
+import random
+
+from app.services.tag_index import TagIndex
+
+
+def brute_force(counts: dict[str, int], prefix: str, limit: int) -> list[tuple[str, int]]:
+    matches = [(tag, count) for tag, count in counts.items() if count > 0 and tag.casefold().startswith(prefix)]
+    return sorted(matches, key=lambda match: (-match[1], match[0].casefold(), match[0]))[:limit]
+
+
+def completions(index: TagIndex, prefix: str, limit: int) -> list[tuple[str, int]]:
+    return [(suggestion.tag, suggestion.count) for suggestion in index.complete(prefix, limit)]
+
+
+def test_completes_most_used_first_ignoring_case():
+    index = TagIndex(top_k=3)
+    index.load([("outdoor", 5), ("Outfit", 2), ("out", 5), ("indoor", 9), ("owl", 0)])
+
+    assert completions(index, "OU", 3) == [("out", 5), ("outdoor", 5), ("Outfit", 2)]
+    assert completions(index, "", 2) == [("indoor", 9), ("out", 5)]
+    assert completions(index, "ow", 3) == []
+    assert completions(index, "x", 3) == []
+
+
+def test_updates_rerank_and_drop_unused_tags():
+    index = TagIndex(top_k=2)
+    index.load([("smile", 3), ("smirk", 2), ("small", 1)])
+
+    index.update(added=["small", "smirk"], removed=["smile"])
+    index.update(added=["small"], removed=["smile"])
+    assert completions(index, "sm", 2) == [("small", 3), ("smirk", 3)]
+
+    index.update(removed=["smile"])
+    assert len(index) == 2
+    assert completions(index, "smil", 2) == []
+
+
+def test_matches_a_full_scan_after_random_updates():
+    rng = random.Random(7)
+    tags: list[str] = [
+        "".join(rng.choice("abC") for _ in range(rng.randint(1, 4))) for _ in range(60)
+    ]
+    counts: dict[str, int] = {tag: rng.randint(1, 5) for tag in tags}
+    index = TagIndex(top_k=5)
+    index.load(counts.items())
+
+    for _ in range(300):
+        added, removed = set(rng.sample(tags, 2)), set(rng.sample(tags, 2))
+        index.update(added=added, removed=removed)
+        for tag in removed - added:
+            if counts.get(tag, 0) > 0:
+                counts[tag] -= 1
+        for tag in added - removed:
+            counts[tag] = counts.get(tag, 0) + 1
+
+        for prefix in ["", "a", "c", "ab", "cb"]:
+            assert completions(index, prefix, 5) == brute_force(counts, prefix, 5)
@@ -0,0 +1,128 @@
+from fastapi.testclient import TestClient
+from PIL import Image as PILImage
+
+import asyncio
+import multiprocessing
+import os
+import time
+
+from app.core.storage import image_path
+from app.imaging import transforms
+from app.imaging.transforms import TransformCache, TransformParams, ensure_transform
+from app.main import app
+
+
+def disk_usage(directory: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(directory)
+        for name in names
+        if not name.startswith(".")
+    )
+
+
+def store(cache: TransformCache, key: str, size: int) -> None:
+    path: str = cache.path(key, "webp")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as out_file:
+        out_file.write(b"x" * size)
+    cache.put(key, "webp", size)
+
+
+def fill(directory: str, worker: int, count: int) -> None:
+    cache = TransformCache(directory, max_bytes=10_000)
+    for n in range(count):
+        store(cache, f"{worker:02d}{n:06d}", 500)
+
+
+def test_workers_share_one_budget(tmp_path):
+    directory: str = str(tmp_path / "transforms")
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=fill, args=(directory, worker, 40)) for worker in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    # 4 workers wrote 80 KB in total against a 10 KB budget
+    assert disk_usage(directory) <= 10_000
+
+
+def test_evicts_the_least_recently_used_across_workers(tmp_path):
+    directory: str = str(tmp_path / "transforms")
+    first = TransformCache(directory, max_bytes=2_000)
+    second = TransformCache(directory, max_bytes=2_000)
+
+    store(first, "aa0001", 800)
+    store(second, "bb0002", 800)
+    past: float = time.time() - 60
+    os.utime(first.path("aa0001", "webp"), (past, past))
+    os.utime(second.path("bb0002", "webp"), (past + 1, past + 1))
+    # A hit through the other worker makes aa0001 the most recently used
+    assert second.get("aa0001", "webp") is not None
+
+    store(first, "cc0003", 800)
+
+    assert first.get("bb0002", "webp") is None
+    assert second.get("aa0001", "webp") is not None
+    assert second.get("cc0003", "webp") is not None
+    assert disk_usage(directory) <= 2_000
+
+
+def test_startup_keeps_fresh_temp_files_and_removes_stale_ones(tmp_path):
+    directory = tmp_path / "transforms"
+    (directory / "ab").mkdir(parents=True)
+    fresh = directory / "ab" / "abc.webp.1.part"
+    stale = directory / "ab" / "abc.webp.2.part"
+    fresh.write_bytes(b"in progress")
+    stale.write_bytes(b"abandoned")
+    old: float = time.time() - 2 * TransformCache.STALE_PART_SECONDS
+    os.utime(stale, (old, old))
+
+    TransformCache(str(directory), max_bytes=1_000)
+
+    assert fresh.exists()
+    assert not stale.exists()
+
+
+def add_source_image(image_name: str) -> None:
+    path: str = image_path(image_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    PILImage.new("RGB", (64, 48), "red").save(path)
+
+
+async def render_here(key: str, func, *args):
+    return func(*args)
+
+
+def test_transform_evicted_before_it_is_opened_is_rendered_again(storage_dirs, tmp_path, monkeypatch):
+    add_source_image("face.png")
+    cache = TransformCache(str(tmp_path / "transforms"), max_bytes=1_000_000)
+    monkeypatch.setattr(transforms, "_cache", cache)
+    monkeypatch.setattr(transforms, "run_in_pool_once", render_here)
+    params = TransformParams(width=32, format="png")
+    asyncio.run(ensure_transform("face.png", params)).close()
+
+    lookup = cache.get
+
+    def evicted_after_lookup(key: str, format: str) -> str | None:
+        path: str | None = lookup(key, format)
+        if path:
+            # Another worker evicts the file right after this worker found it
+            os.remove(path)
+        return path
+
+    monkeypatch.setattr(cache, "get", evicted_after_lookup)
+    with asyncio.run(ensure_transform("face.png", params)) as transform:
+        assert transform.read().startswith(b"\x89PNG")
+
+
+def test_deleted_image_is_not_revalidated(storage_dirs):
+    etag: str = f'"{TransformParams(width=32).cache_key("gone.png")}"'
+
+    response = TestClient(app).get(
+        "/api/v1/images/gone.png/transform?width=32", headers={"If-None-Match": etag}
+    )
+
+    assert response.status_code == 404
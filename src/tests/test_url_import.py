@@ -0,0 +1,255 @@
+import pytest
+from PIL import Image as PILImage
+
+import io
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from app.core.config import config
+from app.models.job_model import JobRead
+from app.services import url_import
+from app.services.jobs import jobs
+
+
+def png_bytes(seed: int) -> bytes:
+    buffer = io.BytesIO()
+    PILImage.new("RGB", (4, 4), (seed % 256, seed // 256 % 256, 7)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    A local image host. Paths pick the behaviour:
+
+    - /image/<n>: a distinct PNG
+    - /slow/<n>: a distinct PNG after a short delay
+    - /flaky/<status>/<key>: <status> on the first request for <key>, then a PNG
+    - /status/<status>: always <status>
+    - /text: a text/plain body
+    - /huge: a PNG content type with a content-length over the upload limit
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.lock = threading.Lock()
+        self.hits: Counter[str] = Counter()
+        self.active_requests: int = 0
+        self.max_active_requests: int = 0
+        self.open_connections: int = 0
+        self.max_open_connections: int = 0
+
+    def url(self, path: str, host: str = "127.0.0.1") -> str:
+        return f"http://{host}:{self.server_address[1]}{path}"
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: StandInServer
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def handle(self) -> None:
+        with self.server.lock:
+            self.server.open_connections += 1
+            self.server.max_open_connections = max(self.server.max_open_connections, self.server.open_connections)
+        try:
+            super().handle()
+        finally:
+            with self.server.lock:
+                self.server.open_connections -= 1
+
+    def send_body(self, status: int, body: bytes, content_type: str, content_length: int | None = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body) if content_length is None else content_length))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        with self.server.lock:
+            self.server.hits[self.path] += 1
+            hits: int = self.server.hits[self.path]
+            self.server.active_requests += 1
+            self.server.max_active_requests = max(self.server.max_active_requests, self.server.active_requests)
+        try:
+            parts: list[str] = self.path.strip("/").split("/")
+            if parts[0] == "image":
+                self.send_body(200, png_bytes(int(parts[1])), "image/png")
+            elif parts[0] == "slow":
+                time.sleep(0.05)
+                self.send_body(200, png_bytes(int(parts[1])), "image/png")
+            elif parts[0] == "flaky" and hits == 1:
+                self.send_body(int(parts[1]), b"try again", "text/plain")
+            elif parts[0] == "flaky":
+                self.send_body(200, png_bytes(1000 + int(parts[2])), "image/png")
+            elif parts[0] == "status":
+                self.send_body(int(parts[1]), b"nope", "text/plain")
+            elif parts[0] == "text":
+                self.send_body(200, b"not an image", "text/plain")
+            elif parts[0] == "huge":
+                self.send_body(200, b"", "image/png", content_length=int(config.MAX_UPLOAD_SIZE) + 1)
+        finally:
+            with self.server.lock:
+                self.server.active_requests -= 1
+
+
+@pytest.fixture
+def server():
+    stand_in = StandInServer()
+    thread = threading.Thread(target=stand_in.serve_forever, daemon=True)
+    thread.start()
+    yield stand_in
+    stand_in.shutdown()
+    stand_in.server_close()
+
+
+@pytest.fixture
+def registered(monkeypatch) -> list[list[str]]:
+    """Records each batch handed to the database instead of inserting it."""
+    batches: list[list[str]] = []
+
+    def register(job_id: str, stored_files: list) -> None:
+        if stored_files:
+            batches.append([stored.filename for stored in stored_files])
+            jobs.increment(job_id, created=len(stored_files))
+
+    monkeypatch.setattr(url_import, "register_stored_files", register)
+    return batches
+
+
+@pytest.fixture(autouse=True)
+def fast_importer(monkeypatch, storage_dirs):
+    monkeypatch.setattr(config, "WAIT_EXPONENTIAL_MUTIPLIER", 0)
+    monkeypatch.setattr(config, "WAIT_EXPONENTIAL_MIN", 0)
+    monkeypatch.setattr(config, "WAIT_EXPONENTIAL_MAX", 0)
+    monkeypatch.setattr(config, "URL_IMPORT_RETRIES", 3)
+    monkeypatch.setattr(config, "URL_IMPORT_TIMEOUT", 5.0)
+    monkeypatch.setattr(config, "URL_IMPORT_CONCURRENCY", 4)
+    monkeypatch.setattr(config, "URL_IMPORT_PER_HOST", 4)
+    monkeypatch.setattr(config, "INGEST_BATCH_SIZE", 500)
+    monkeypatch.setattr(config, "MAX_UPLOAD_SIZE", 10_000)
+
+
+def run_import(urls: list[str]) -> JobRead:
+    job: JobRead = jobs.submit("url_import", url_import.import_urls, urls)
+    deadline: float = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        job = jobs.get(job.id)
+        if job.status in ("completed", "failed"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError("url import did not finish")
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retries_throttled_and_server_errors(server, registered, status):
+    job: JobRead = run_import([server.url(f"/flaky/{status}/1")])
+
+    assert job.status == "completed"
+    assert job.failed == 0
+    assert server.hits[f"/flaky/{status}/1"] == 2
+    assert sum(len(batch) for batch in registered) == 1
+
+
+def test_gives_up_after_the_configured_attempts(server, registered):
+    job: JobRead = run_import([server.url("/status/503")])
+
+    assert server.hits["/status/503"] == int(config.URL_IMPORT_RETRIES)
+    assert job.failed == 1
+    assert "HTTP 503" in job.errors[0]
+    assert registered == []
+
+
+@pytest.mark.parametrize("path, detail", [
+    ("/text", "Unsupported file type."),
+    ("/huge", "maximum upload size"),
+    ("/status/404", "HTTP 404"),
+])
+def test_rejects_without_retrying(server, registered, path, detail):
+    job: JobRead = run_import([server.url(path)])
+
+    assert server.hits[path] == 1
+    assert job.failed == 1
+    assert detail in job.errors[0]
+    assert registered == []
+
+
+def test_per_host_limit(server, registered, monkeypatch):
+    monkeypatch.setattr(config, "URL_IMPORT_CONCURRENCY", 8)
+    monkeypatch.setattr(config, "URL_IMPORT_PER_HOST", 2)
+
+    job: JobRead = run_import([server.url(f"/slow/{n}") for n in range(12)])
+
+    assert job.processed == 12 and job.failed == 0
+    assert server.max_active_requests == 2
+
+
+def test_hosts_are_limited_independently(server, registered, monkeypatch):
+    monkeypatch.setattr(config, "URL_IMPORT_CONCURRENCY", 8)
+    monkeypatch.setattr(config, "URL_IMPORT_PER_HOST", 2)
+
+    urls: list[str] = [server.url(f"/slow/{n}", host="127.0.0.1") for n in range(8)]
+    urls += [server.url(f"/slow/{n}", host="localhost") for n in range(8, 16)]
+    job: JobRead = run_import(urls)
+
+    assert job.processed == 16 and job.failed == 0
+    assert server.max_active_requests == 4
+
+
+def test_large_url_list_keeps_sockets_bounded(server, registered, monkeypatch):
+    monkeypatch.setattr(config, "URL_IMPORT_CONCURRENCY", 4)
+    monkeypatch.setattr(config, "URL_IMPORT_PER_HOST", 100)
+
+    job: JobRead = run_import([server.url(f"/image/{n}") for n in range(300)])
+
+    assert job.processed == 300 and job.failed == 0
+    assert server.max_open_connections <= 4
+    assert sum(len(batch) for batch in registered) == 300
+
+
+def test_flushes_full_batches_and_the_remainder(server, registered, monkeypatch):
+    monkeypatch.setattr(config, "INGEST_BATCH_SIZE", 3)
+    monkeypatch.setattr(config, "URL_IMPORT_CONCURRENCY", 1)
+
+    run_import([server.url(f"/image/{n}") for n in range(7)])
+
+    assert [len(batch) for batch in registered] == [3, 3, 1]
+
+
+def test_error_accounting(server, registered):
+    urls: list[str] = [
+        server.url("/image/1"),
+        server.url("/text"),
+        server.url("/flaky/429/2"),
+        server.url("/status/404"),
+        server.url("/image/2"),
+    ]
+    job: JobRead = run_import(urls)
+
+    assert job.status == "completed"
+    assert job.total == 5
+    assert job.processed == 5
+    assert job.created == 3
+    assert job.failed == 2
+    assert sorted(error.split(": ", 1)[0] for error in job.errors) == sorted([
+        server.url("/text"), server.url("/status/404")
+    ])
+
+
+def test_parse_url_lines():
+    lines: list[str] = [
+        "# comment",
+        "",
+        "https://example.com/a.png",
+        '"https://example.com/b.png"',
+        '{"url": "https://example.com/c.png"}',
+        "ftp://example.com/d.png",
+    ]
+    assert list(url_import.parse_url_lines(lines)) == [
+        "https://example.com/a.png", "https://example.com/b.png", "https://example.com/c.png"
+    ]